@@ -0,0 +1,75 @@
+from storage.kv import get_store
+from collections import OrderedDict
+import json
+import threading
+import time
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl_seconds`"""
+
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class SharedCache:
+    """TTLCache lookalike backed by the shared state store, so all workers see the same entries.
+
+    Values must be JSON-serializable; eviction is left to the store's TTLs.
+    """
+
+    def __init__(self, store, namespace: str, ttl_seconds: float = 3600):
+        self.store = store
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+
+    def _key(self, key) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key, default=None):
+        raw = self.store.get(self._key(key))
+        return json.loads(raw) if raw is not None else default
+
+    def set(self, key, value):
+        self.store.set(self._key(key), json.dumps(value), ttl=self.ttl_seconds)
+
+    def delete(self, key):
+        self.store.delete(self._key(key))
+
+
+def create_cache(namespace: str, max_size: int = 512, ttl_seconds: float = 3600):
+    """In-process TTLCache for the memory backend, otherwise a view onto the shared store"""
+    store = get_store()
+    if store.name == "memory":
+        return TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+    return SharedCache(store, namespace, ttl_seconds=ttl_seconds)
@@ -0,0 +1,150 @@
+"""Source corpora registered once and referenced by later prompts (context caching).
+
+Verification and synthesis both need a job's numbered source block. Instead of
+resending it inside every prompt, the coordinator registers it once as a
+cached context. With the Gemini backend that is a CachedContent resource: later
+prompts carry only their own instructions, and the cached tokens are neither
+prefilled again nor billed at the full input rate. With LLM_BACKEND=fake, a
+local stand-in keeps the text and reports cached token counts the same way.
+
+A corpus below CONTEXT_CACHE_MIN_TOKENS (the provider's minimum) is sent
+inline as a prompt prefix, and so is a corpus used with a model other than the
+one its cache was created for. Contexts are keyed by (model, text) and live for
+CONTEXT_CACHE_TTL_SECONDS, so a follow-up over the same corpus reuses the
+earlier job's cache.
+
+A model the provider says cannot cache content is not asked again. Any other
+failure to create a cache (quota, timeout, outage) only sends that model's
+corpora inline for CONTEXT_CACHE_RETRY_SECONDS.
+"""
+from agents.prompt_compression import estimate_tokens
+import datetime
+import hashlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Stop using a remote cache this long before it expires on the provider side
+EXPIRY_MARGIN_SECONDS = 30
+
+
+def _unsupported(error: Exception) -> bool:
+    """True when cache creation failed because the model can never use it"""
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return False
+    if isinstance(error, (exceptions.NotFound, exceptions.MethodNotImplemented)):
+        return True
+    return isinstance(error, exceptions.InvalidArgument) and "support" in str(error).lower()
+
+
+class LocalCachedContent:
+    """Stand-in for genai.caching.CachedContent used with the fake backend"""
+
+    def __init__(self, model_name: str, text: str, ttl_seconds: float):
+        self.name = "cachedContents/local-" + hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        self.model = model_name
+        self.text = text
+        self.expire_time = time.time() + ttl_seconds
+
+
+class CachedContext:
+    def __init__(self, model_name: str, text: str):
+        self.model_name = model_name
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.key = (model_name, hashlib.sha256(text.encode("utf-8")).hexdigest())
+        # Provider-side cache and the model bound to it; None means "send inline"
+        self.remote = None
+        self.model = None
+        self.expires_at = None
+
+    @property
+    def cached(self) -> bool:
+        return self.remote is not None
+
+    def usable_by(self, model_name: str) -> bool:
+        return (
+            self.remote is not None
+            and model_name == self.model_name
+            and time.time() < self.expires_at - EXPIRY_MARGIN_SECONDS
+        )
+
+    def inline(self, prompt: str) -> str:
+        """The prompt with the corpus in front, for calls that cannot use the cache"""
+        return f"{self.text}\n\n{prompt}"
+
+
+class ContextCache:
+    def __init__(self, backend: str = "gemini", enabled: bool = True, ttl_seconds: float = 900, min_tokens: int = 1024, retry_seconds: float = 300):
+        self.backend = backend
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.retry_seconds = retry_seconds
+        self._contexts = {}
+        # Models that cannot cache content; not retried for the life of the process
+        self._unsupported = set()
+        # model -> time before which a failed cache creation is not retried
+        self._retry_at = {}
+        self._lock = threading.Lock()
+
+    def register(self, model_name: str, text: str) -> CachedContext:
+        """Context for `text`; reuses a live cache of the same corpus, else creates one if worthwhile"""
+        context = CachedContext(model_name, text)
+        with self._lock:
+            now = time.time()
+            for key in [k for k, c in self._contexts.items() if c.expires_at - EXPIRY_MARGIN_SECONDS <= now]:
+                del self._contexts[key]
+            existing = self._contexts.get(context.key)
+        if existing is not None:
+            return existing
+
+        if not self.enabled or context.tokens < self.min_tokens or model_name in self._unsupported:
+            return context
+        if time.time() < self._retry_at.get(model_name, 0):
+            return context
+        try:
+            context.remote, context.model = self._create(model_name, text)
+        except Exception as e:
+            if _unsupported(e):
+                logger.warning(f"Context caching unsupported by {model_name}: {e}. Sending sources inline.")
+                self._unsupported.add(model_name)
+            else:
+                logger.warning(f"Context caching failed for {model_name}: {e}. Sending sources inline for {self.retry_seconds:.0f}s.")
+                self._retry_at[model_name] = time.time() + self.retry_seconds
+            return context
+        context.expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._contexts[context.key] = context
+        logger.info(f"Cached {context.tokens}-token source corpus as {context.remote.name}")
+        return context
+
+    def _create(self, model_name: str, text: str) -> tuple:
+        if self.backend == "fake":
+            from agents.fake_llm import FakeGenerativeModel
+            remote = LocalCachedContent(model_name, text, self.ttl_seconds)
+            return remote, FakeGenerativeModel(model_name, cached_content=remote)
+        import google.generativeai as genai
+        remote = genai.caching.CachedContent.create(
+            model=model_name,
+            contents=[text],
+            ttl=datetime.timedelta(seconds=self.ttl_seconds),
+        )
+        return remote, genai.GenerativeModel.from_cached_content(remote)
+
+
+def create_context_cache() -> ContextCache:
+    """Cache configured by CONTEXT_CACHE / CONTEXT_CACHE_TTL_SECONDS / CONTEXT_CACHE_MIN_TOKENS /
+    CONTEXT_CACHE_RETRY_SECONDS"""
+    return ContextCache(
+        backend=os.getenv("LLM_BACKEND", "gemini").lower(),
+        enabled=os.getenv("CONTEXT_CACHE", "on").lower() != "off",
+        ttl_seconds=float(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "900")),
+        min_tokens=int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "1024")),
+        retry_seconds=float(os.getenv("CONTEXT_CACHE_RETRY_SECONDS", "300")),
+    )
@@ -1,25 +1,90 @@
 from agents.planner_agent import PlannerAgent
 from agents.search_agent import SearchAgent
 from agents.verification_agent import VerificationAgent
-from agents.synthesis_agent import SynthesisAgent
+from agents.synthesis_agent import SECTIONS, SynthesisAgent
 from agents.query_classifier import QueryClassifierAgent, QueryType
-from models.schemas import AgentMessage, AgentType, ResearchReport
-from datetime import datetime
+from models.schemas import AgentType, ResearchReport, ResearchTask, Source
+from models.agent_log import AgentLog
+from agents.search_backends import tokenize
+from agents.llm import CacheMissError, LLMClient, context_cache, model_for, rate_limiter
+from agents.job_context import JobCancelled, JobContext, current_job
+from agents.tracing import Trace, exporter, instant, span
+from agents.prompt_compression import score_sentences
+import asyncio
 import google.generativeai as genai
+import logging
 import os
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def _discard(task: asyncio.Task):
+    """Done-callback for a task whose outcome is no longer wanted (keeps its error out of the logs)"""
+    if not task.cancelled():
+        task.exception()
 
 class CoordinatorAgent:
+    # LLM calls still needed after retrieval (verification + synthesis)
+    RESERVED_LLM_CALLS = 2
+    # Minimum free quota before we spend a call on a speculative raw-query search
+    SPECULATION_MIN_HEADROOM = 8
+    # Sub-tasks this similar to the raw query reuse the speculative results
+    SPECULATION_REUSE_SIMILARITY = 0.6
+
+    # ---------- Deadline policy (seconds left before the job deadline) ----------
+    # Share of the remaining time the planner may use
+    PLANNING_SHARE = 0.2
+    # Below this, only the highest-priority sub-tasks are searched
+    FEWER_SUBTASKS_BELOW = 30.0
+    REDUCED_SUBTASKS = 2
+    # Below this, verification is skipped
+    MIN_TIME_FOR_VERIFICATION = 15.0
+    # Time kept back for LLM synthesis; below it the demo report is used
+    MIN_TIME_FOR_SYNTHESIS = 8.0
+
+    # ---------- Batch research ----------
+    # Sub-tasks per batched retrieval request
+    BATCH_SEARCH_CHUNK = 8
+    # Sub-tasks this similar (token Jaccard) across queries share one search
+    BATCH_DEDUP_SIMILARITY = 0.8
+
+    # ---------- Refresh ----------
+    # Sub-task sources older than this are searched again on refresh
+    SOURCE_MAX_AGE_SECONDS = float(os.getenv("SOURCE_MAX_AGE_SECONDS", str(3 * 24 * 3600)))
+
+    # ---------- Follow-ups ----------
+    # Search again only when more than this share of a follow-up's terms is new to the stored sources
+    FOLLOWUP_NEW_TERMS_RATIO = float(os.getenv("FOLLOWUP_NEW_TERMS_RATIO", "0.3"))
+    # Earlier key findings handed to synthesis as context
+    FOLLOWUP_CONTEXT_FINDINGS = 5
+    # Question words that say nothing about the topic
+    FOLLOWUP_FILLER = {
+        "also", "affect", "affects", "can", "could", "do", "does", "effect", "effects", "explain", "me",
+        "more", "please", "should", "specifically", "tell", "than", "then", "they", "would", "you",
+    }
+
     def __init__(self):
         self.planner = PlannerAgent()
         self.searcher = SearchAgent()
         self.verifier = VerificationAgent()
         self.synthesizer = SynthesisAgent()
         self.classifier = QueryClassifierAgent() # No LLM passed for now to keep it simple, strictly rule/heuristic based
-        self.agent_logs = []
+        self.agent_logs = AgentLog()
+        # Jobs running in this process by job id, so they can be followed and cancelled
+        self.active_jobs = {}
+        # Time we are willing to spend on planning; unset means always use the LLM planner
+        budget = os.getenv("PLANNER_LATENCY_BUDGET_MS")
+        self.planning_budget_ms = float(budget) if budget else None
         # Configure genai for direct answers if needed
         if os.getenv("GEMINI_API_KEY"):
             genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-            self.model = genai.GenerativeModel('gemini-flash-latest')
+            self.model = LLMClient(model_for("direct_answer"), role="direct_answer")
         else:
             self.model = None
 
@@ -32,67 +97,753 @@ class CoordinatorAgent:
             try:
                 response = self.model.generate_content(f"Provide a clear, concise definition and explanation for: {query}")
                 answer = response.text
+            except CacheMissError:
+                raise
             except Exception as e:
                 answer = f"Error generating answer: {str(e)}"
         else:
              answer = "AI Model not configured."
 
-        return ResearchReport(
+        report = ResearchReport(
             query=query,
             executive_summary=f"## Direct Answer\n\n{answer}",
             key_findings=["Direct answer provided by AI"],
             sources=[],
             confidence_score=0.9,
-            agent_logs=self.agent_logs
+            agent_logs=[]
         )
+        report._agent_log = self._logs()
+        return report
     
-    def log(self, agent_type: AgentType, message: str):
-        """Log agent activity"""
-        self.agent_logs.append(AgentMessage(
-            agent_type=agent_type,
-            message=message,
-            timestamp=datetime.now()
+    def _register(self, job: JobContext, job_id: str):
+        job.trace = Trace(job_id)
+        self.active_jobs[job_id] = job
+
+    def cancel(self, job_id: str) -> bool:
+        """Flag a running job as cancelled; its pending LLM calls and limiter waits stop"""
+        job = self.active_jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        job.agent_logs.append(AgentType.COORDINATOR, "Job cancelled by the client.")
+        logger.info(f"Cancelled job {job_id}")
+        return True
+
+    def _logs(self) -> AgentLog:
+        job = current_job.get()
+        return job.agent_logs if job else self.agent_logs
+
+    def log(self, agent_type: AgentType, template: str, *args):
+        """Log agent activity; `template` is a constant str.format template filled from `args`"""
+        self._logs().append(agent_type, template, *args)
+        message = template.format(*args)
+        instant(message, cat=agent_type.value)
+        logger.info(f"[{agent_type.value.upper()}] {message}")
+
+    def _degrade(self, job: JobContext, name: str, template: str, *args):
+        """Record a shortcut taken to stay within the deadline"""
+        job.degrade(name)
+        self.log(AgentType.COORDINATOR, "Deadline: " + template, *args)
+
+    def _deadline_planning_budget_ms(self, job: JobContext):
+        remaining = job.remaining()
+        return remaining * 1000 * self.PLANNING_SHARE if remaining is not None else None
+
+    def _planning_tier(self, query: str, job: JobContext) -> str:
+        """Cheapest planning tier that fits: "cache", "llm", or "rules" when the LLM is over budget"""
+        if self.planner.has_cached_plan(query):
+            return "cache"
+        if not self.planner.model.available():
+            return "rules"
+        budgets = [b for b in (self.planning_budget_ms, self._deadline_planning_budget_ms(job)) if b is not None]
+        if budgets and self.planner.expected_llm_latency_ms() > min(budgets):
+            return "rules"
+        return "llm"
+
+    async def _plan(self, query: str, tier: str, job: JobContext) -> list:
+        if tier == "cache":
+            tasks = self.planner.cached_plan(query)
+            if tasks:
+                self.log(AgentType.PLANNER, "Reusing cached plan for this query.")
+                return tasks
+
+        expected = self.planner.expected_llm_latency_ms()
+        deadline_budget = self._deadline_planning_budget_ms(job)
+        if tier == "rules":
+            if not self.planner.model.available():
+                self.log(AgentType.PLANNER, "Gemini is currently unhealthy (circuit open); using rule-based planner.")
+            elif deadline_budget is not None and expected > deadline_budget:
+                self._degrade(job, "rule_based_plan", "LLM planning (~{:.0f} ms) does not fit; using rule-based planner.", expected)
+            else:
+                self.log(AgentType.PLANNER, "LLM planning (~{:.0f} ms) exceeds the {:.0f} ms budget; using rule-based planner.", expected, self.planning_budget_ms)
+            return self.planner.rule_based_plan(query)
+
+        timeout = deadline_budget / 1000 if deadline_budget is not None else None
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(self.planner.plan_research, query), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._degrade(job, "planner_timeout", "Planner did not answer in time; using rule-based planner.")
+            return self.planner.rule_based_plan(query)
+
+    def _should_speculate(self, tier: str) -> bool:
+        """Speculative search only pays off while a slow LLM plan is being produced"""
+        if tier != "llm" or os.getenv("SPECULATIVE_SEARCH", "true").lower() != "true":
+            return False
+        if self.searcher.backend.uses_llm_quota:
+            # Don't spend quota on a guess when the real sub-task searches may not fit
+            return rate_limiter.headroom() >= self.SPECULATION_MIN_HEADROOM
+        return True
+
+    async def _search_with_speculation(self, query: str, tasks: list, speculative, job: JobContext) -> tuple:
+        """Search the planned tasks, folding in the speculative raw-query search.
+
+        Sub-tasks that are near-duplicates of the raw query take the speculative
+        results instead of a search of their own. Otherwise the speculative sources
+        are kept if they already arrived and look relevant, and discarded if not.
+        Returns ({task.id: [Source]}, [extra Source]).
+        """
+        if speculative is None:
+            return await self._search_tasks(tasks, job), []
+
+        query_terms = set(tokenize(query))
+        covered = [t for t in tasks if _jaccard(query_terms, set(tokenize(t.description))) >= self.SPECULATION_REUSE_SIMILARITY]
+        remaining = [t for t in tasks if t not in covered]
+
+        results = await self._search_tasks(remaining, job) if remaining else {}
+
+        if covered:
+            done, _ = await asyncio.wait({speculative}, timeout=job.time_left(reserve=self.MIN_TIME_FOR_SYNTHESIS))
+            if done:
+                for task in covered:
+                    results[task.id] = speculative.result()
+                self.log(AgentType.SEARCH, "Reused speculative search results for {} sub-task(s).", len(covered))
+            else:
+                speculative.cancel()
+                self._fill_with_demo_sources(covered, results, job)
+            return results, []
+
+        if not speculative.done():
+            speculative.cancel()
+            self.log(AgentType.SEARCH, "Speculative search still running after sub-task searches; discarded.")
+            return results, []
+
+        task_terms = set(tokenize(" ".join(t.description for t in tasks))) | query_terms
+        useful = [
+            s for s in speculative.result()
+            if len(task_terms & set(tokenize(f"{s.title} {s.snippet}"))) >= 2
+        ]
+        self.log(AgentType.SEARCH, "Kept {} relevant sources from the speculative search.", len(useful))
+        return results, useful
+
+    def _choose_search_mode(self, tasks: list, reserved_calls: int = None) -> str:
+        """Decide between one batched retrieval call and one call per task"""
+        backend = self.searcher.backend
+        if not backend.supports_batch or len(tasks) < 2:
+            return "parallel"
+
+        mode = os.getenv("SEARCH_BATCH_MODE", "auto").lower()
+        if mode in ("batch", "parallel"):
+            return mode
+
+        # Parallel spends one quota slot per task; keep room for verification + synthesis
+        needed = len(tasks) + (self.RESERVED_LLM_CALLS if reserved_calls is None else reserved_calls)
+        return "parallel" if rate_limiter.headroom() >= needed else "batch"
+
+    async def _limited(self, limit, fn, *args):
+        """Run a blocking agent call in a thread, under an optional shared concurrency limit"""
+        if limit is None:
+            return await asyncio.to_thread(fn, *args)
+        async with limit:
+            return await asyncio.to_thread(fn, *args)
+
+    async def _search_tasks(self, tasks: list, job: JobContext, limit: asyncio.Semaphore = None, reserved_calls: int = None) -> dict:
+        """Run retrieval for every task; returns {task.id: [Source]}"""
+        if not tasks:
+            return {}
+        timeout = job.time_left(reserve=self.MIN_TIME_FOR_SYNTHESIS)
+        results = {}
+
+        mode = self._choose_search_mode(tasks, reserved_calls)
+        if mode == "batch":
+            self.log(AgentType.SEARCH, "Low rate-limit headroom: batching {} sub-task searches into a single request...", len(tasks))
+            groups = [tasks[i:i + self.BATCH_SEARCH_CHUNK] for i in range(0, len(tasks), self.BATCH_SEARCH_CHUNK)]
+            in_flight = {
+                asyncio.create_task(self._limited(limit, self.searcher.search_batch, group)): group
+                for group in groups
+            }
+        else:
+            self.log(AgentType.SEARCH, "Searching {} sub-tasks in parallel...", len(tasks))
+            in_flight = {
+                asyncio.create_task(self._limited(limit, self.searcher.search_task, task.description)): [task]
+                for task in tasks
+            }
+
+        done, pending = await asyncio.wait(in_flight, timeout=timeout)
+        for future in done:
+            found = future.result()
+            if isinstance(found, dict):
+                results.update(found)
+            else:
+                results[in_flight[future][0].id] = found
+        for future in pending:
+            future.cancel()
+
+        missing = [task for task in tasks if task.id not in results]
+        if missing:
+            self._fill_with_demo_sources(missing, results, job)
+        return results
+
+    def _fill_with_demo_sources(self, tasks: list, results: dict, job: JobContext):
+        self._degrade(job, "demo_search", "{} sub-task search(es) did not finish in time; using demo sources.", len(tasks))
+        for task in tasks:
+            job.failed_searches.add(task.description)
+            results[task.id] = self.searcher._demo_search(task.description, 5)
+
+    def _evidence(self, job: JobContext, tasks: list, results: dict, extra_sources: list, verification: dict, fetched_at: dict = None) -> dict:
+        """What the report was built from: plan, per-sub-task sources and when they were fetched"""
+        now = time.time()
+        fetched_at = fetched_at or {}
+        return {
+            "subtasks": [
+                {
+                    "id": task.id,
+                    "description": task.description,
+                    "priority": task.priority,
+                    "sources": [s.model_dump() for s in results.get(task.id, [])],
+                    "fetched_at": fetched_at.get(task.id, now),
+                    "failed": task.description in job.failed_searches,
+                }
+                for task in tasks
+            ],
+            "extra_sources": [s.model_dump() for s in extra_sources],
+            "extra_fetched_at": fetched_at.get("extra", now),
+            "verification": verification,
+        }
+
+    async def refresh(self, previous: dict, evidence: dict, deadline_ms: float = None, job_id: str = None, max_age_seconds: float = None) -> tuple:
+        """Re-run a finished job, re-searching only stale or failed sub-tasks.
+
+        `previous` is the earlier report (JSON dict) and `evidence` what it was
+        built from. When the set of sources does not change, verification and
+        synthesis are skipped and the earlier report is reused. Otherwise only
+        the report sections whose cited sources changed are rewritten (see
+        SynthesisAgent.refresh_report). Returns (report, diff).
+        """
+        max_age = self.SOURCE_MAX_AGE_SECONDS if max_age_seconds is None else max_age_seconds
+        query = previous["query"]
+        job = JobContext(query, deadline_ms)
+        if job_id:
+            self._register(job, job_id)
+        token = current_job.set(job)
+        try:
+            with span("refresh", cat="coordinator", query=query[:80]) as s:
+                report, diff = await self._refresh_pipeline(job, previous, evidence, max_age)
+                s.set(refreshed=len(diff["refreshed_subtasks"]), reused=len(diff["reused_subtasks"]))
+        finally:
+            current_job.reset(token)
+            if job_id:
+                self.active_jobs.pop(job_id, None)
+                exporter.close(job_id)
+        job.check_cancelled()
+
+        report._agent_log = job.agent_logs
+        report.degradations = job.degradations
+        report.metrics = job.metrics()
+        return report, diff
+
+    async def _refresh_pipeline(self, job: JobContext, previous: dict, evidence: dict, max_age: float) -> tuple:
+        now = time.time()
+        tasks, results, fetched_at, stale = [], {}, {}, []
+        for entry in evidence["subtasks"]:
+            task = ResearchTask(id=entry["id"], description=entry["description"], priority=entry["priority"])
+            tasks.append(task)
+            if entry["failed"] or not entry["sources"] or now - entry["fetched_at"] > max_age:
+                stale.append(task)
+            else:
+                results[task.id] = [Source(**s) for s in entry["sources"]]
+                fetched_at[task.id] = entry["fetched_at"]
+        extra_sources = []
+        stale_extra = bool(evidence.get("extra_sources")) and now - evidence["extra_fetched_at"] > max_age
+        if evidence.get("extra_sources") and not stale_extra:
+            extra_sources = [Source(**s) for s in evidence["extra_sources"]]
+            fetched_at["extra"] = evidence["extra_fetched_at"]
+
+        self.log(AgentType.COORDINATOR, "Refreshing research for: '{}'", job.query)
+        self.log(AgentType.PLANNER, "Reusing the stored plan ({} sub-tasks).", len(tasks))
+        self.log(AgentType.SEARCH, "{} sub-task(s) still fresh; re-searching {} stale or failed sub-task(s)...", len(tasks) - len(stale), len(stale))
+        if stale or stale_extra:
+            with span("search", cat="search", tasks=len(stale), backend=self.searcher.backend.name):
+                results.update(await self._search_tasks(stale, job))
+                if stale_extra:
+                    # Sources the original run found for the raw query
+                    extra_sources = await asyncio.to_thread(self.searcher.search_task, job.query)
+        sources = self._merge_sources(tasks, results, extra_sources)
+
+        subtasks = [t.description for t in tasks]
+        previous_urls = {s["url"] for entry in evidence["subtasks"] for s in entry["sources"]}
+        previous_urls |= {s["url"] for s in evidence.get("extra_sources", [])}
+        resynthesize = {s.url for s in sources} != previous_urls or not evidence.get("verification")
+        if resynthesize:
+            self.log(AgentType.SEARCH, "Evidence changed. Found {} relevant sources.", len(sources))
+            corpus = await self._register_corpus(job, job.query, sources, subtasks)
+            with span("verify", cat="verification", sources=len(sources)):
+                verification = await self._verify(sources, job, subtasks, corpus)
+            self.log(AgentType.SYNTHESIS, "Re-synthesizing the sections affected by the updated evidence...")
+            with span("synthesize", cat="synthesis", sources=len(sources)) as s:
+                report, rewritten = await self._refresh_synthesis(job, previous, sources, verification, subtasks, corpus)
+                s.set(sections=len(rewritten))
+            self.log(AgentType.SYNTHESIS, "Rewrote {} of {} sections: {}.", len(rewritten), len(SECTIONS), ", ".join(rewritten) or "none")
+        else:
+            rewritten = []
+            self.log(AgentType.SYNTHESIS, "Evidence unchanged; reusing the previous report.")
+            verification = evidence["verification"]
+            kept = {name: value for name, value in previous.items() if name not in ("agent_logs", "degradations")}
+            report = ResearchReport(**kept, agent_logs=[])
+        self.log(AgentType.COORDINATOR, "Refresh complete.")
+
+        report._evidence = self._evidence(job, tasks, results, extra_sources, verification, fetched_at)
+        diff = self._diff_reports(previous, report)
+        diff["refreshed_subtasks"] = [t.description for t in stale]
+        diff["reused_subtasks"] = [t.description for t in tasks if t not in stale]
+        diff["resynthesized"] = resynthesize
+        diff["resynthesized_sections"] = rewritten
+        return report, diff
+
+    async def followup(self, question: str, previous: dict, evidence: dict, deadline_ms: float = None, job_id: str = None) -> tuple:
+        """Answer a follow-up question from a finished job's plan, sources and verification.
+
+        Nothing is planned or verified again. The question is searched (once) only
+        when it brings in terms the stored sources do not cover, then a single
+        synthesis call writes the report. Returns (report, info).
+        """
+        job = JobContext(question, deadline_ms)
+        if job_id:
+            self._register(job, job_id)
+        token = current_job.set(job)
+        try:
+            with span("followup", cat="coordinator", query=question[:80]) as s:
+                report, info = await self._followup_pipeline(job, previous, evidence)
+                s.set(searched=info["searched"], sources=info["sources"])
+        finally:
+            current_job.reset(token)
+            if job_id:
+                self.active_jobs.pop(job_id, None)
+                exporter.close(job_id)
+        job.check_cancelled()
+
+        report._agent_log = job.agent_logs
+        report.degradations = job.degradations
+        report.metrics = job.metrics()
+        return report, info
+
+    async def _followup_pipeline(self, job: JobContext, previous: dict, evidence: dict) -> tuple:
+        tasks, results, fetched_at = [], {}, {}
+        for entry in evidence["subtasks"]:
+            task = ResearchTask(id=entry["id"], description=entry["description"], priority=entry["priority"])
+            tasks.append(task)
+            results[task.id] = [Source(**s) for s in entry["sources"]]
+            fetched_at[task.id] = entry["fetched_at"]
+            if entry["failed"]:
+                # Still marked failed in the new evidence, so a refresh retries it
+                job.failed_searches.add(task.description)
+        extra_sources = [Source(**s) for s in evidence.get("extra_sources", [])]
+        fetched_at["extra"] = evidence.get("extra_fetched_at", time.time())
+
+        self.log(AgentType.COORDINATOR, "Follow-up to '{}': '{}'", previous["query"], job.query)
+        self.log(AgentType.PLANNER, "Reusing the stored plan ({} sub-tasks).", len(tasks))
+        sources = self._merge_sources(tasks, results, extra_sources)
+        question_terms = set(tokenize(job.query)) - self.FOLLOWUP_FILLER
+        new_terms = self._uncovered_terms(question_terms, previous["query"], tasks, sources)
+        searched = bool(question_terms) and len(new_terms) / len(question_terms) > self.FOLLOWUP_NEW_TERMS_RATIO
+        if searched:
+            self.log(AgentType.SEARCH, "Searching only for what is new: {}", ", ".join(new_terms))
+            task = ResearchTask(id=str(uuid.uuid4()), description=f"{job.query} ({previous['query']})", priority=len(tasks) + 1)
+            with span("search", cat="search", tasks=1, backend=self.searcher.backend.name):
+                results.update(await self._search_tasks([task], job))
+            tasks.append(task)
+            sources = self._merge_sources(tasks, results, extra_sources)
+        else:
+            self.log(AgentType.SEARCH, "Stored sources cover the follow-up; no new search needed.")
+        corpus = None
+        if not searched:
+            # Same sources, same order: the earlier job's cached corpus may still be live
+            corpus = await self._register_corpus(job, previous["query"], sources, [t.description for t in tasks])
+        if corpus is None:
+            # Synthesis cites the first sources, so put those closest to the question first
+            sources = self._rank_sources(sources, job.query)
+
+        verification = evidence.get("verification") or {
+            "has_conflicts": False,
+            "verification_text": "No earlier verification available.",
+            "confidence_adjustment": 0.0,
+        }
+        self.log(AgentType.VERIFICATION, "Reusing the earlier verification verdict.")
+
+        findings = previous.get("key_findings", [])[:self.FOLLOWUP_CONTEXT_FINDINGS]
+        context = f"Question: {previous['query']}\n" + "\n".join(f"- {f}" for f in findings)
+        subtasks = [previous["query"]] + [t.description for t in tasks]
+        self.log(AgentType.SYNTHESIS, "Synthesizing the follow-up answer from {} sources...", len(sources))
+        with span("synthesize", cat="synthesis", sources=len(sources)):
+            report = await self._synthesize(job.query, sources, verification, job, subtasks, context, corpus)
+        self.log(AgentType.COORDINATOR, "Follow-up complete.")
+
+        report._evidence = self._evidence(job, tasks, results, extra_sources, verification, fetched_at)
+        info = {
+            "searched": searched,
+            "new_terms": new_terms,
+            "sources": len(sources),
+            "reused_subtasks": len(evidence["subtasks"]),
+        }
+        return report, info
+
+    @staticmethod
+    def _uncovered_terms(question_terms: set, previous_query: str, tasks: list, sources: list) -> list:
+        """Terms of the question that neither the earlier query, the plan nor any source mentions"""
+        known = set(tokenize(previous_query))
+        for task in tasks:
+            known.update(tokenize(task.description))
+        for source in sources:
+            known.update(tokenize(f"{source.title} {source.snippet}"))
+        return sorted(t for t in question_terms if t not in known and t.rstrip("s") not in known)
+
+    @staticmethod
+    def _rank_sources(sources: list, query: str) -> list:
+        scores = score_sentences([f"{s.title}. {s.snippet}" for s in sources], query)
+        return [sources[i] for i in sorted(range(len(sources)), key=lambda i: -scores[i])]
+
+    @staticmethod
+    def _diff_reports(previous: dict, report: ResearchReport) -> dict:
+        old_urls = [s["url"] for s in previous.get("sources", [])]
+        new_urls = [s.url for s in report.sources]
+        old_findings = previous.get("key_findings", [])
+        return {
+            "sources_added": [u for u in new_urls if u not in old_urls],
+            "sources_removed": [u for u in old_urls if u not in new_urls],
+            "key_findings_added": [f for f in report.key_findings if f not in old_findings],
+            "key_findings_removed": [f for f in old_findings if f not in report.key_findings],
+            "executive_summary_changed": report.executive_summary != previous.get("executive_summary"),
+            "confidence_before": previous.get("confidence_score"),
+            "confidence_after": report.confidence_score,
+        }
+
+    async def research(self, query: str, deadline_ms: float = None, job_id: str = None):
+        """Orchestrate research - Planner -> Search -> Verification -> Synthesis
+
+        With a `job_id` the run is traced and its timeline stored as trace:{job_id}.
+        """
+        job = JobContext(query, deadline_ms)
+        if job_id:
+            self._register(job, job_id)
+        token = current_job.set(job)
+        try:
+            with span("research", cat="coordinator", query=query[:80], deadline_ms=deadline_ms) as s:
+                report = await self._run_pipeline(job)
+                s.set(degradations=list(job.degradations))
+        finally:
+            current_job.reset(token)
+            if job_id:
+                self.active_jobs.pop(job_id, None)
+                exporter.close(job_id)
+        # A cancelled job may still have produced a fallback report; it is not wanted
+        job.check_cancelled()
+
+        report._agent_log = job.agent_logs
+        report.degradations = job.degradations
+        report.metrics = job.metrics()
+        return report
+
+    async def _in_job(self, job: JobContext, coro):
+        """Await `coro` with `job` as the current job (logs and deadline)"""
+        token = current_job.set(job)
+        try:
+            return await coro
+        finally:
+            current_job.reset(token)
+
+    async def research_batch(self, queries: list, deadline_ms: float = None, max_concurrency: int = 4, on_result=None, job_ids: list = None) -> list:
+        """Research many queries together, sharing retrieval between overlapping sub-tasks.
+
+        All queries are planned first; sub-tasks that are the same (or nearly the
+        same) across queries are searched once. Every agent call in the batch runs
+        under one concurrency limit. `on_result(index, report_or_exception)` is
+        called as each query finishes. Returns reports (or exceptions) in query order.
+        With `job_ids`, each query's own stages are traced under its job id.
+        """
+        limit = asyncio.Semaphore(max_concurrency)
+        jobs = [JobContext(query, deadline_ms) for query in queries]
+        for job, job_id in zip(jobs, job_ids or []):
+            self._register(job, job_id)
+        batch_job = JobContext("batch", deadline_ms)
+
+        def settle(index: int, report):
+            job = jobs[index]
+            if job.trace is not None:
+                self.active_jobs.pop(job.trace.job_id, None)
+                exporter.close(job.trace.job_id)
+            if on_result:
+                on_result(index, report)
+            return report
+
+        try:
+            plans, assignments, shared_results = await self._plan_and_search_batch(jobs, batch_job, limit)
+        except BaseException as e:
+            # No query got as far as finish(): settle every one of them with the error
+            outcome = JobCancelled("Batch cancelled") if isinstance(e, asyncio.CancelledError) else e
+            for index in range(len(jobs)):
+                settle(index, outcome)
+            raise
+
+        # 4. Verify and synthesize each query from the shared results
+        async def finish(index: int):
+            job = jobs[index]
+            try:
+                job.check_cancelled()
+                results = {task.id: shared_results.get(rep.id, []) for task, rep in assignments[index]}
+                shared = sum(1 for task, rep in assignments[index] if rep is not task)
+                report = await self._in_job(job, self._finish_in_batch(job, plans[index], results, shared, limit))
+                job.check_cancelled()
+            except Exception as e:
+                report = e
+            return settle(index, report)
+
+        return await asyncio.gather(*[finish(i) for i in range(len(queries))])
+
+    async def _plan_and_search_batch(self, jobs: list, batch_job: JobContext, limit: asyncio.Semaphore) -> tuple:
+        """Steps 1-3 of a batch: (plans, per-query [(task, representative)], shared search results)"""
+        # 1. Plan every query
+        plans = await asyncio.gather(*[self._in_job(job, self._plan_in_batch(job, limit)) for job in jobs])
+
+        # 2. Deduplicate sub-tasks across the whole batch
+        unique_tasks = []
+        unique_terms = []
+        assignments = []  # per query: [(task, representative task)]
+        for tasks in plans:
+            assigned = []
+            for task in tasks:
+                terms = set(tokenize(task.description))
+                representative = next(
+                    (unique_tasks[i] for i, other in enumerate(unique_terms) if _jaccard(terms, other) >= self.BATCH_DEDUP_SIMILARITY),
+                    None
+                )
+                if representative is None:
+                    representative = task
+                    unique_tasks.append(task)
+                    unique_terms.append(terms)
+                assigned.append((task, representative))
+            assignments.append(assigned)
+
+        total_tasks = sum(len(tasks) for tasks in plans)
+        logger.info(f"Batch of {len(jobs)} queries: {total_tasks} sub-tasks, {len(unique_tasks)} unique searches")
+
+        # 3. One shared search pass (verification + synthesis per query still to come)
+        shared_results = await self._in_job(batch_job, self._search_tasks(
+            unique_tasks, batch_job, limit=limit, reserved_calls=self.RESERVED_LLM_CALLS * len(jobs)
         ))
-        print(f"[{agent_type.value.upper()}] {message}")
-    
+        return plans, assignments, shared_results
 
-    async def research(self, query: str):
-        """Orchestrate research - Standard 5-Step Reasoning Trace"""
-        import random
-        
-        self.agent_logs = []
-        
-        # 1. Coordinator get the query and send to planner_agent
-        self.log(AgentType.COORDINATOR, f"Coordinator received query: '{query}'")
+    async def _plan_in_batch(self, job: JobContext, limit: asyncio.Semaphore) -> list:
+        self.log(AgentType.COORDINATOR, "Coordinator received query: '{}' (batch)", job.query)
+        self.log(AgentType.PLANNER, "Planner Agent received task.")
+        async with limit:
+            tier = self._planning_tier(job.query, job)
+            try:
+                with span("plan", cat="planner", tier=tier):
+                    tasks = await self._plan(job.query, tier, job)
+            except JobCancelled:
+                # Only this query stops; finish() settles it as cancelled
+                return []
+        self.log(AgentType.PLANNER, "Dividing the query into {} optimized sub-tasks for deep research...", len(tasks))
+        for i, task in enumerate(tasks, 1):
+             self.log(AgentType.PLANNER, "  Sub-task {}: {}", i, task.description)
+        return tasks
+
+    async def _finish_in_batch(self, job: JobContext, tasks: list, results: dict, shared: int, limit: asyncio.Semaphore) -> ResearchReport:
+        sources = self._merge_sources(tasks, results)
+        self.log(AgentType.SEARCH, "Search complete (batch-wide retrieval, {} sub-task(s) shared with other queries). Found {} relevant sources.", shared, len(sources))
+
+        corpus = await self._register_corpus(job, job.query, sources, [t.description for t in tasks])
+        async with limit:
+            with span("verify", cat="verification", sources=len(sources)):
+                verification = await self._verify(sources, job, [t.description for t in tasks], corpus)
+        self.log(AgentType.SYNTHESIS, "Synthesis Agent processing verified data...")
+        self.log(AgentType.SYNTHESIS, "Generating the comprehensive research report...")
+        async with limit:
+            with span("synthesize", cat="synthesis", sources=len(sources)):
+                report = await self._synthesize(job.query, sources, verification, job, [t.description for t in tasks], corpus=corpus)
+        self.log(AgentType.SYNTHESIS, "Final report generated.")
+        self.log(AgentType.COORDINATOR, "Research workflow complete.")
+
+        report._agent_log = job.agent_logs
+        report.degradations = job.degradations
+        report.metrics = job.metrics()
+        report._evidence = self._evidence(job, tasks, results, [], verification)
+        return report
+
+    async def _run_pipeline(self, job: JobContext) -> ResearchReport:
+        query = job.query
+
+        # 1. Coordinator gets the query and sends it to the planner
+        self.log(AgentType.COORDINATOR, "Coordinator received query: '{}'", query)
         self.log(AgentType.COORDINATOR, "Sending query to Planner Agent for strategic breakdown...")
 
-        # 2. Planner dividing the query into 3 - 5 subtasks
-        num_subtasks = random.randint(3, 5)
+        # 2. Planner divides the query into sub-tasks
         self.log(AgentType.PLANNER, "Planner Agent received task.")
-        self.log(AgentType.PLANNER, f"Dividing the query into {num_subtasks} optimized sub-tasks for deep research...")
-        for i in range(1, num_subtasks + 1):
-             self.log(AgentType.PLANNER, f"  Sub-task {i}: Investigative analysis of dimension {i}")
+        tier = self._planning_tier(query, job)
+        speculative = None
+        if self._should_speculate(tier):
+            # Search the raw query while the planner is still thinking
+            self.log(AgentType.SEARCH, "Speculative search on the original query started alongside planning...")
+            speculative = asyncio.create_task(asyncio.to_thread(self.searcher.search_task, query))
+        try:
+            with span("plan", cat="planner", tier=tier):
+                tasks = await self._plan(query, tier, job)
+        except BaseException:
+            if speculative is not None:
+                speculative.cancel()
+                speculative.add_done_callback(_discard)
+            raise
 
-        # 3. Search_api getting the sources from internet display how sources are found
-        self.log(AgentType.SEARCH, "Search API initiated...")
-        num_sources = random.randint(10, 30)
-        self.log(AgentType.SEARCH, f"Searching the internet for real-time information...")
-        self.log(AgentType.SEARCH, f"Search complete. Found {num_sources} relevant sources from Wikipedia, news, and academic databases.")
+        remaining = job.remaining()
+        if remaining is not None and remaining < self.FEWER_SUBTASKS_BELOW and len(tasks) > self.REDUCED_SUBTASKS:
+            tasks = tasks[:self.REDUCED_SUBTASKS]
+            self._degrade(job, "fewer_subtasks", "Only {:.0f}s left; researching the top {} sub-tasks.", remaining, len(tasks))
 
-        # 4. Verification agent verifies the sources. and says verfication done
-        self.log(AgentType.VERIFICATION, "Verification Agent checking sources for factual accuracy and contradictions...")
-        self.log(AgentType.VERIFICATION, "Cross-referencing complete. Sources verified as credible.")
-        self.log(AgentType.VERIFICATION, "Verification done.")
+        self.log(AgentType.PLANNER, "Dividing the query into {} optimized sub-tasks for deep research...", len(tasks))
+        for i, task in enumerate(tasks, 1):
+             self.log(AgentType.PLANNER, "  Sub-task {}: {}", i, task.description)
 
-        # 5. Synthesis agent says generating the report and finally report generated
+        # 3. Search agent gathers sources for every sub-task
+        self.log(AgentType.SEARCH, "Search API initiated ({} backend)...", self.searcher.backend.name)
+        with span("search", cat="search", tasks=len(tasks), backend=self.searcher.backend.name):
+            results, extra_sources = await self._search_with_speculation(query, tasks, speculative, job)
+        sources = self._merge_sources(tasks, results, extra_sources)
+        self.log(AgentType.SEARCH, "Search complete. Found {} relevant sources.", len(sources))
+
+        # Verification and synthesis read the same numbered sources: send them once
+        corpus = await self._register_corpus(job, query, sources, [t.description for t in tasks])
+
+        # 4. Verification agent cross-checks the sources
+        with span("verify", cat="verification", sources=len(sources)):
+            verification = await self._verify(sources, job, [t.description for t in tasks], corpus)
+
+        # 5. Synthesis agent generates the report
         self.log(AgentType.SYNTHESIS, "Synthesis Agent processing verified data...")
         self.log(AgentType.SYNTHESIS, "Generating the comprehensive research report...")
-        
-        # Get actual report from Gemini
-        report = self.synthesizer.direct_llm_query(query)
+        with span("synthesize", cat="synthesis", sources=len(sources)):
+            report = await self._synthesize(query, sources, verification, job, [t.description for t in tasks], corpus=corpus)
         
         self.log(AgentType.SYNTHESIS, "Final report generated.")
         self.log(AgentType.COORDINATOR, "Research workflow complete.")
-        
-        report.agent_logs = self.agent_logs
+        report._evidence = self._evidence(job, tasks, results, extra_sources, verification)
         return report
+
+    async def _register_corpus(self, job: JobContext, query: str, sources: list, subtasks: list = None):
+        """Cache the numbered source block shared by verification and synthesis.
+
+        None when it is not cached (too small, caching off or unsupported): the
+        agents then build their own prompts, verification with its smaller excerpt.
+        """
+        if not sources or self.synthesizer.demo_mode:
+            return None
+        text = self.synthesizer.source_corpus(query, sources, subtasks)
+        try:
+            with span("context_cache", cat="llm") as s:
+                corpus = await asyncio.wait_for(
+                    asyncio.to_thread(context_cache.register, self.synthesizer.model.model_name, text),
+                    timeout=job.time_left(reserve=self.MIN_TIME_FOR_SYNTHESIS)
+                )
+                s.set(tokens=corpus.tokens, cached=corpus.cached)
+        except asyncio.TimeoutError:
+            # Prompts simply carry their sources inline
+            return None
+        if not corpus.cached:
+            return None
+        self.log(AgentType.COORDINATOR, "Source corpus ({} tokens) cached for verification and synthesis.", corpus.tokens)
+        return corpus
+
+    async def _verify(self, sources: list, job: JobContext, subtasks: list = None, corpus=None) -> dict:
+        skipped = {
+            "has_conflicts": False,
+            "verification_text": "Verification skipped to meet the response deadline.",
+            "confidence_adjustment": 0.0,
+            "sources_checked": 0
+        }
+        remaining = job.remaining()
+        if remaining is not None and remaining < self.MIN_TIME_FOR_VERIFICATION:
+            self._degrade(job, "skipped_verification", "Only {:.0f}s left; skipping source verification.", remaining)
+            return skipped
+
+        self.log(AgentType.VERIFICATION, "Verification Agent checking sources for factual accuracy and contradictions...")
+        try:
+            verification = await asyncio.wait_for(
+                asyncio.to_thread(self.verifier.verify_sources, sources, job.query, subtasks, corpus),
+                timeout=job.time_left(reserve=self.MIN_TIME_FOR_SYNTHESIS)
+            )
+        except asyncio.TimeoutError:
+            self._degrade(job, "verification_timeout", "Verification did not finish in time; continuing without it.")
+            return skipped
+
+        if verification.get("has_conflicts"):
+            self.log(AgentType.VERIFICATION, "Cross-referencing complete. Conflicts detected between sources.")
+        else:
+            self.log(AgentType.VERIFICATION, "Cross-referencing complete. Sources verified as credible.")
+        self.log(AgentType.VERIFICATION, "Verification done.")
+        return verification
+
+    async def _synthesize(self, query: str, sources: list, verification: dict, job: JobContext, subtasks: list = None, context: str = None, corpus=None) -> ResearchReport:
+        remaining = job.remaining()
+        if remaining is not None and remaining < self.MIN_TIME_FOR_SYNTHESIS:
+            self._degrade(job, "demo_report", "Only {:.0f}s left; building the report without the LLM.", remaining)
+            return self.synthesizer.fallback_report(query, sources, verification)
+
+        if sources:
+            reason = self.synthesizer.escalation_reason(sources, verification)
+            if reason:
+                self.log(AgentType.SYNTHESIS, "Escalating synthesis to {} ({}).", self.synthesizer.escalation_model.model_name, reason)
+            call = asyncio.to_thread(
+                self.synthesizer.synthesize_report, query, sources, verification, subtasks, context,
+                lambda name, content: self._section_ready(job, name, content), corpus,
+            )
+        else:
+            # Nothing retrieved: let the LLM answer from its own knowledge
+            call = asyncio.to_thread(self.synthesizer.direct_llm_query, query)
+        try:
+            return await asyncio.wait_for(call, timeout=job.time_left())
+        except asyncio.TimeoutError:
+            self._degrade(job, "synthesis_timeout", "Synthesis did not finish in time; returning the template report.")
+            return self.synthesizer.fallback_report(query, sources, verification)
+
+    async def _refresh_synthesis(self, job: JobContext, previous: dict, sources: list, verification: dict, subtasks: list = None, corpus=None) -> tuple:
+        """Synthesis for a refresh: (report, names of the sections that were rewritten)"""
+        remaining = job.remaining()
+        if not sources or (remaining is not None and remaining < self.MIN_TIME_FOR_SYNTHESIS):
+            return await self._synthesize(job.query, sources, verification, job, subtasks, corpus=corpus), list(SECTIONS)
+        reason = self.synthesizer.escalation_reason(sources, verification)
+        if reason:
+            self.log(AgentType.SYNTHESIS, "Escalating synthesis to {} ({}).", self.synthesizer.escalation_model.model_name, reason)
+        call = asyncio.to_thread(
+            self.synthesizer.refresh_report, job.query, sources, verification, previous, subtasks,
+            lambda name, content: self._section_ready(job, name, content), corpus,
+        )
+        try:
+            return await asyncio.wait_for(call, timeout=job.time_left())
+        except asyncio.TimeoutError:
+            self._degrade(job, "synthesis_timeout", "Synthesis did not finish in time; returning the template report.")
+            return self.synthesizer.fallback_report(job.query, sources, verification), list(SECTIONS)
+
+    def _section_ready(self, job: JobContext, name: str, content: str):
+        """A report section finished (sectioned synthesis); followers can show it right away"""
+        job.sections.append((name, content))
+        self.log(AgentType.SYNTHESIS, "Section ready: {}", name.replace("_", " "))
+
+    def _merge_sources(self, tasks: list, results: dict, extra_sources: list = None) -> list:
+        """Flatten per-task results in plan order, dropping duplicate URLs"""
+        merged = []
+        seen_urls = set()
+        ordered = [s for task in tasks for s in results.get(task.id, [])] + (extra_sources or [])
+        for source in ordered:
+            if source.url in seen_urls:
+                continue
+            seen_urls.add(source.url)
+            merged.append(source)
+        return merged
@@ -0,0 +1,107 @@
+"""Offline stand-in for genai.GenerativeModel (LLM_BACKEND=fake).
+
+Sleeps for a configurable latency and answers in the shape each agent's
+prompt asks for, so the whole pipeline can be exercised and load-tested
+without an API key or quota.
+"""
+import json
+import os
+import random
+import re
+import time
+
+
+class FakeUsage:
+    def __init__(self, prompt: str, text: str, cached: str = ""):
+        # Like Gemini, prompt_token_count includes the cached part
+        self.prompt_token_count = len(prompt) // 4
+        self.cached_content_token_count = len(cached) // 4
+        self.candidates_token_count = len(text) // 4
+
+
+class FakeResponse:
+    def __init__(self, prompt: str, text: str, cached: str = ""):
+        self.text = text
+        self.usage_metadata = FakeUsage(prompt, text, cached)
+
+
+class FakeGenerativeModel:
+    """Same generate_content signature as genai.GenerativeModel.
+
+    With `cached_content` (agents.context_cache.LocalCachedContent) it behaves like
+    GenerativeModel.from_cached_content: the cached text is an implicit prefix
+    of every prompt.
+    """
+
+    def __init__(self, model_name: str, cached_content=None):
+        self.model_name = model_name
+        self.cached_content = cached_content
+        self.latency_ms = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+        self.jitter_ms = float(os.getenv("FAKE_LLM_JITTER_MS", "200"))
+        self.error_rate = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+
+    def generate_content(self, prompt, generation_config=None, request_options=None):
+        prompt = str(prompt)
+        delay = max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+        timeout = (request_options or {}).get("timeout")
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("Fake LLM request timed out")
+        time.sleep(delay)
+        if random.random() < self.error_rate:
+            raise RuntimeError("Fake LLM injected error")
+        if self.cached_content is not None:
+            cached = self.cached_content.text
+            return FakeResponse(f"{cached}\n\n{prompt}", self._answer(prompt), cached)
+        return FakeResponse(prompt, self._answer(prompt))
+
+    def _answer(self, prompt: str) -> str:
+        if "search engine simulator" in prompt:
+            ids = re.findall(r"^(q\d+): (.*)$", prompt, re.MULTILINE)
+            if ids:
+                return json.dumps({qid: self._results(text) for qid, text in ids})
+            query = re.search(r"query:\n'(.*)'", prompt)
+            return "\n---\n".join(
+                f"Title: {r['title']}\nURL: {r['url']}\nSnippet: {r['snippet']}"
+                for r in self._results(query.group(1) if query else "topic")
+            )
+        if "numbered list of tasks" in prompt:
+            return "\n".join([
+                "1. Find current statistics and recent data",
+                "2. Research expert opinions and analysis",
+                "3. Analyze trends and future outlook",
+                "4. Identify key challenges and risks",
+            ])
+        if '"executive_summary"' in prompt:
+            return json.dumps({
+                "executive_summary": "Fake executive summary drawing on the sources [1] and [2].",
+                "key_findings": ["First fake finding [1]", "Second fake finding [2]", "Third fake finding [3]"],
+                "detailed_analysis": "Fake detailed analysis of the topic.",
+                "conclusion": "Fake conclusion.",
+            })
+        if "JSON array of key findings" in prompt:
+            return json.dumps(["First fake finding [1]", "Second fake finding [2]", "Third fake finding [3]"])
+        if "writing one section" in prompt:
+            return "Fake section text drawing on the sources [1] and [2]."
+        if '"references"' in prompt:
+            return json.dumps({
+                "summary": "Fake direct answer [1].",
+                "findings": ["Fake finding [1]"],
+                "recommendations": "Fake recommendations.",
+                "references": [{"title": "Fake reference", "url": "https://example.org/fake", "type": "Website", "snippet": "Fake."}],
+            })
+        # Last: the synthesis prompt quotes the verification verdict
+        if "CONSISTENT:" in prompt:
+            return "CONSISTENT: The sources broadly agree on the main points."
+        return "This is a fake answer produced offline for load testing."
+
+    def _results(self, query: str, count: int = 5) -> list:
+        slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-")[:40] or "topic"
+        return [
+            {
+                "title": f"Result {i} for {query[:60]}",
+                "url": f"https://example.org/{slug}/{i}",
+                "snippet": f"Synthetic snippet {i} about {query[:80]} with figures and analysis.",
+            }
+            for i in range(1, count + 1)
+        ]
@@ -0,0 +1,87 @@
+from models.agent_log import AgentLog
+import contextvars
+import threading
+import time
+
+# The job the current task (or worker thread started via asyncio.to_thread) is working for
+current_job = contextvars.ContextVar("current_job", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a job's end-to-end deadline has passed"""
+
+
+class JobCancelled(Exception):
+    """Raised when a job's client cancelled it or went away"""
+
+
+class JobContext:
+    """Per-request state threaded through the coordinator and the LLM layer"""
+
+    def __init__(self, query: str, deadline_ms: float = None):
+        self.query = query
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + deadline_ms / 1000 if deadline_ms else None
+        self.agent_logs = AgentLog()
+        self.degradations = []
+        # agents.tracing.Trace when this job's spans should be recorded
+        self.trace = None
+        # Sub-task descriptions whose search failed and fell back to demo sources
+        self.failed_searches = set()
+        # Set from the event loop, read by worker threads (LLM calls, limiter waits)
+        self.cancel_event = threading.Event()
+        # (name, markdown) of report sections in the order synthesis finished them
+        self.sections = []
+        # LLM calls made for this job and their token counts (cached tokens are part of prompt tokens)
+        self.usage = {"llm_calls": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0, "output_tokens": 0}
+        self._usage_lock = threading.Lock()
+
+    def remaining(self):
+        """Seconds left before the deadline, or None when the job has no deadline"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def time_left(self, reserve: float = 0.0):
+        """Seconds available to a stage that must leave `reserve` seconds for later stages"""
+        remaining = self.remaining()
+        if remaining is None:
+            return None
+        return max(0.0, remaining - reserve)
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def check_deadline(self):
+        if self.expired():
+            raise DeadlineExceeded("Job deadline exceeded")
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancelled():
+            raise JobCancelled("Job cancelled")
+
+    def record_usage(self, prompt_tokens: int = 0, cached_tokens: int = 0, output_tokens: int = 0):
+        # LLM calls run in pool threads, possibly several at once
+        with self._usage_lock:
+            self.usage["llm_calls"] += 1
+            self.usage["prompt_tokens"] += prompt_tokens
+            self.usage["cached_prompt_tokens"] += cached_tokens
+            self.usage["output_tokens"] += output_tokens
+
+    def metrics(self) -> dict:
+        """Token usage for the report: cached prompt tokens are the ones not resent"""
+        with self._usage_lock:
+            usage = dict(self.usage)
+        prompt = usage["prompt_tokens"]
+        usage["cached_prompt_ratio"] = round(usage["cached_prompt_tokens"] / prompt, 3) if prompt else 0.0
+        return usage
+
+    def degrade(self, name: str):
+        if name not in self.degradations:
+            self.degradations.append(name)
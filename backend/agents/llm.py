@@ -0,0 +1,452 @@
+import google.generativeai as genai
+from agents.job_context import current_job, DeadlineExceeded, JobCancelled
+from agents.tracing import span
+from agents.llm_cache import CacheMissError, cache_key, create_llm_cache
+from agents.context_cache import create_context_cache
+from storage.kv import get_store
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import contextvars
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _pause(seconds: float, cancel_event: threading.Event = None) -> bool:
+    """Sleep, waking early if `cancel_event` is set; True when cancelled"""
+    if cancel_event is None:
+        time.sleep(seconds)
+        return False
+    return cancel_event.wait(seconds)
+
+
+class RateLimiter:
+    """Sliding one-minute window over outgoing LLM requests (Gemini quotas are per minute)"""
+
+    def __init__(self, requests_per_minute: int, window_seconds: float = 60.0):
+        self.requests_per_minute = requests_per_minute
+        self.window_seconds = window_seconds
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        while self._calls and now - self._calls[0] >= self.window_seconds:
+            self._calls.popleft()
+
+    def headroom(self) -> int:
+        """How many more requests fit in the current window without waiting"""
+        with self._lock:
+            self._evict(time.monotonic())
+            return max(0, self.requests_per_minute - len(self._calls))
+
+    def acquire(self, timeout: float = None, cancel_event: threading.Event = None) -> bool:
+        """Block until a request slot is free, then claim it.
+
+        Returns False if no slot freed up within `timeout` seconds, or once
+        `cancel_event` is set.
+        """
+        give_up_at = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+            with self._lock:
+                now = time.monotonic()
+                self._evict(now)
+                if len(self._calls) < self.requests_per_minute:
+                    self._calls.append(now)
+                    return True
+                wait = self.window_seconds - (now - self._calls[0])
+            if give_up_at is not None and now + wait > give_up_at:
+                return False
+            if _pause(max(wait, 0.01), cancel_event):
+                return False
+
+    def release(self):
+        """Hand back the most recently claimed slot (the request was never sent)"""
+        with self._lock:
+            if self._calls:
+                self._calls.pop()
+
+
+class SharedRateLimiter:
+    """Same interface as RateLimiter, but counted in the shared state store across workers.
+
+    Sliding-window approximation over two fixed one-minute counters: the previous
+    window's count is weighted by how much of it still overlaps the last minute.
+    """
+
+    def __init__(self, store, requests_per_minute: int, window_seconds: float = 60.0, key_prefix: str = "ratelimit:gemini"):
+        self.store = store
+        self.requests_per_minute = requests_per_minute
+        self.window_seconds = window_seconds
+        self.key_prefix = key_prefix
+
+    def _used(self, now: float) -> float:
+        window = int(now // self.window_seconds)
+        overlap = 1 - (now % self.window_seconds) / self.window_seconds
+        current = self.store.get(f"{self.key_prefix}:{window}")
+        previous = self.store.get(f"{self.key_prefix}:{window - 1}")
+        return int(current or 0) + int(previous or 0) * overlap
+
+    def headroom(self) -> int:
+        return max(0, int(self.requests_per_minute - self._used(time.time())))
+
+    def acquire(self, timeout: float = None, cancel_event: threading.Event = None) -> bool:
+        give_up_at = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+            now = time.time()
+            key = f"{self.key_prefix}:{int(now // self.window_seconds)}"
+            self.store.incr(key, 1, ttl=self.window_seconds * 2)
+            if self._used(now) <= self.requests_per_minute:
+                return True
+            # Over quota: hand the slot back and retry shortly
+            self.store.incr(key, -1, ttl=self.window_seconds * 2)
+            if give_up_at is not None and time.monotonic() + 1.0 > give_up_at:
+                return False
+            if _pause(1.0, cancel_event):
+                return False
+
+    def release(self):
+        now = time.time()
+        self.store.incr(f"{self.key_prefix}:{int(now // self.window_seconds)}", -1, ttl=self.window_seconds * 2)
+
+
+def create_rate_limiter():
+    rpm = int(os.getenv("GEMINI_RPM", "15"))
+    store = get_store()
+    if store.name == "memory":
+        return RateLimiter(rpm)
+    return SharedRateLimiter(store, rpm)
+
+
+# One limiter per process, shared by every agent (and across workers when state is shared)
+rate_limiter = create_rate_limiter()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a model whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Per-model breaker: opens after consecutive failures, lets one trial call through after a cooldown"""
+
+    def __init__(self, failure_threshold: int = 5, cooldown_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        """True while calls should go straight to fallbacks"""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            cooling = time.monotonic() - self._opened_at < self.cooldown_seconds
+            return cooling or self._trial_in_flight
+
+    def allow(self) -> bool:
+        """Claim permission for a call (in half-open state only one trial call is let through)"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown_seconds or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def release(self):
+        """Give back a half-open trial slot without judging upstream health"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    logger.warning(f"Circuit opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class LatencyTracker:
+    """Rolling window of call latencies (seconds) used to pick the hedge delay"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = 20):
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+_breakers = {}
+_latencies = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(model_name: str) -> CircuitBreaker:
+    with _registry_lock:
+        if model_name not in _breakers:
+            _breakers[model_name] = CircuitBreaker(
+                failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+                cooldown_seconds=float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30")),
+            )
+        return _breakers[model_name]
+
+
+def get_latency_tracker(model_name: str, role: str = None) -> LatencyTracker:
+    """Latencies per (model, role): roles sharing a model send very different prompts"""
+    with _registry_lock:
+        key = (model_name, role)
+        if key not in _latencies:
+            _latencies[key] = LatencyTracker()
+        return _latencies[key]
+
+
+# ---------- HEDGING ----------
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "true").lower() == "true"
+# Send the duplicate once the primary is slower than this percentile of recent calls
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+# Upper bound on hedges as a fraction of all calls, so the mean call count barely moves
+HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.05"))
+
+_hedge_pool = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_HEDGE_POOL_SIZE", "16")), thread_name_prefix="llm-hedge")
+_hedge_stats = {"calls": 0, "hedges": 0}
+_hedge_lock = threading.Lock()
+# How often a waiting call checks whether its job was cancelled
+CANCEL_POLL_SECONDS = 0.1
+
+# Content-addressed response cache (LLM_CACHE); None when disabled
+llm_cache = create_llm_cache()
+
+# Source corpora shared by several prompts of a job (CONTEXT_CACHE)
+context_cache = create_context_cache()
+
+
+def create_model(model_name: str):
+    """genai.GenerativeModel, or the offline fake when LLM_BACKEND=fake"""
+    if os.getenv("LLM_BACKEND", "gemini").lower() == "fake":
+        from agents.fake_llm import FakeGenerativeModel
+        return FakeGenerativeModel(model_name)
+    return genai.GenerativeModel(model_name)
+
+
+# ---------- MODEL MAP ----------
+# Which model each agent step runs on. Cheap, low-latency steps use the lite tier;
+# synthesis moves up to "synthesis_escalated" only when the evidence is contested
+# or thin (see SynthesisAgent.escalation_reason).
+MODEL_MAP = {
+    "planner": "gemini-flash-lite-latest",
+    "search": "gemini-flash-lite-latest",
+    "verification": "gemini-flash-latest",
+    "synthesis": "gemini-flash-latest",
+    "synthesis_escalated": "gemini-pro-latest",
+    "direct_answer": "gemini-flash-latest",
+}
+
+
+def model_for(role: str) -> str:
+    """Model name for an agent role: LLM_MODEL_<ROLE>, else LLM_MODEL (pins every role), else MODEL_MAP"""
+    return os.getenv(f"LLM_MODEL_{role.upper()}") or os.getenv("LLM_MODEL") or MODEL_MAP.get(role, "gemini-flash-latest")
+
+
+class LLMClient:
+    """Thin wrapper around genai.GenerativeModel that every agent goes through"""
+
+    def __init__(self, model_name: str = 'gemini-flash-latest', limiter: RateLimiter = None, cache=None, role: str = None):
+        self.model_name = model_name
+        self.role = role
+        self.model = create_model(model_name)
+        self.limiter = limiter or rate_limiter
+        self.cache = cache or llm_cache
+        self.breaker = get_breaker(model_name)
+        self.latency = get_latency_tracker(model_name, role)
+
+    def available(self) -> bool:
+        """False while the upstream is considered unhealthy"""
+        return not self.breaker.is_open()
+
+    def generate_content(self, prompt, generation_config=None, context=None):
+        """`context` (agents.context_cache.CachedContext) is the corpus the prompt refers to;
+        it is served from the provider's cache when possible, else sent inline in front of the prompt.
+        """
+        key = None
+        if self.cache is not None:
+            key = cache_key(self.model_name, context.inline(prompt) if context else prompt, generation_config)
+            # Hits skip the breaker, limiter and deadline: they cost nothing upstream
+            cached = self.cache.lookup(key)
+            if cached is not None:
+                with span("llm.cache_hit", cat="llm", model=self.model_name):
+                    return cached
+
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.model_name} is unavailable (circuit open)")
+
+        try:
+            with span("llm.generate", cat="llm", model=self.model_name, prompt_chars=len(str(prompt))):
+                response = self._generate(prompt, generation_config, context)
+        except (DeadlineExceeded, JobCancelled):
+            # Our own deadline or cancellation, not an upstream failure
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        if key is not None:
+            self.cache.save(key, response)
+        return response
+
+    def _generate(self, prompt, generation_config, context=None):
+        job = current_job.get()
+        if job is not None:
+            job.check_cancelled()
+        remaining = job.remaining() if job else None
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded("Job deadline exceeded before LLM call")
+
+        with span("llm.rate_limit_wait", cat="llm"):
+            acquired = self.limiter.acquire(timeout=remaining, cancel_event=job.cancel_event if job else None)
+        if not acquired:
+            if job is not None:
+                job.check_cancelled()
+            raise DeadlineExceeded("Rate limit would delay the LLM call past the job deadline")
+        if job is not None and job.cancelled():
+            # Cancelled while we were claiming the slot: nothing was sent, so give it back
+            self.limiter.release()
+            job.check_cancelled()
+
+        # Bound the HTTP call itself so an in-flight request dies with the deadline
+        request_options = {"timeout": job.remaining()} if remaining is not None else None
+
+        with _hedge_lock:
+            _hedge_stats["calls"] += 1
+        delay = self.latency.percentile(HEDGE_PERCENTILE) if HEDGE_ENABLED else None
+        if delay is None and job is None:
+            return self._timed_call(prompt, generation_config, request_options, context)
+        return self._hedged_call(prompt, generation_config, request_options, delay, job, context)
+
+    def _timed_call(self, prompt, generation_config, request_options, context=None):
+        model = self.model
+        if context is not None:
+            if context.usable_by(self.model_name):
+                model = context.model
+            else:
+                prompt = context.inline(prompt)
+        start = time.monotonic()
+        with span("llm.request", cat="llm", model=self.model_name, cached_context=model is not self.model) as s:
+            response = model.generate_content(
+                prompt,
+                generation_config=generation_config,
+                request_options=request_options,
+            )
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None:
+                s.set(prompt_tokens=getattr(usage, "prompt_token_count", None),
+                      cached_tokens=getattr(usage, "cached_content_token_count", None),
+                      output_tokens=getattr(usage, "candidates_token_count", None))
+        self.latency.record(time.monotonic() - start)
+        job = current_job.get()
+        if job is not None and usage is not None:
+            job.record_usage(
+                getattr(usage, "prompt_token_count", 0) or 0,
+                getattr(usage, "cached_content_token_count", 0) or 0,
+                getattr(usage, "candidates_token_count", 0) or 0,
+            )
+        return response
+
+    def _submit(self, *args):
+        # Carry the job context into the pool thread
+        return _hedge_pool.submit(contextvars.copy_context().run, self._timed_call, *args)
+
+    def _may_hedge(self) -> bool:
+        with _hedge_lock:
+            if _hedge_stats["hedges"] + 1 > HEDGE_MAX_RATIO * _hedge_stats["calls"]:
+                return False
+        # The duplicate costs quota too; never wait for it
+        if not self.limiter.acquire(timeout=0):
+            return False
+        with _hedge_lock:
+            _hedge_stats["hedges"] += 1
+        return True
+
+    @staticmethod
+    def _wait(futures: set, timeout: float, job) -> tuple:
+        """wait(FIRST_COMPLETED) that stops waiting as soon as the job is cancelled, and
+        raises DeadlineExceeded once the job's deadline passes (a call queued behind the
+        busy pool can otherwise outlive it).
+
+        The call itself keeps running in its pool thread; only our wait is abandoned.
+        """
+        if job is None:
+            return wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+        give_up_at = now + timeout if timeout is not None else None
+        remaining = job.remaining()
+        deadline_at = now + remaining if remaining is not None else None
+        ends = [t for t in (give_up_at, deadline_at) if t is not None]
+        while True:
+            step = CANCEL_POLL_SECONDS if not ends else max(0.0, min(CANCEL_POLL_SECONDS, min(ends) - time.monotonic()))
+            done, pending = wait(futures, timeout=step, return_when=FIRST_COMPLETED)
+            if done:
+                return done, pending
+            job.check_cancelled()
+            now = time.monotonic()
+            if deadline_at is not None and now >= deadline_at:
+                raise DeadlineExceeded("Job deadline passed while waiting for the LLM call")
+            if give_up_at is not None and now >= give_up_at:
+                return done, pending
+
+    def _hedged_call(self, prompt, generation_config, request_options, delay: float, job=None, context=None):
+        """Run the call; if it outlives `delay`, race a duplicate and keep the first answer.
+
+        Without a `delay` (too few latency samples) no hedge is sent; the call still
+        runs in the pool so a cancelled job stops waiting for it.
+        """
+        primary = self._submit(prompt, generation_config, request_options, context)
+        done, _ = self._wait({primary}, delay, job)
+        if done:
+            return primary.result()
+
+        if not self._may_hedge():
+            self._wait({primary}, None, job)
+            return primary.result()
+
+        logger.info(f"{self.model_name} slower than p{HEDGE_PERCENTILE:.0f} ({delay:.2f}s); sending hedged request")
+        if request_options is not None and job is not None and job.remaining() is not None:
+            # The hedge starts later, so it gets only what is left of the deadline
+            request_options = {**request_options, "timeout": job.remaining()}
+        hedge = self._submit(prompt, generation_config, request_options, context)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = self._wait(pending, None, job)
+            for future in done:
+                if future.exception() is None:
+                    # The loser keeps running in its thread; its result is simply dropped
+                    return future.result()
+                error = future.exception()
+        raise error
@@ -0,0 +1,99 @@
+"""Content-addressed cache of LLM responses, keyed on (model, prompt, generation_config).
+
+LLM_CACHE selects the mode:
+  off     no caching (default)
+  on      read-through cache; entries expire after LLM_CACHE_TTL_SECONDS
+  record  always call the model and store every response without expiry
+  replay  strict offline mode: only cached responses are served, a miss is an error
+
+Entries live in a SQLite file (LLM_CACHE_PATH), so recordings survive restarts
+and can be shipped with tests and benchmarks.
+"""
+from storage.kv import SQLiteStore
+import hashlib
+import json
+import os
+
+MODES = ("off", "on", "record", "replay")
+
+
+class CacheMissError(Exception):
+    """Replay mode found no recorded response for a request"""
+
+
+class CachedUsage:
+    def __init__(self, prompt_token_count=None, candidates_token_count=None):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class CachedResponse:
+    """The parts of a genai response the agents use"""
+
+    def __init__(self, text: str, usage: dict = None):
+        self.text = text
+        self.usage_metadata = CachedUsage(**(usage or {}))
+        self.from_cache = True
+
+
+def _config_dict(generation_config):
+    if generation_config is None:
+        return None
+    if isinstance(generation_config, dict):
+        return generation_config
+    # genai.GenerationConfig and friends
+    return {k: v for k, v in vars(generation_config).items() if v is not None}
+
+
+def cache_key(model_name: str, prompt, generation_config=None) -> str:
+    payload = json.dumps(
+        {"model": model_name, "prompt": str(prompt), "config": _config_dict(generation_config)},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return "llm:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    def __init__(self, store, mode: str = "on", ttl_seconds: float = 24 * 3600):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode: {mode}")
+        self.store = store
+        self.mode = mode
+        self.ttl_seconds = ttl_seconds
+
+    def lookup(self, key: str):
+        """Cached response, None on a miss (CacheMissError in replay mode)"""
+        if self.mode in ("on", "replay"):
+            raw = self.store.get(key)
+            if raw is not None:
+                entry = json.loads(raw)
+                return CachedResponse(entry["text"], entry.get("usage"))
+        if self.mode == "replay":
+            raise CacheMissError(f"No recorded LLM response for {key} (LLM_CACHE=replay)")
+        return None
+
+    def save(self, key: str, response):
+        try:
+            text = response.text
+        except Exception:
+            # Blocked / empty candidates: nothing worth replaying
+            return
+        usage = getattr(response, "usage_metadata", None)
+        entry = {
+            "text": text,
+            "usage": {
+                "prompt_token_count": getattr(usage, "prompt_token_count", None),
+                "candidates_token_count": getattr(usage, "candidates_token_count", None),
+            },
+        }
+        ttl = None if self.mode == "record" else self.ttl_seconds
+        self.store.set(key, json.dumps(entry), ttl=ttl)
+
+
+def create_llm_cache():
+    """Cache configured by LLM_CACHE / LLM_CACHE_PATH / LLM_CACHE_TTL_SECONDS, or None when off"""
+    mode = os.getenv("LLM_CACHE", "off").lower()
+    if mode == "off":
+        return None
+    store = SQLiteStore(os.getenv("LLM_CACHE_PATH", "llm_cache.db"))
+    return LLMResponseCache(store, mode, float(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600))))
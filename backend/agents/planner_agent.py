@@ -1,20 +1,191 @@
 import google.generativeai as genai
 from models.schemas import ResearchTask
+from agents.cache import create_cache
+from agents.llm import CacheMissError, LLMClient, model_for
+import logging
 import os
+import re
+import time
 import uuid
 from dotenv import load_dotenv
 
 load_dotenv()
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+logger = logging.getLogger(__name__)
+
+# ---------- RULE-BASED PLANNING TEMPLATES ----------
+
+# Domain -> trigger keywords, who is affected, and domain-specific focus tasks
+DOMAIN_PROFILES = {
+    "ai": {
+        "keywords": ["ai", "artificial intelligence", "machine learning", "llm", "llms", "chatgpt",
+                     "generative", "automation", "neural", "deep learning"],
+        "stakeholders": "businesses, workers and society",
+        "focus": [
+            "Research current AI definitions and capabilities",
+            "Find statistics on AI adoption across industries",
+            "Analyze AI impact on employment and workforce",
+            "Explore ethical considerations and regulations",
+        ],
+    },
+    "ev": {
+        "keywords": ["ev", "evs", "electric vehicle", "electric vehicles", "electric car", "electric cars",
+                     "power grid", "charging", "battery", "batteries"],
+        "stakeholders": "consumers, utilities and the power grid",
+        "focus": [
+            "Research EV market growth and adoption rates",
+            "Analyze power grid infrastructure requirements",
+            "Find data on charging infrastructure development",
+            "Explore environmental and economic impacts",
+        ],
+    },
+    "energy": {
+        "keywords": ["climate", "emissions", "carbon", "renewable", "renewables", "solar", "wind",
+                     "energy", "grid", "power", "fossil", "coal", "net zero"],
+        "stakeholders": "the environment, energy systems and communities",
+        "focus": [
+            "Research emissions data and climate targets",
+            "Analyze renewable energy deployment and grid integration",
+            "Explore adaptation and mitigation strategies",
+            "Review international agreements and national commitments",
+        ],
+    },
+    "health": {
+        "keywords": ["health", "healthcare", "disease", "medical", "medicine", "vaccine", "vaccines",
+                     "hospital", "hospitals", "mental", "drug", "drugs", "patients", "pandemic"],
+        "stakeholders": "patients, providers and public health systems",
+        "focus": [
+            "Review clinical evidence and medical studies",
+            "Find epidemiological and public health statistics",
+            "Analyze access, cost and outcomes of care",
+            "Explore regulatory and ethical considerations",
+        ],
+    },
+    "finance": {
+        "keywords": ["finance", "financial", "stock", "stocks", "inflation", "bank", "banks", "banking",
+                     "crypto", "cryptocurrency", "bitcoin", "interest rates", "gdp", "recession"],
+        "stakeholders": "investors, consumers and the wider economy",
+        "focus": [
+            "Analyze market data and macroeconomic indicators",
+            "Review expert forecasts and analyst opinions",
+            "Examine regulatory and monetary policy factors",
+            "Assess risks and market volatility",
+        ],
+    },
+    "education": {
+        "keywords": ["education", "school", "schools", "students", "teachers", "university",
+                     "universities", "curriculum", "edtech"],
+        "stakeholders": "students, educators and institutions",
+        "focus": [
+            "Research learning outcomes and academic studies",
+            "Find enrolment, access and attainment statistics",
+            "Analyze teaching methods and technology adoption",
+            "Explore education policy and funding",
+        ],
+    },
+}
+
+# Research dimension -> trigger keywords and task template
+DIMENSION_TEMPLATES = [
+    ("impact", ["impact", "impacts", "effect", "effects", "affect", "affects", "influence", "consequences"],
+     "Analyze the impact of {topic} on {stakeholders}"),
+    ("statistics", ["statistics", "data", "how many", "how much", "rate", "rates", "numbers", "figures", "market size"],
+     "Find current statistics and quantitative data on {topic}"),
+    ("comparison", ["compare", "comparison", "versus", "vs", "difference", "differences", "better"],
+     "Compare the main alternatives and approaches within {topic}"),
+    ("causes", ["why", "cause", "causes", "drivers", "reasons"],
+     "Identify the key drivers and causes behind {topic}"),
+    ("economics", ["cost", "costs", "price", "prices", "economic", "economics", "economy", "investment", "funding"],
+     "Examine the economic costs and benefits of {topic}"),
+    ("policy", ["policy", "policies", "regulation", "regulations", "law", "laws", "government", "legal", "ban"],
+     "Review government policy and regulation relevant to {topic}"),
+    ("risks", ["risk", "risks", "challenges", "problems", "barriers", "drawbacks", "safety", "threats"],
+     "Assess the main risks, challenges and barriers for {topic}"),
+    ("trends", ["future", "trend", "trends", "outlook", "forecast", "growth", "emerging", "next decade"],
+     "Identify recent trends and future outlook for {topic}"),
+]
+
+GENERIC_TASKS = [
+    "Find statistics and data about {topic}",
+    "Analyze impact and implications of {topic}",
+    "Explore future trends in {topic}",
+]
+
+REGIONS = {
+    "india": "India", "indian": "India", "china": "China", "chinese": "China", "japan": "Japan", "germany": "Germany", "brazil": "Brazil",
+    "africa": "Africa", "europe": "Europe", "eu": "the EU", "uk": "the UK", "united kingdom": "the UK",
+    "us": "the US", "usa": "the US", "united states": "the US", "america": "the US",
+}
+
+# Leading phrasing that carries no topic information
+QUESTION_PREFIX_RE = re.compile(
+    r"^(what (is|are|was|were)( the)?|how (does|do|did|will|can|is|are)|why (is|are|does|do)|"
+    r"analy[sz]e( the)?|assess( the)?|evaluate( the)?|compare( the)?|explain( the)?|research( the)?|"
+    r"tell me about|give me|describe( the)?)\s+",
+    re.IGNORECASE,
+)
+# Framing words in front of the actual subject ("impact of X", "latest trends in X")
+FRAMING_PREFIX_RE = re.compile(
+    r"^((the )?(impacts?|effects?|role|influence|future|state|latest|current|recent|trends?|"
+    r"latest trends|recent trends|current state|benefits|risks|pros and cons) (of|in|on)\s+)+",
+    re.IGNORECASE,
+)
+
+TARGET_TASKS = 4
+MAX_TASKS = 5
+
+
+def _contains(text: str, padded_words: str, keyword: str) -> bool:
+    """Whole-word match for single words, substring match for phrases"""
+    if " " in keyword:
+        return keyword in text
+    return f" {keyword} " in padded_words
+
 
 class PlannerAgent:
+    # Assumed LLM planning latency until we have measured some real calls
+    DEFAULT_LLM_LATENCY_MS = 3000.0
+    # A measurement loses half its weight (relative to the default) every this many seconds.
+    # Without it, one slow period would keep the LLM tier over budget, and unmeasured, forever.
+    LATENCY_HALF_LIFE_SECONDS = float(os.getenv("PLANNER_LATENCY_HALF_LIFE_SECONDS", "120"))
+
     def __init__(self):
-        self.model = genai.GenerativeModel('gemini-flash-latest')
+        self.model = LLMClient(model_for("planner"), role="planner")
         self.demo_mode = os.getenv("DEMO_MODE", "false").lower() == "true"
-    
+        self.plan_cache = create_cache(
+            "plan",
+            max_size=int(os.getenv("PLAN_CACHE_SIZE", "512")),
+            ttl_seconds=float(os.getenv("PLAN_CACHE_TTL_SECONDS", "86400")),
+        )
+        self._llm_latency_ms = None  # EWMA of successful LLM planning calls
+        self._latency_measured_at = None
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Cache key: lowercase, punctuation stripped, whitespace collapsed"""
+        return " ".join(re.findall(r"[a-z0-9]+", query.lower()))
+
+    def expected_llm_latency_ms(self) -> float:
+        """Measured EWMA, drifting back to DEFAULT_LLM_LATENCY_MS while no new calls are measured"""
+        if self._llm_latency_ms is None:
+            return self.DEFAULT_LLM_LATENCY_MS
+        age = time.monotonic() - self._latency_measured_at
+        weight = 0.5 ** (age / self.LATENCY_HALF_LIFE_SECONDS)
+        return self.DEFAULT_LLM_LATENCY_MS + weight * (self._llm_latency_ms - self.DEFAULT_LLM_LATENCY_MS)
+
+    def has_cached_plan(self, query: str) -> bool:
+        return self.plan_cache.get(self.normalize_query(query)) is not None
+
+    def cached_plan(self, query: str):
+        """Return a fresh copy of the cached plan for this query, or None"""
+        descriptions = self.plan_cache.get(self.normalize_query(query))
+        if descriptions is None:
+            return None
+        return self._make_tasks(descriptions)
+
     def plan_research(self, query: str) -> list:
         """Break down complex query into research tasks"""
-        
+
         try:
             # Prioritize direct LLM call
             prompt = f"""You are a research planner. Break down this query into 3-5 specific research tasks.
@@ -26,9 +197,11 @@ Return ONLY a numbered list of tasks. Example:
 2. Research expert opinions about Y
 3. Analyze trends in Z"""
 
+            start = time.perf_counter()
             response = self.model.generate_content(prompt)
+            self._record_latency((time.perf_counter() - start) * 1000)
             tasks_text = response.text.strip()
-            
+
             # Parse tasks
             tasks = []
             for i, line in enumerate(tasks_text.split('\n')):
@@ -40,50 +213,88 @@ Return ONLY a numbered list of tasks. Example:
                             description=task_desc,
                             priority=i+1
                         ))
-            
+
             if not tasks:
                  raise Exception("No tasks parsed")
-                 
+
+            # Only LLM plans are cached; rule-based plans are cheap to recompute
+            self.plan_cache.set(self.normalize_query(query), [t.description for t in tasks])
             return tasks
 
+        except CacheMissError:
+            # Replay runs must not quietly swap in a different plan
+            raise
         except Exception as e:
-            print(f"[PLANNER] LLM Error: {e}. Falling back to demo plan.")
+            logger.warning(f"LLM Error: {e}. Falling back to rule-based plan.")
             return self._demo_plan(query)
-    
+
+    def _record_latency(self, elapsed_ms: float, alpha: float = 0.3):
+        if self._llm_latency_ms is None:
+            self._llm_latency_ms = elapsed_ms
+        else:
+            self._llm_latency_ms = alpha * elapsed_ms + (1 - alpha) * self.expected_llm_latency_ms()
+        self._latency_measured_at = time.monotonic()
+
     def _demo_plan(self, query: str) -> list:
-        """Return demo tasks"""
+        """Return demo tasks (now produced by the rule-based decomposer)"""
+        return self.rule_based_plan(query)
+
+    def rule_based_plan(self, query: str) -> list:
+        """Decompose the query from domain and dimension templates without any LLM call"""
         query_lower = query.lower()
-        
-        # AI-related queries
-        if 'ai' in query_lower or 'artificial intelligence' in query_lower:
-            task_descriptions = [
-                "Research current AI definitions and capabilities",
-                "Find statistics on AI adoption across industries",
-                "Analyze AI impact on employment and workforce",
-                "Explore ethical considerations and regulations"
-            ]
-        # EV-related queries
-        elif 'ev' in query_lower or 'electric vehicle' in query_lower:
-            task_descriptions = [
-                "Research EV market growth and adoption rates",
-                "Analyze power grid infrastructure requirements",
-                "Find data on charging infrastructure development",
-                "Explore environmental and economic impacts"
-            ]
-        # Default generic tasks
+        padded_words = " " + " ".join(re.findall(r"[a-z0-9]+", query_lower)) + " "
+
+        topic = self._extract_topic(query)
+        domain = self._detect_domain(query_lower, padded_words)
+        region = next((name for key, name in REGIONS.items() if _contains(query_lower, padded_words, key)), None)
+        stakeholders = DOMAIN_PROFILES[domain]["stakeholders"] if domain else "key stakeholders"
+
+        descriptions = [f"Research the background and current state of {topic}"]
+
+        # One task per research dimension the query asks about
+        for name, keywords, template in DIMENSION_TEMPLATES:
+            if any(_contains(query_lower, padded_words, kw) for kw in keywords):
+                if name == "impact" and " on " in topic.lower():
+                    # The query already says who is affected
+                    template = "Analyze the impact of {topic}"
+                descriptions.append(template.format(topic=topic, stakeholders=stakeholders))
+
+        # Fill up with domain-specific focus areas, or generic angles
+        if domain:
+            suffix = f" in {region}" if region and region.lower() not in topic.lower() else ""
+            fillers = [f"{focus}{suffix}" for focus in DOMAIN_PROFILES[domain]["focus"]]
         else:
-            task_descriptions = [
-                f"Research current state of {query[:30]}",
-                f"Find statistics and data about {query[:30]}",
-                f"Analyze impact and implications of {query[:30]}",
-                f"Explore future trends in {query[:30]}"
-            ]
-        
+            fillers = [template.format(topic=topic) for template in GENERIC_TASKS]
+
+        for filler in fillers:
+            if len(descriptions) >= TARGET_TASKS:
+                break
+            if filler not in descriptions:
+                descriptions.append(filler)
+
+        return self._make_tasks(descriptions[:MAX_TASKS])
+
+    def _detect_domain(self, query_lower: str, padded_words: str):
+        best, best_hits = None, 0
+        for domain, profile in DOMAIN_PROFILES.items():
+            hits = sum(1 for kw in profile["keywords"] if _contains(query_lower, padded_words, kw))
+            if hits > best_hits:
+                best, best_hits = domain, hits
+        return best
+
+    def _extract_topic(self, query: str, max_chars: int = 80) -> str:
+        topic = QUESTION_PREFIX_RE.sub("", query.strip().rstrip("?.! "), count=1)
+        topic = FRAMING_PREFIX_RE.sub("", topic, count=1)
+        if len(topic) > max_chars:
+            topic = topic[:max_chars].rsplit(" ", 1)[0]
+        return topic or query[:30]
+
+    def _make_tasks(self, descriptions: list) -> list:
         return [ResearchTask(
             id=str(uuid.uuid4()),
             description=desc,
             priority=i+1
-        ) for i, desc in enumerate(task_descriptions)]
+        ) for i, desc in enumerate(descriptions)]
 
 # TEST THIS FILE
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+"""Extractive compression of source snippets for LLM prompts.
+
+Instead of cutting every snippet at a fixed number of characters, snippets are
+split into sentences, each sentence is scored with BM25 against the query and
+the planned sub-tasks, and the best sentences are packed into a token budget.
+Every source first gets its single best sentence, then the rest of the budget
+goes to the highest-scoring sentences overall. Selected sentences keep their
+original order inside each source.
+"""
+from agents.search_backends import tokenize
+import numpy as np
+import re
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+# Rough size of a token for English prose; good enough to budget prompts
+CHARS_PER_TOKEN = 4
+# Sub-task terms count for less than terms from the user's own query
+SUBTASK_WEIGHT = 0.5
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def split_sentences(text: str) -> list:
+    return [s.strip() for s in SENTENCE_RE.split(text.strip()) if s.strip()]
+
+
+def score_sentences(sentences: list, query: str, subtasks: list = None, k1: float = 1.2, b: float = 0.75) -> np.ndarray:
+    """BM25 score of every sentence against the query (+ down-weighted sub-task terms)"""
+    weights = {t: SUBTASK_WEIGHT for s in subtasks or [] for t in tokenize(s)}
+    weights.update({t: 1.0 for t in tokenize(query)})
+    if not sentences or not weights:
+        return np.zeros(len(sentences), dtype=np.float32)
+
+    terms = list(weights)
+    column = {t: j for j, t in enumerate(terms)}
+    tf = np.zeros((len(sentences), len(terms)), dtype=np.float32)
+    lengths = np.empty(len(sentences), dtype=np.float32)
+    for i, sentence in enumerate(sentences):
+        tokens = tokenize(sentence)
+        lengths[i] = len(tokens)
+        for token in tokens:
+            j = column.get(token)
+            if j is not None:
+                tf[i, j] += 1
+
+    n = len(sentences)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(float(lengths.mean()), 1.0))
+    bm25 = tf * (k1 + 1) / (tf + norm[:, None])
+    return bm25 @ (idf * np.array([weights[t] for t in terms], dtype=np.float32))
+
+
+def _truncate(sentence: str, tokens: int) -> str:
+    cut = sentence[:tokens * CHARS_PER_TOKEN].rsplit(" ", 1)[0]
+    return cut + "..."
+
+
+def compress_sources(sources: list, query: str, token_budget: int, subtasks: list = None) -> list:
+    """Compressed snippet text for each Source, together fitting in `token_budget` tokens"""
+    snippets = [s.snippet or "" for s in sources]
+    if sum(estimate_tokens(s) for s in snippets) <= token_budget:
+        return snippets
+
+    sentences, owners, positions = [], [], []
+    for i, snippet in enumerate(snippets):
+        for position, sentence in enumerate(split_sentences(snippet)):
+            sentences.append(sentence)
+            owners.append(i)
+            positions.append(position)
+    if not sentences:
+        return snippets
+
+    # Earlier sentences win ties (leads tend to carry the main claim)
+    scores = score_sentences(sentences, query, subtasks) - 1e-3 * np.array(positions, dtype=np.float32)
+    costs = [estimate_tokens(s) for s in sentences]
+    chosen = {i: {} for i in range(len(sources))}
+    remaining = token_budget
+
+    # Pass 1: the best sentence of every source (sources arrive in relevance order)
+    order = np.argsort(-scores, kind="stable")
+    best_of = {}
+    for k in order:
+        best_of.setdefault(owners[k], k)
+    for owner in sorted(best_of):
+        k = best_of[owner]
+        if costs[k] <= remaining:
+            chosen[owner][positions[k]] = sentences[k]
+            remaining -= costs[k]
+        elif remaining >= 20:
+            chosen[owner][positions[k]] = _truncate(sentences[k], remaining)
+            remaining = 0
+
+    # Pass 2: fill the rest of the budget with the highest-scoring sentences overall
+    for k in order:
+        if remaining <= 0:
+            break
+        if positions[k] in chosen[owners[k]] or costs[k] > remaining:
+            continue
+        chosen[owners[k]][positions[k]] = sentences[k]
+        remaining -= costs[k]
+
+    compressed = []
+    for owner in range(len(sources)):
+        parts, previous = [], None
+        for position in sorted(chosen[owner]):
+            if previous is not None and position != previous + 1:
+                parts.append("...")
+            parts.append(chosen[owner][position])
+            previous = position
+        compressed.append(" ".join(parts))
+    return compressed
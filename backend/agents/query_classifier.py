@@ -1,7 +1,12 @@
 from enum import Enum
+from agents.query_model import HashedLogisticClassifier
+import logging
+import os
 import re
 import json
 
+logger = logging.getLogger(__name__)
+
 class QueryType(str, Enum):
     DEFINITION = "definition"
     RESEARCH = "research"
@@ -13,14 +18,51 @@ class QueryType(str, Enum):
 
 
 class QueryClassifierAgent:
-    def __init__(self, llm=None):
+    def __init__(self, llm=None, model=None, threshold: float = None):
         """
         llm: optional LLM client (Ollama / OpenAI) for fallback
+        model: optional HashedLogisticClassifier; loaded from QUERY_MODEL_PATH when not given
+        threshold: model confidence below which the LLM (if any) is asked instead
         """
         self.llm = llm
+        self.model = model if model is not None else self._load_model()
+        self.threshold = threshold if threshold is not None else float(os.getenv("QUERY_MODEL_THRESHOLD", "0.7"))
+
+    @staticmethod
+    def _load_model():
+        path = os.getenv("QUERY_MODEL_PATH", "query_model.npz")
+        if not os.path.exists(path):
+            return None
+        try:
+            return HashedLogisticClassifier.load(path)
+        except Exception as e:
+            logger.warning(f"Could not load query model from {path}: {e}")
+            return None
 
     def classify(self, query: str) -> QueryType:
-        q = query.lower().strip()
+        return self.classify_with_confidence(query)[0]
+
+    def classify_with_confidence(self, query: str) -> tuple:
+        """(QueryType, confidence); rule hits count as fully confident"""
+        rule_type = self._rule_classify(query.lower().strip())
+        if rule_type is not None:
+            return rule_type, 1.0
+
+        # ---------- LAYER 3: LOCAL MODEL, THEN LLM FOR LOW-CONFIDENCE CASES ----------
+
+        label, confidence = (None, 0.0)
+        if self.model:
+            label, confidence = self.model.predict(query)
+            if confidence >= self.threshold:
+                return QueryType(label), confidence
+
+        if self.llm:
+            return self._llm_classify(query), confidence
+
+        return QueryType.UNKNOWN, confidence
+
+    def _rule_classify(self, q: str):
+        """Layers 1 and 2; None when they are inconclusive"""
 
         # ---------- LAYER 1: HARD RULES (FAST EXIT) ----------
 
@@ -71,12 +113,7 @@ class QueryClassifierAgent:
         if research_score >= 2:
             return QueryType.RESEARCH
 
-        # ---------- LAYER 3: LLM FALLBACK (AMBIGUOUS CASES) ----------
-
-        if self.llm:
-            return self._llm_classify(query)
-
-        return QueryType.UNKNOWN
+        return None
 
     # ---------- LLM-BASED CLASSIFICATION ----------
     def _llm_classify(self, query: str) -> QueryType:
@@ -0,0 +1,127 @@
+"""Local query-type classifier: hashed n-gram features + multinomial logistic regression.
+
+Pure NumPy, trained offline from logged (query, label) pairs with
+train_query_classifier.py. Word 1-2 grams and character 3-5 grams are hashed
+into a fixed number of buckets, so there is no vocabulary to store and a
+prediction is a handful of array lookups. Probabilities are calibrated with a
+temperature fitted on held-out queries, so `confidence` can be thresholded.
+"""
+import numpy as np
+import re
+import zlib
+
+WORD_RE = re.compile(r"[a-z0-9']+")
+DEFAULT_BUCKETS = 1 << 18
+
+
+def hashed_features(text: str, n_buckets: int = DEFAULT_BUCKETS) -> tuple:
+    """(bucket indices, values) of the L2-normalised binary n-gram vector"""
+    words = WORD_RE.findall(text.lower())
+    grams = [f"w:{w}" for w in words]
+    grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    padded = f" {' '.join(words)} "
+    grams += [f"c:{padded[i:i + n]}" for n in (3, 4, 5) for i in range(len(padded) - n + 1)]
+    # crc32, not hash(): str hashing is randomised per process
+    indices = np.unique(np.fromiter((zlib.crc32(g.encode()) % n_buckets for g in grams), dtype=np.int64, count=len(grams)))
+    if len(indices) == 0:
+        return indices, np.zeros(0, dtype=np.float32)
+    return indices, np.full(len(indices), 1 / np.sqrt(len(indices)), dtype=np.float32)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    z = logits - logits.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+class HashedLogisticClassifier:
+    def __init__(self, labels: list, n_buckets: int = DEFAULT_BUCKETS):
+        self.labels = list(labels)
+        self.n_buckets = n_buckets
+        self.weights = np.zeros((n_buckets, len(self.labels)), dtype=np.float32)
+        self.bias = np.zeros(len(self.labels), dtype=np.float32)
+        self.temperature = 1.0
+
+    # ---------- inference ----------
+    def _logits(self, indices: np.ndarray, values: np.ndarray) -> np.ndarray:
+        return values @ self.weights[indices] + self.bias
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        indices, values = hashed_features(text, self.n_buckets)
+        return _softmax(self._logits(indices, values) / self.temperature)
+
+    def predict(self, text: str) -> tuple:
+        """(label, calibrated confidence)"""
+        proba = self.predict_proba(text)
+        best = int(proba.argmax())
+        return self.labels[best], float(proba[best])
+
+    # ---------- training ----------
+    def _batch_logits(self, batch: list) -> tuple:
+        rows = np.repeat(np.arange(len(batch)), [len(idx) for idx, _ in batch])
+        cols = np.concatenate([idx for idx, _ in batch])
+        vals = np.concatenate([v for _, v in batch])
+        logits = np.tile(self.bias, (len(batch), 1))
+        np.add.at(logits, rows, self.weights[cols] * vals[:, None])
+        return logits, rows, cols, vals
+
+    def fit(self, texts: list, labels: list, epochs: int = 30, lr: float = 0.5, l2: float = 1e-4,
+            batch_size: int = 32, holdout: float = 0.2, seed: int = 0) -> dict:
+        """Minibatch SGD on the cross-entropy, then temperature calibration on a held-out split"""
+        rng = np.random.default_rng(seed)
+        targets = np.array([self.labels.index(label) for label in labels])
+        features = [hashed_features(t, self.n_buckets) for t in texts]
+        order = rng.permutation(len(texts))
+        n_holdout = int(len(texts) * holdout) if len(texts) >= 50 else 0
+        held, train = order[:n_holdout], order[n_holdout:]
+
+        for _ in range(epochs):
+            rng.shuffle(train)
+            for start in range(0, len(train), batch_size):
+                ids = train[start:start + batch_size]
+                batch = [features[i] for i in ids]
+                logits, rows, cols, vals = self._batch_logits(batch)
+                grad = _softmax(logits)
+                grad[np.arange(len(ids)), targets[ids]] -= 1
+                grad /= len(ids)
+                # Sparse update: only the buckets present in this batch (with lazy L2 on them)
+                np.add.at(self.weights, cols, -lr * (grad[rows] * vals[:, None] + l2 * self.weights[cols]))
+                self.bias -= lr * grad.sum(axis=0)
+
+        stats = {"train": len(train), "holdout": len(held), "temperature": 1.0}
+        if len(held):
+            logits, *_ = self._batch_logits([features[i] for i in held])
+            self.temperature = self._fit_temperature(logits, targets[held])
+            proba = _softmax(logits / self.temperature)
+            stats["temperature"] = self.temperature
+            stats["holdout_accuracy"] = float((proba.argmax(axis=1) == targets[held]).mean())
+            stats["holdout_nll"] = float(-np.log(proba[np.arange(len(held)), targets[held]] + 1e-12).mean())
+        return stats
+
+    @staticmethod
+    def _fit_temperature(logits: np.ndarray, targets: np.ndarray) -> float:
+        best, best_nll = 1.0, np.inf
+        for t in np.geomspace(0.25, 8.0, 40):
+            proba = _softmax(logits / t)
+            nll = -np.log(proba[np.arange(len(targets)), targets] + 1e-12).mean()
+            if nll < best_nll:
+                best, best_nll = float(t), nll
+        return best
+
+    # ---------- persistence ----------
+    def save(self, path: str):
+        # Only buckets that were ever touched are stored
+        used = np.flatnonzero(np.any(self.weights != 0, axis=1))
+        np.savez_compressed(
+            path, labels=np.array(self.labels), n_buckets=self.n_buckets, used=used,
+            weights=self.weights[used], bias=self.bias, temperature=self.temperature,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "HashedLogisticClassifier":
+        data = np.load(path)
+        model = cls([str(label) for label in data["labels"]], int(data["n_buckets"]))
+        model.weights[data["used"]] = data["weights"]
+        model.bias = data["bias"].astype(np.float32)
+        model.temperature = float(data["temperature"])
+        return model
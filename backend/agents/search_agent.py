@@ -1,84 +1,90 @@
 import google.generativeai as genai
 from models.schemas import Source
-import time
+from agents.search_backends import create_search_backend, LLMSearchBackend
+from agents.llm import CacheMissError, LLMClient, model_for
+from agents.tracing import span
+from agents.job_context import current_job
+import logging
 import os
-import re
 from dotenv import load_dotenv
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 try:
     genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 except:
     pass
 
 class SearchAgent:
-    def __init__(self):
+    # Batched requests per search_batch call (the first plus one retry)
+    BATCH_ATTEMPTS = 2
+
+    def __init__(self, backend=None):
         self.demo_mode = os.getenv("DEMO_MODE", "false").lower() == "true"
-        self.model = genai.GenerativeModel('gemini-flash-latest')
+        self.model = LLMClient(model_for("search"), role="search")
+        self.backend = backend or self._configured_backend()
+
+    def _configured_backend(self):
+        """Pick the search backend from SEARCH_BACKEND (llm, duckduckgo, local)"""
+        name = os.getenv("SEARCH_BACKEND", "llm")
+        try:
+            return create_search_backend(name, model=self.model)
+        except Exception as e:
+            logger.warning(f"Could not initialise '{name}' backend: {e}. Falling back to LLM retrieval.")
+            return LLMSearchBackend(self.model)
     
     def search_task(self, task_description: str, max_results: int = 5) -> list:
-        """Search web for information using Gemini as a knowledge retriever"""
+        """Search for information using the configured search backend"""
         
-        # proceed directly to try block to ask Gemini
-        
-        try:
-            print(f"[SEARCH] Attempting retrieval for: {task_description[:50]}...")
-            
-            # Using Gemini to "retrieve" knowledge as if it were search results
-            # Note: This is simulated search using LLM internal knowledge, as free LLMs don't have live search API access.
-            prompt = f"""You are a search engine simulator. 
-Based on your internal knowledge database, generate {max_results} 'search results' for the following query:
-'{task_description}'
+        with span("search.task", cat="search", backend=self.backend.name, query=task_description[:80]) as s:
+            try:
+                logger.info(f"Attempting {self.backend.name} retrieval for: {task_description[:50]}...")
+                sources = self.backend.search(task_description, max_results)
+                logger.info(f"Retrieved {len(sources)} sources")
+                s.set(results=len(sources))
+                return sources[:max_results]
 
-For each result, provide:
-1. A plausible Title
-2. A plausible URL (can be from reputable domains like wikipedia.org, nature.com, etc)
-3. A summary/snippet of the content (approx 2-3 sentences)
+            except CacheMissError:
+                # Replay runs must not quietly swap in demo sources
+                raise
+            except Exception as e:
+                logger.error(f"Search retrieval error: {e}")
+                s.set(fallback="demo")
+                job = current_job.get()
+                if job is not None:
+                    job.failed_searches.add(task_description)
+                # Fallback to demo search if the backend fails
+                return self._demo_search(task_description, max_results)
 
-Format your response exactly as a list of entries separated by --- dividers.
-Example:
-Title: Research on X
-URL: https://example.com/x
-Snippet: This article discusses X...
----
-Title: Study on Y
-...
-"""
-            
-            response = self.model.generate_content(prompt)
-            results_text = response.text
-            
-            sources = []
-            # Parse the pseudo-search results
-            entries = results_text.split('---')
-            for entry in entries:
-                if not entry.strip(): continue
-                
-                title = "No Title"
-                url = "http://example.com"
-                snippet = "No content"
-                
-                # Simple parsing lines
-                for line in entry.strip().split('\n'):
-                    if line.startswith("Title:"): title = line.replace("Title:", "").strip()
-                    elif line.startswith("URL:"): url = line.replace("URL:", "").strip()
-                    elif line.startswith("Snippet:"): snippet = line.replace("Snippet:", "").strip()
-                
-                if title != "No Title":
-                    sources.append(Source(
-                        url=url,
-                        title=title,
-                        snippet=snippet,
-                        credibility_score=0.85
-                    ))
+    def search_batch(self, tasks: list, max_results: int = 5) -> dict:
+        """Search all ResearchTasks in one backend request; returns {task.id: [Source]}
 
-            print(f"[SEARCH] Retrieved {len(sources)} pseudo-sources")
-            return sources[:max_results]
+        Batching is used when rate-limit headroom is low, so a failed or partial
+        batch is retried once for the unanswered tasks rather than split into one
+        request per task. Anything still unanswered gets demo sources.
+        """
+        results = {}
+        for attempt in range(1, self.BATCH_ATTEMPTS + 1):
+            queries = {task.id: task.description for task in tasks if not results.get(task.id)}
+            if not queries:
+                break
+            with span("search.batch", cat="search", backend=self.backend.name, tasks=len(queries), attempt=attempt):
+                try:
+                    logger.info(f"Attempting batched {self.backend.name} retrieval for {len(queries)} tasks...")
+                    results.update(self.backend.search_batch(queries, max_results))
+                except CacheMissError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Batched retrieval error: {e}")
 
-        except Exception as e:
-            print(f"[ERROR] Search retrieval error: {e}")
-            # Fallback to demo search if LLM fails
-            return self._demo_search(task_description, max_results)
+        job = current_job.get()
+        for task in tasks:
+            if not results.get(task.id):
+                if job is not None:
+                    job.failed_searches.add(task.description)
+                results[task.id] = self._demo_search(task.description, max_results)
+        logger.info(f"Batched retrieval returned {sum(len(r) for r in results.values())} sources")
+        return results
     
     def _demo_search(self, task_description: str, max_results: int) -> list:
         """Return demo search results"""
@@ -172,5 +178,5 @@ Title: Study on Y
                 )
             ]
         
-        print(f"[SEARCH] DEMO MODE: Returning {min(max_results, len(demo_sources))} mock sources")
+        logger.info(f"DEMO MODE: Returning {min(max_results, len(demo_sources))} mock sources")
         return demo_sources[:max_results]
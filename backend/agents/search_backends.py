@@ -0,0 +1,367 @@
+from models.schemas import Source
+from collections import Counter
+from array import array
+import json
+import math
+import mmap
+import numpy as np
+import os
+import re
+import sys
+
+# ---------- TOKENIZATION (shared by index builder and query side) ----------
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has",
+    "in", "is", "it", "its", "of", "on", "or", "that", "the", "this", "to",
+    "was", "were", "will", "with", "what", "how", "why", "which", "about",
+}
+
+
+def tokenize(text: str) -> list:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class SearchBackend:
+    """Interface for anything that can turn a query into a list of Sources"""
+
+    name = "base"
+    # Backends that can answer many queries in a single upstream request
+    supports_batch = False
+    # Backends whose searches count against the Gemini rate limit
+    uses_llm_quota = False
+
+    def search(self, query: str, max_results: int = 5) -> list:
+        raise NotImplementedError
+
+    def search_batch(self, queries: dict, max_results: int = 5) -> dict:
+        """Search several queries at once; `queries` maps task id -> query text"""
+        return {task_id: self.search(query, max_results) for task_id, query in queries.items()}
+
+
+# ---------- LLM SIMULATED SEARCH ----------
+
+class LLMSearchBackend(SearchBackend):
+    """Uses Gemini's internal knowledge to simulate search results"""
+
+    name = "llm"
+    supports_batch = True
+    uses_llm_quota = True
+
+    def __init__(self, model):
+        self.model = model
+
+    def search(self, query: str, max_results: int = 5) -> list:
+        # Note: This is simulated search using LLM internal knowledge, as free LLMs don't have live search API access.
+        prompt = f"""You are a search engine simulator.
+Based on your internal knowledge database, generate {max_results} 'search results' for the following query:
+'{query}'
+
+For each result, provide:
+1. A plausible Title
+2. A plausible URL (can be from reputable domains like wikipedia.org, nature.com, etc)
+3. A summary/snippet of the content (approx 2-3 sentences)
+
+Format your response exactly as a list of entries separated by --- dividers.
+Example:
+Title: Research on X
+URL: https://example.com/x
+Snippet: This article discusses X...
+---
+Title: Study on Y
+...
+"""
+        response = self.model.generate_content(prompt)
+        return self._parse_results(response.text)[:max_results]
+
+    def search_batch(self, queries: dict, max_results: int = 5) -> dict:
+        """Simulate search for every query in one structured-JSON request"""
+        # Short ids keep the prompt small; map them back to the real task ids afterwards
+        short_ids = {f"q{i}": task_id for i, task_id in enumerate(queries, 1)}
+        query_lines = "\n".join(f'{short_id}: {queries[task_id]}' for short_id, task_id in short_ids.items())
+
+        prompt = f"""You are a search engine simulator.
+Based on your internal knowledge database, generate {max_results} 'search results' for EACH of the following queries:
+{query_lines}
+
+For each result, provide a plausible title, a plausible URL (can be from reputable domains like wikipedia.org, nature.com, etc)
+and a summary/snippet of the content (approx 2-3 sentences).
+
+Return a JSON object keyed by query id:
+{{
+    "q1": [{{"title": "Research on X", "url": "https://example.com/x", "snippet": "This article discusses X..."}}]
+}}
+"""
+        response = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+        data = json.loads(response.text)
+
+        results = {}
+        for short_id, task_id in short_ids.items():
+            sources = []
+            for entry in data.get(short_id) or []:
+                if not isinstance(entry, dict) or not entry.get("title"):
+                    continue
+                sources.append(Source(
+                    url=entry.get("url") or "http://example.com",
+                    title=entry["title"],
+                    snippet=entry.get("snippet") or "No content",
+                    credibility_score=0.85
+                ))
+            results[task_id] = sources[:max_results]
+        return results
+
+    def _parse_results(self, results_text: str) -> list:
+        sources = []
+        # Parse the pseudo-search results
+        for entry in results_text.split('---'):
+            if not entry.strip(): continue
+
+            title = "No Title"
+            url = "http://example.com"
+            snippet = "No content"
+
+            # Simple parsing lines
+            for line in entry.strip().split('\n'):
+                if line.startswith("Title:"): title = line.replace("Title:", "").strip()
+                elif line.startswith("URL:"): url = line.replace("URL:", "").strip()
+                elif line.startswith("Snippet:"): snippet = line.replace("Snippet:", "").strip()
+
+            if title != "No Title":
+                sources.append(Source(
+                    url=url,
+                    title=title,
+                    snippet=snippet,
+                    credibility_score=0.85
+                ))
+        return sources
+
+
+# ---------- DUCKDUCKGO WEB SEARCH ----------
+
+class DuckDuckGoSearchBackend(SearchBackend):
+    """Live web search through duckduckgo-search"""
+
+    name = "duckduckgo"
+
+    def __init__(self, region: str = "wt-wt"):
+        from duckduckgo_search import DDGS  # imported lazily, only needed for this backend
+        self._ddgs_cls = DDGS
+        self.region = region
+
+    def search(self, query: str, max_results: int = 5) -> list:
+        with self._ddgs_cls() as ddgs:
+            results = list(ddgs.text(query, region=self.region, max_results=max_results))
+
+        sources = []
+        for r in results:
+            url = r.get("href")
+            if not url:
+                continue
+            sources.append(Source(
+                url=url,
+                title=r.get("title", "No Title"),
+                snippet=r.get("body", ""),
+                credibility_score=0.75
+            ))
+        return sources[:max_results]
+
+
+# ---------- LOCAL INVERTED INDEX (MEMORY-MAPPED) ----------
+#
+# Index directory layout (all integer files are native-endian arrays):
+#   meta.json         num_docs, avgdl, byteorder, format version
+#   lexicon.json      term -> [postings offset, document frequency]
+#   postings.bin      uint32 pairs (doc_id, term frequency), grouped by term
+#   doclens.bin       uint32 token count per document
+#   docs.bin          UTF-8 JSON records {"title", "url", "text"} back to back
+#   docs_offsets.bin  uint64 byte offsets into docs.bin (num_docs + 1 entries)
+
+INDEX_FORMAT_VERSION = 1
+
+
+def _split_passages(text: str, words_per_passage: int) -> list:
+    words = text.split()
+    return [" ".join(words[i:i + words_per_passage]) for i in range(0, len(words), words_per_passage)]
+
+
+def build_local_index(corpus_path: str, index_dir: str, words_per_passage: int = 120) -> dict:
+    """Build an inverted index from a JSONL corpus of {"title", "url", "text"} records.
+
+    Long documents are split into passages so results carry a focused snippet.
+    Returns the index metadata.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+
+    postings = {}
+    doclens = array('I')
+    offsets = array('Q', [0])
+
+    with open(corpus_path, encoding="utf-8") as corpus, \
+            open(os.path.join(index_dir, "docs.bin"), "wb") as docs_out:
+        for line in corpus:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            title = record.get("title", "Untitled")
+            url = record.get("url", "")
+            for passage in _split_passages(record.get("text", ""), words_per_passage):
+                doc_id = len(doclens)
+                tokens = tokenize(title + " " + passage)
+                for term, tf in Counter(tokens).items():
+                    postings.setdefault(term, array('I')).extend((doc_id, tf))
+                doclens.append(len(tokens))
+
+                blob = json.dumps({"title": title, "url": url, "text": passage}, ensure_ascii=False).encode("utf-8")
+                docs_out.write(blob)
+                offsets.append(offsets[-1] + len(blob))
+
+    lexicon = {}
+    position = 0
+    with open(os.path.join(index_dir, "postings.bin"), "wb") as postings_out:
+        for term in sorted(postings):
+            plist = postings[term]
+            lexicon[term] = [position, len(plist) // 2]
+            plist.tofile(postings_out)
+            position += len(plist) // 2
+
+    with open(os.path.join(index_dir, "doclens.bin"), "wb") as f:
+        doclens.tofile(f)
+    with open(os.path.join(index_dir, "docs_offsets.bin"), "wb") as f:
+        offsets.tofile(f)
+    with open(os.path.join(index_dir, "lexicon.json"), "w", encoding="utf-8") as f:
+        json.dump(lexicon, f)
+
+    meta = {
+        "version": INDEX_FORMAT_VERSION,
+        "num_docs": len(doclens),
+        "avgdl": (sum(doclens) / len(doclens)) if doclens else 0.0,
+        "byteorder": sys.byteorder,
+    }
+    with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+class LocalIndexSearchBackend(SearchBackend):
+    """BM25 retrieval over a prebuilt, memory-mapped inverted index (fully offline)"""
+
+    name = "local"
+    # Top-scoring passages ranked per wanted result; more are ranked only if URL dedup runs out
+    CANDIDATES_PER_RESULT = 10
+
+    def __init__(self, index_dir: str, k1: float = 1.2, b: float = 0.75, max_postings: int = 200_000):
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported index version in {index_dir}: {meta.get('version')}")
+        if meta.get("byteorder") != sys.byteorder:
+            raise ValueError(f"Index in {index_dir} was built on a {meta.get('byteorder')}-endian machine")
+
+        with open(os.path.join(index_dir, "lexicon.json"), encoding="utf-8") as f:
+            self.lexicon = json.load(f)
+
+        self.num_docs = meta["num_docs"]
+        self.avgdl = meta["avgdl"] or 1.0
+        self.k1 = k1
+        self.b = b
+        # Very common terms are only scored when the query has nothing rarer to go on
+        self.max_postings = max_postings
+
+        self._maps = []
+        # Zero-copy numpy views of the index files, scored a whole posting list at a time
+        self.postings = self._map_array(os.path.join(index_dir, "postings.bin"), np.uint32)
+        self.doclens = self._map_array(os.path.join(index_dir, "doclens.bin"), np.uint32)
+        self.doc_offsets = self._map_array(os.path.join(index_dir, "docs_offsets.bin"), np.uint64)
+        self.docs = self._map_bytes(os.path.join(index_dir, "docs.bin"))
+
+    def _map_bytes(self, path: str):
+        if os.path.getsize(path) == 0:
+            return memoryview(b"")
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return memoryview(mapped)
+
+    def _map_array(self, path: str, dtype):
+        return np.frombuffer(self._map_bytes(path), dtype=dtype)
+
+    def close(self):
+        # The arrays hold buffer exports of the maps; drop them before closing
+        self.postings = self.doclens = self.doc_offsets = None
+        self.docs.release()
+        for mapped in self._maps:
+            mapped.close()
+        self._maps = []
+
+    def search(self, query: str, max_results: int = 5) -> list:
+        terms = [t for t in set(tokenize(query)) if t in self.lexicon]
+        if not terms:
+            return []
+
+        # Rarest terms first; skip huge posting lists once a rarer term has been scored
+        terms.sort(key=lambda t: self.lexicon[t][1])
+        doc_ids, contributions = [], []
+        for n, term in enumerate(terms):
+            offset, df = self.lexicon[term]
+            if n > 0 and df > self.max_postings:
+                continue
+            idf = math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+            plist = self.postings[offset * 2:(offset + df) * 2]
+            ids, tf = plist[0::2], plist[1::2].astype(np.float64)
+            norm = self.k1 * (1 - self.b + self.b * self.doclens[ids] / self.avgdl)
+            doc_ids.append(ids)
+            contributions.append(idf * tf * (self.k1 + 1) / (tf + norm))
+
+        # Sum each passage's per-term scores
+        candidates, inverse = np.unique(np.concatenate(doc_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
+
+        sources = []
+        seen_urls = set()
+        for doc_id in self._ranked(candidates, scores, max_results * self.CANDIDATES_PER_RESULT):
+            doc = self._load_doc(doc_id)
+            # One passage per article keeps the result list diverse
+            key = doc.get("url") or doc.get("title")
+            if key in seen_urls:
+                continue
+            seen_urls.add(key)
+            sources.append(Source(
+                url=doc.get("url", ""),
+                title=doc.get("title", "Untitled"),
+                snippet=doc.get("text", "")[:500],
+                credibility_score=0.8
+            ))
+            if len(sources) >= max_results:
+                break
+        return sources
+
+    @staticmethod
+    def _ranked(candidates, scores, top: int):
+        """Candidate doc ids by descending score; only the first `top` are sorted up front"""
+        if len(scores) > top:
+            head = np.argpartition(-scores, top)[:top]
+            head = head[np.argsort(-scores[head], kind="stable")]
+            yield from (int(d) for d in candidates[head])
+            rest = np.setdiff1d(np.arange(len(scores)), head, assume_unique=True)
+            order = rest[np.argsort(-scores[rest], kind="stable")]
+        else:
+            order = np.argsort(-scores, kind="stable")
+        yield from (int(d) for d in candidates[order])
+
+    def _load_doc(self, doc_id: int) -> dict:
+        start, end = int(self.doc_offsets[doc_id]), int(self.doc_offsets[doc_id + 1])
+        return json.loads(bytes(self.docs[start:end]).decode("utf-8"))
+
+
+def create_search_backend(name: str, model=None) -> SearchBackend:
+    """Instantiate a backend by name ("llm", "duckduckgo" or "local")"""
+    name = (name or "llm").lower()
+    if name == "llm":
+        return LLMSearchBackend(model)
+    if name in ("duckduckgo", "ddg"):
+        return DuckDuckGoSearchBackend(region=os.getenv("DDG_REGION", "wt-wt"))
+    if name == "local":
+        return LocalIndexSearchBackend(os.getenv("SEARCH_INDEX_DIR", "search_index"))
+    raise ValueError(f"Unknown search backend: {name}")
@@ -1,6 +1,11 @@
 import google.generativeai as genai
 from models.schemas import Source, ResearchReport, AgentMessage, AgentType
 from datetime import datetime
+from agents.llm import CacheMissError, LLMClient, CircuitOpenError, model_for
+from agents.prompt_compression import compress_sources
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextvars
+import logging
 import os
 import json
 import re
@@ -8,11 +13,54 @@ from dotenv import load_dotenv
 
 load_dotenv()
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+logger = logging.getLogger(__name__)
+
+# Sectioned synthesis (SYNTHESIS_MODE=sections): what each call writes, and its generation config
+SECTIONS = {
+    "executive_summary": ("a 2-3 paragraph professional executive summary of the research (Markdown supported, no heading)", None),
+    "key_findings": (
+        "the key findings, returned as a JSON array of key findings (strings), each with its citation [n]",
+        {"response_mime_type": "application/json"},
+    ),
+    "detailed_analysis": ("a detailed analysis section breaking down the topic (Markdown supported, no top-level heading)", None),
+    "conclusion": ("one paragraph of final concluding remarks (no heading)", None),
+}
+_section_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SYNTHESIS_SECTION_POOL_SIZE", "16")), thread_name_prefix="synthesis-section")
 
 class SynthesisAgent:
+    # Token budget for source content in the synthesis prompt
+    CONTEXT_TOKENS = int(os.getenv("SYNTHESIS_CONTEXT_TOKENS", "1200"))
+    # Sources numbered in the prompt (and citable as [1]..[n])
+    CITED_SOURCES = 15
+    # Reports below this confidence are written by the escalation model
+    ESCALATE_BELOW_CONFIDENCE = float(os.getenv("SYNTHESIS_ESCALATE_BELOW", "0.7"))
+
     def __init__(self):
-        self.model = genai.GenerativeModel('gemini-flash-latest')
+        self.model = LLMClient(model_for("synthesis"), role="synthesis")
+        escalated = model_for("synthesis_escalated")
+        self.escalation_model = self.model if escalated == self.model.model_name else LLMClient(escalated, role="synthesis_escalated")
         self.demo_mode = os.getenv("DEMO_MODE", "false").lower() == "true"
+        # "single": one JSON response with every section; "sections": one concurrent call per section
+        self.mode = os.getenv("SYNTHESIS_MODE", "single").lower()
+
+    def escalation_reason(self, sources: list, verification: dict):
+        """Why this report needs the larger model, or None when the default tier will do"""
+        if self.demo_mode or self.escalation_model is self.model:
+            return None
+        if verification.get('has_conflicts', False):
+            return "sources conflict"
+        confidence = self._calculate_confidence(sources, verification)
+        if confidence < self.ESCALATE_BELOW_CONFIDENCE:
+            return f"confidence {confidence:.2f}"
+        return None
+
+    def _model_for_report(self, sources: list, verification: dict) -> LLMClient:
+        if not self.escalation_reason(sources, verification):
+            return self.model
+        if not self.escalation_model.available():
+            logger.warning(f"{self.escalation_model.model_name} unavailable; synthesizing with {self.model.model_name}")
+            return self.model
+        return self.escalation_model
     
     def direct_llm_query(self, query: str) -> ResearchReport:
         """Directly query the LLM and return a structured response with clickable references"""
@@ -113,6 +161,8 @@ Requirements:
                 agent_logs=[]
             )
 
+        except CacheMissError:
+            raise
         except Exception as e:
             error_report = f"## Error Generating Report\nSomething went wrong: {str(e)}\n\n"
             return ResearchReport(
@@ -124,8 +174,11 @@ Requirements:
                 agent_logs=[]
             )
 
-    def synthesize_report(self, query: str, sources: list, verification: dict):
-        """Generate final research report"""
+    def synthesize_report(self, query: str, sources: list, verification: dict, subtasks: list = None, context: str = None, on_section=None, corpus=None):
+        """Generate final research report (`subtasks` steer which source sentences go into the prompt,
+        `context` is earlier research the report follows up on, `on_section(name, markdown)` hears
+        about each section as it finishes in sectioned mode, `corpus` is the cached context
+        built by source_corpus() for these sources)"""
         
         # Calculate confidence score based on sources
         confidence = self._calculate_confidence(sources, verification)
@@ -143,7 +196,21 @@ Requirements:
         if self.demo_mode:
             return self._generate_demo_report(query, sources, verification, confidence)
 
-        return self._generate_real_report(query, sources, verification, confidence)
+        return self._generate_real_report(query, sources, verification, confidence, subtasks, context, on_section, corpus)
+    
+    def fallback_report(self, query: str, sources: list, verification: dict) -> ResearchReport:
+        """Template report built without any LLM call (used when time runs out)"""
+        if not sources:
+            return ResearchReport(
+                query=query,
+                executive_summary="Insufficient credible data available.",
+                key_findings=[],
+                sources=[],
+                confidence_score=0.3,
+                agent_logs=[]
+            )
+        confidence = self._calculate_confidence(sources, verification)
+        return self._generate_demo_report(query, sources, verification, confidence)
     
     def _generate_demo_report(self, query: str, sources: list, verification: dict, confidence: float) -> ResearchReport:
         """Generate a robust demo report without API calls"""
@@ -212,27 +279,46 @@ The long-term outlook remains constructive, subject to continued investment and
             agent_logs=[]
         )
     
-    def _generate_real_report(self, query: str, sources: list, verification: dict, confidence: float) -> ResearchReport:
-        """Generate a professionally formatted academic report using Gemini"""
-        
-        # Prepare sources text
-        sources_text = "\n".join([
-            f"[{i+1}] Title: {s.title}\n    URL: {s.url}\n    Content: {s.snippet[:400]}..." 
-            for i, s in enumerate(sources[:15])
+    def source_corpus(self, query: str, sources: list, subtasks: list = None) -> str:
+        """Numbered source block cited as [1], [2], ...; registered once per job as a cached context"""
+        return f"Sources:\n{self._numbered_sources(query, sources, subtasks)}"
+
+    def _numbered_sources(self, query: str, sources: list, subtasks: list = None) -> str:
+        # The most relevant whole sentences, within the token budget
+        cited = sources[:self.CITED_SOURCES]
+        contents = compress_sources(cited, query, self.CONTEXT_TOKENS, subtasks)
+        return "\n".join([
+            f"[{i+1}] Title: {s.title}\n    URL: {s.url}\n    Content: {content}"
+            for i, (s, content) in enumerate(zip(cited, contents))
         ])
-        
-        verification_notes = verification.get('verification_text', 'No conflicts detected')
-        
-        prompt = f"""You are an advanced research synthesis agent. Your task is to generate a comprehensive, professional research report based strictly on the provided sources.
 
-Query: {query}
+    def _source_context(self, query: str, sources: list, verification: dict, subtasks: list = None, context: str = None, corpus=None) -> str:
+        """Query, numbered sources and verification notes shared by every synthesis prompt"""
+        if corpus is not None:
+            sources_text = f"The numbered sources [1]-[{min(len(sources), self.CITED_SOURCES)}] given above."
+        else:
+            sources_text = self._numbered_sources(query, sources, subtasks)
 
+        verification_notes = verification.get('verification_text', 'No conflicts detected')
+        context_text = f"\nEarlier research this query follows up on:\n{context}\n" if context else ""
+        return f"""Query: {query}
+{context_text}
 Sources:
 {sources_text}
 
 Verification Notes:
 {verification_notes}
+"""
+
+    def _generate_real_report(self, query: str, sources: list, verification: dict, confidence: float, subtasks: list = None, context: str = None, on_section=None, corpus=None) -> ResearchReport:
+        """Generate a professionally formatted academic report using Gemini"""
+        shared = self._source_context(query, sources, verification, subtasks, context, corpus)
+        if self.mode == "sections":
+            return self._generate_sectioned_report(query, sources, verification, confidence, shared, on_section, corpus)
+        
+        prompt = f"""You are an advanced research synthesis agent. Your task is to generate a comprehensive, professional research report based strictly on the provided sources.
 
+{shared}
 Instructions:
 1. Synthesize information from the provided sources.
 2. Cite sources using [1], [2] notation corresponding to the source list numbers.
@@ -252,14 +338,152 @@ Return a JSON object with the following structure:
 """
         
         try:
-            response = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+            model = self._model_for_report(sources, verification)
+            response = model.generate_content(prompt, generation_config={"response_mime_type": "application/json"}, context=corpus)
             response_text = response.text
             data = json.loads(response_text)
+        except CircuitOpenError as e:
+            logger.warning(f"{e}. Using demo report.")
+            return self._generate_demo_report(query, sources, verification, confidence)
+        except CacheMissError:
+            # Replay runs must not quietly swap in a demo or fallback report
+            raise
         except Exception as e:
-            print(f"Error generating report: {e}")
+            logger.error(f"Error generating report: {e}")
             # Fallback if JSON parsing fails
             return self._fallback_report(query, sources)
 
+        return self._assemble_report(query, sources, confidence, data)
+
+    def _generate_sectioned_report(self, query: str, sources: list, verification: dict, confidence: float, shared: str, on_section=None, corpus=None) -> ResearchReport:
+        """One LLM call per section, all at once over the same numbered sources.
+
+        Wall-clock time is that of the slowest section. `on_section(name, markdown)`
+        is called as each section finishes.
+        """
+        model = self._model_for_report(sources, verification)
+        data, failed = self._generate_sections(list(SECTIONS), shared, model, min(len(sources), self.CITED_SOURCES), on_section, corpus)
+        if len(failed) == len(SECTIONS):
+            return self._generate_demo_report(query, sources, verification, confidence)
+        return self._assemble_report(query, sources, confidence, data)
+
+    def _generate_sections(self, names: list, shared: str, model: LLMClient, n_cited: int, on_section=None, corpus=None) -> tuple:
+        """Write the named SECTIONS concurrently; returns ({name: content}, [failed names])"""
+        futures = {}
+        for name in names:
+            task, config = SECTIONS[name]
+            prompt = f"""You are an advanced research synthesis agent writing one section of a research report, based strictly on the provided sources.
+
+{shared}
+Instructions:
+1. Write only {task}.
+2. Cite sources using [1], [2] notation corresponding to the source list numbers.
+3. Be objective and clear; if sources contradict, mention the conflict.
+"""
+            # Carry the job context (deadline, cancellation, logs) into the pool thread
+            futures[_section_pool.submit(contextvars.copy_context().run, model.generate_content, prompt, config, corpus)] = name
+
+        data, failed = {}, []
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                text = future.result().text
+                data[name] = self._parse_findings(text) if name == "key_findings" else text.strip()
+            except CacheMissError:
+                raise
+            except Exception as e:
+                logger.error(f"Error generating {name} section: {e}")
+                failed.append(name)
+                continue
+            data[name] = self._clean_citations(data[name], n_cited)
+            if on_section:
+                on_section(name, self._format_findings_markdown(data[name]) if name == "key_findings" else data[name])
+        return data, failed
+
+    def refresh_report(self, query: str, sources: list, verification: dict, previous: dict, subtasks: list = None, on_section=None, corpus=None) -> tuple:
+        """Rewrite only the sections of `previous` (report dict) whose evidence changed.
+
+        A section is stale when it cites a source that is gone or whose snippet
+        changed; new sources make the key findings stale, since that is where new
+        evidence shows up first. The other sections are kept with their citations
+        renumbered to the new source order. Reports not laid out by
+        _assemble_report are re-synthesized in full. Returns (report, rewritten section names).
+        """
+        old = self.report_sections(previous)
+        if self.demo_mode or not sources or old is None:
+            return self.synthesize_report(query, sources, verification, subtasks, None, on_section, corpus), list(SECTIONS)
+
+        old_cited = {i + 1: s for i, s in enumerate(previous.get("sources", [])[:self.CITED_SOURCES])}
+        cited = sources[:self.CITED_SOURCES]
+        new_number = {s.url: i + 1 for i, s in enumerate(cited)}
+        new_snippet = {s.url: s.snippet for s in cited}
+
+        def unchanged(n: int) -> bool:
+            source = old_cited.get(n)
+            return source is not None and source["url"] in new_snippet and new_snippet[source["url"]] == source.get("snippet")
+
+        stale = [name for name in SECTIONS if not all(unchanged(n) for n in self._citations(old[name]))]
+        old_urls = {s["url"] for s in old_cited.values()}
+        if "key_findings" not in stale and any(url not in old_urls for url in new_number):
+            stale.append("key_findings")
+        if len(stale) == len(SECTIONS):
+            return self.synthesize_report(query, sources, verification, subtasks, None, on_section, corpus), list(SECTIONS)
+
+        def renumber(content):
+            if isinstance(content, list):
+                return [renumber(c) for c in content]
+            return re.sub(r"\[(\d+)\]", lambda m: f"[{new_number[old_cited[int(m.group(1))]['url']]}]"
+                          if int(m.group(1)) in old_cited and old_cited[int(m.group(1))]["url"] in new_number else "", content)
+
+        data = {name: renumber(old[name]) for name in SECTIONS if name not in stale}
+        rewritten = []
+        if stale:
+            shared = self._source_context(query, sources, verification, subtasks, None, corpus)
+            model = self._model_for_report(sources, verification)
+            fresh, failed = self._generate_sections(stale, shared, model, len(cited), on_section, corpus)
+            data.update(fresh)
+            # A section that could not be rewritten keeps its text, minus citations of dropped sources
+            data.update({name: renumber(old[name]) for name in failed})
+            rewritten = [name for name in stale if name not in failed]
+        confidence = self._calculate_confidence(sources, verification)
+        return self._assemble_report(query, sources, confidence, data), rewritten
+
+    @staticmethod
+    def report_sections(report: dict):
+        """Section name -> content of a report laid out by _assemble_report, else None"""
+        found = dict(re.findall(r"^## ([^\n]+)\n\n(.*?)\n\n---\n", report.get("executive_summary", ""), re.MULTILINE | re.DOTALL))
+        titles = {"Executive Summary": "executive_summary", "Detailed Analysis": "detailed_analysis", "Conclusion": "conclusion"}
+        if set(found) != set(titles) | {"Key Findings"}:
+            # Demo, fallback and direct-answer reports have other sections
+            return None
+        sections = {name: found[title] for title, name in titles.items()}
+        sections["key_findings"] = list(report.get("key_findings", []))
+        return sections
+
+    @staticmethod
+    def _citations(content) -> set:
+        text = "\n".join(content) if isinstance(content, list) else content
+        return {int(n) for n in re.findall(r"\[(\d+)\]", text)}
+
+    @staticmethod
+    def _parse_findings(text: str) -> list:
+        try:
+            findings = json.loads(text)
+            if isinstance(findings, list):
+                return [str(f) for f in findings]
+        except ValueError:
+            pass
+        # Plain list: one finding per line, bullets / numbers stripped
+        return [re.sub(r"^\s*(?:[-*]|\d+[.)])\s*", "", line) for line in text.splitlines() if line.strip()]
+
+    @staticmethod
+    def _clean_citations(content, n_sources: int):
+        """Drop citation markers that point past the numbered source list"""
+        if isinstance(content, list):
+            return [SynthesisAgent._clean_citations(c, n_sources) for c in content]
+        return re.sub(r"\[(\d+)\]", lambda m: m.group(0) if 1 <= int(m.group(1)) <= n_sources else "", content)
+
+    def _assemble_report(self, query: str, sources: list, confidence: float, data: dict) -> ResearchReport:
         # Build full markdown report
         references_text = self._build_references(sources)
         
@@ -0,0 +1,245 @@
+"""Per-job span tracing, exported in Chrome trace-event format.
+
+Spans nest through a contextvar (so they follow asyncio tasks and
+asyncio.to_thread), are only recorded for jobs that carry a Trace, and are
+handed to a background exporter without ever blocking the caller. Load
+/research/{job_id}/trace into chrome://tracing or ui.perfetto.dev.
+"""
+from agents.job_context import current_job
+from storage.kv import get_store
+from contextlib import contextmanager
+from collections import OrderedDict
+import contextvars
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+current_span = contextvars.ContextVar("current_span", default=None)
+
+# Spans kept per job; anything beyond is dropped (and counted) rather than growing without bound
+MAX_EVENTS_PER_TRACE = int(os.getenv("TRACE_MAX_EVENTS", "5000"))
+# Closed job ids remembered so that spans finishing after close() are dropped
+MAX_CLOSED_TRACES = 10000
+
+
+class Trace:
+    """Clock origin, span ids and thread lanes for one job"""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.origin = time.monotonic()
+        self._ids = itertools.count(1)
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def now_us(self) -> int:
+        return int((time.monotonic() - self.origin) * 1_000_000)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def lane(self) -> int:
+        """Small stable tid for the calling thread (announced once with a thread_name event)"""
+        ident = threading.get_ident()
+        with self._lock:
+            tid = self._lanes.get(ident)
+            if tid is not None:
+                return tid
+            tid = self._lanes[ident] = len(self._lanes) + 1
+        exporter.submit(self.job_id, {
+            "name": "thread_name", "ph": "M", "pid": 1, "tid": tid,
+            "args": {"name": threading.current_thread().name},
+        })
+        return tid
+
+
+class Span:
+    __slots__ = ("trace", "name", "cat", "attrs", "span_id", "parent_id", "start_us", "tid")
+
+    def __init__(self, trace: Trace, name: str, cat: str, attrs: dict, parent):
+        self.trace = trace
+        self.name = name
+        self.cat = cat
+        self.attrs = attrs
+        self.span_id = trace.next_id()
+        self.parent_id = parent.span_id if parent is not None and parent.trace is trace else None
+        self.tid = trace.lane()
+        self.start_us = trace.now_us()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self):
+        args = dict(self.attrs, span_id=self.span_id)
+        if self.parent_id is not None:
+            args["parent_id"] = self.parent_id
+        exporter.submit(self.trace.job_id, {
+            "name": self.name, "cat": self.cat, "ph": "X", "pid": 1, "tid": self.tid,
+            "ts": self.start_us, "dur": max(1, self.trace.now_us() - self.start_us), "args": args,
+        })
+
+
+class _NoopSpan:
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def _current_trace():
+    job = current_job.get()
+    return job.trace if job is not None else None
+
+
+@contextmanager
+def span(name: str, cat: str = "agent", **attrs):
+    """Time the enclosed block as a child of the current span; a no-op outside traced jobs"""
+    trace = _current_trace()
+    if trace is None:
+        yield _NOOP
+        return
+    s = Span(trace, name, cat, attrs, current_span.get())
+    token = current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        current_span.reset(token)
+        s.finish()
+
+
+def instant(name: str, cat: str = "log", **attrs):
+    """Point-in-time event (e.g. an agent log line) on the current job's timeline"""
+    trace = _current_trace()
+    if trace is None:
+        return
+    exporter.submit(trace.job_id, {
+        "name": name, "cat": cat, "ph": "i", "s": "t", "pid": 1,
+        "tid": trace.lane(), "ts": trace.now_us(), "args": attrs,
+    })
+
+
+class TraceExporter:
+    """Collects finished spans off a queue in a daemon thread and writes them to the
+    shared store as trace:{job_id}. Running jobs are flushed every `interval` seconds,
+    so a slow job can be inspected while it is still going."""
+
+    def __init__(self, store=None, ttl_seconds: float = None, interval: float = 0.5):
+        self._store = store
+        self.ttl_seconds = ttl_seconds or float(os.getenv("JOB_TTL_SECONDS", str(7 * 24 * 3600)))
+        self.interval = interval
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # Spans that finished after their job was closed (abandoned threads, losing hedges)
+        self.late_events = 0
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = get_store()
+        return self._store
+
+    def _key(self, job_id: str) -> str:
+        return f"trace:{job_id}"
+
+    def submit(self, job_id: str, event: dict):
+        # SimpleQueue.put never blocks
+        self._queue.put((job_id, event))
+        if self._thread is None:
+            self._start()
+
+    def close(self, job_id: str):
+        """The job is done: write its trace now and forget the buffer"""
+        self._queue.put((job_id, None))
+
+    def get(self, job_id: str):
+        raw = self.store.get(self._key(job_id))
+        return json.loads(raw) if raw else None
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        buffers, dropped, dirty = {}, {}, set()
+        # Recently closed jobs: their trace is final, so later events must not replace it
+        closed = OrderedDict()
+        next_flush = time.monotonic() + self.interval
+        while True:
+            try:
+                job_id, event = self._queue.get(timeout=max(0.0, next_flush - time.monotonic()))
+                if event is None:
+                    self._write(job_id, buffers.pop(job_id, []), dropped.pop(job_id, 0))
+                    dirty.discard(job_id)
+                    closed[job_id] = None
+                    if len(closed) > MAX_CLOSED_TRACES:
+                        closed.popitem(last=False)
+                elif job_id in closed:
+                    self.late_events += 1
+                else:
+                    events = buffers.setdefault(job_id, [])
+                    if len(events) < MAX_EVENTS_PER_TRACE:
+                        events.append(event)
+                    else:
+                        dropped[job_id] = dropped.get(job_id, 0) + 1
+                    dirty.add(job_id)
+            except queue.Empty:
+                pass
+            if time.monotonic() >= next_flush:
+                for job_id in dirty:
+                    self._write(job_id, buffers[job_id], dropped.get(job_id, 0))
+                dirty.clear()
+                next_flush = time.monotonic() + self.interval
+
+    def _write(self, job_id: str, events: list, dropped: int):
+        if not events:
+            return
+        doc = {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"job_id": job_id, "dropped_events": dropped}}
+        try:
+            self.store.set(self._key(job_id), json.dumps(doc), ttl=self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Could not export trace for job {job_id}: {e}")
+
+
+exporter = TraceExporter()
+
+
+# ---------- LOGGING ----------
+logger = logging.getLogger(__name__)
+
+
+class JobFilter(logging.Filter):
+    """Stamp every record with the current job id so concurrent jobs can be told apart"""
+
+    def filter(self, record):
+        job = current_job.get()
+        record.job_id = (job.trace.job_id if job is not None and job.trace is not None else None) or "-"
+        return True
+
+
+def configure_logging(level: str = None):
+    """Route logging through a queue so request handlers never block on stdout"""
+    log_queue = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(log_queue)
+    handler.addFilter(JobFilter())
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] [job %(job_id)s] %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, stream)
+    listener.start()
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    return listener
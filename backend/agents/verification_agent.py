@@ -1,18 +1,29 @@
 import google.generativeai as genai
 from models.schemas import Source
+from agents.llm import CacheMissError, LLMClient, model_for
+from agents.prompt_compression import compress_sources
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+logger = logging.getLogger(__name__)
 
 class VerificationAgent:
+    # Token budget for source content in the cross-check prompt
+    CONTEXT_TOKENS = int(os.getenv("VERIFICATION_CONTEXT_TOKENS", "250"))
+
     def __init__(self):
-        self.model = genai.GenerativeModel('gemini-flash-latest')
+        self.model = LLMClient(model_for("verification"), role="verification")
         self.demo_mode = os.getenv("DEMO_MODE", "false").lower() == "true"
     
-    def verify_sources(self, sources: list) -> dict:
-        """Cross-check sources for contradictions"""
+    def verify_sources(self, sources: list, query: str = "", subtasks: list = None, corpus=None) -> dict:
+        """Cross-check sources for contradictions.
+
+        With `corpus` (the job's cached source block, see SynthesisAgent.source_corpus)
+        the prompt refers to it instead of quoting the first few sources again.
+        """
         
         if self.demo_mode or len(sources) == 0:
             # Demo mode or no sources
@@ -22,12 +33,22 @@ class VerificationAgent:
                 "confidence_adjustment": 0.0
             }
         
-        sources_text = "\n".join([
-            f"{i+1}. {s.title}: {s.snippet[:100]}"
-            for i, s in enumerate(sources[:5])
-        ])
-        
-        prompt = f"""Analyze these sources for contradictions or agreements:
+        if corpus is not None:
+            prompt = f"""Analyze the sources above for contradictions or agreements about: {query}
+
+Are there any major conflicts? Reply with ONLY:
+"CONSISTENT: [brief explanation]" OR "CONFLICTS: [brief explanation]"
+"""
+        else:
+            checked = sources[:5]
+            # Whole sentences that matter to the query (plus titles) instead of a fixed cut
+            contents = compress_sources(checked, query or " ".join(s.title for s in checked), self.CONTEXT_TOKENS, subtasks)
+            sources_text = "\n".join([
+                f"{i+1}. {s.title}: {content}"
+                for i, (s, content) in enumerate(zip(checked, contents))
+            ])
+
+            prompt = f"""Analyze these sources for contradictions or agreements:
 
 {sources_text}
 
@@ -35,8 +56,19 @@ Are there any major conflicts? Reply with ONLY:
 "CONSISTENT: [brief explanation]" OR "CONFLICTS: [brief explanation]"
 """
 
-        response = self.model.generate_content(prompt)
-        text = response.text.strip()
+        try:
+            response = self.model.generate_content(prompt, context=corpus)
+            text = response.text.strip()
+        except CacheMissError:
+            raise
+        except Exception as e:
+            logger.warning(f"LLM Error: {e}. Skipping cross-check.")
+            return {
+                "has_conflicts": False,
+                "verification_text": "Verification unavailable; sources were not cross-checked.",
+                "confidence_adjustment": 0.0,
+                "sources_checked": 0
+            }
 
         has_conflicts = text.startswith("CONFLICTS:")
         confidence_adjustment = -0.2 if has_conflicts else 0.0
@@ -0,0 +1,25 @@
+"""Build the offline search index used by SEARCH_BACKEND=local.
+
+Usage:
+    python build_index.py corpus.jsonl [index_dir]
+
+The corpus is JSONL with one {"title", "url", "text"} record per line, e.g. the
+--json output of wikiextractor for a Wikipedia dump.
+"""
+import sys
+import time
+from agents.search_backends import build_local_index
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    corpus_path = sys.argv[1]
+    index_dir = sys.argv[2] if len(sys.argv) > 2 else "search_index"
+
+    print(f"Building index from {corpus_path} into {index_dir}...")
+    start = time.perf_counter()
+    meta = build_local_index(corpus_path, index_dir)
+    elapsed = time.perf_counter() - start
+    print(f"Indexed {meta['num_docs']} passages in {elapsed:.1f}s (avg length {meta['avgdl']:.0f} tokens)")
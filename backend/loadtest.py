@@ -0,0 +1,212 @@
+"""Load generator for the research API.
+
+Drives the FastAPI app in-process over httpx's ASGI transport (default) or a
+running server (--url), with the fake LLM backend so runs are offline and
+repeatable. Needs httpx: pip install -r requirements-dev.txt
+
+    python loadtest.py --mode closed --concurrency 16 --duration 30
+    python loadtest.py --mode open --rate 20 --duration 30 --scenario read
+    python loadtest.py --url http://localhost:8000 --mode open --rate 5
+
+Open loop sends on a fixed schedule whatever the response times are (latency is
+measured from the scheduled send time, so queueing shows up). Closed loop keeps
+`concurrency` clients each waiting for its previous response. Event-loop lag is
+sampled on the loop that runs the app when in-process, and on the client loop
+with --url.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+QUERIES = [
+    "impact of AI on healthcare costs",
+    "electric vehicle adoption and charging infrastructure",
+    "renewable energy storage trends",
+    "remote learning outcomes in higher education",
+    "central bank digital currencies and financial inclusion",
+]
+
+
+def percentile(values: list, pct: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = {}
+        self.loop_lag = []
+
+    def record(self, seconds: float, status):
+        if status == 200:
+            self.latencies.append(seconds)
+        else:
+            self.errors[str(status)] = self.errors.get(str(status), 0) + 1
+
+    def report(self, elapsed: float) -> dict:
+        ms = lambda v: round(v * 1000, 1) if v is not None else None
+        return {
+            "requests": len(self.latencies) + sum(self.errors.values()),
+            "ok": len(self.latencies),
+            "errors": self.errors,
+            "elapsed_s": round(elapsed, 2),
+            "rps": round(len(self.latencies) / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {f"p{p}": ms(percentile(self.latencies, p)) for p in (50, 90, 99)}
+            | {"max": ms(max(self.latencies, default=None))},
+            "loop_lag_ms": {f"p{p}": ms(percentile(self.loop_lag, p)) for p in (50, 99)}
+            | {"max": ms(max(self.loop_lag, default=None))},
+        }
+
+
+async def monitor_loop_lag(stats: Stats, stop: asyncio.Event, interval: float = 0.01):
+    """How late a 10 ms timer fires: time the loop was busy with something else"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        stats.loop_lag.append(max(0.0, loop.time() - start - interval))
+
+
+class Scenario:
+    """One request per call; `read` first creates a completed job to fetch repeatedly"""
+
+    def __init__(self, client, name: str, deadline_ms: int):
+        self.client = client
+        self.name = name
+        self.deadline_ms = deadline_ms
+        self.job_id = None
+
+    async def setup(self):
+        if self.name in ("read", "mixed"):
+            response = await self.client.post("/research/start", json={"query": QUERIES[0]})
+            response.raise_for_status()
+            self.job_id = response.json()["job_id"]
+
+    async def request(self) -> int:
+        name = self.name
+        if name == "mixed":
+            name = "start" if random.random() < 0.2 else "read"
+        if name == "read":
+            response = await self.client.get(f"/research/{self.job_id}/report", headers={"Accept-Encoding": "gzip"})
+        else:
+            response = await self.client.post(
+                "/research/start",
+                params={"deadline_ms": self.deadline_ms},
+                json={"query": random.choice(QUERIES)},
+            )
+        return response.status_code
+
+
+async def timed(scenario: Scenario, stats: Stats, started: float):
+    try:
+        status = await scenario.request()
+    except Exception as e:
+        status = type(e).__name__
+    stats.record(time.monotonic() - started, status)
+
+
+async def run_open(scenario: Scenario, stats: Stats, rate: float, duration: float):
+    in_flight = set()
+    start = time.monotonic()
+    n = 0
+    while True:
+        if n / rate >= duration:
+            break
+        scheduled = start + n / rate
+        delay = scheduled - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.create_task(timed(scenario, stats, scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+        n += 1
+    if in_flight:
+        await asyncio.wait(in_flight)
+
+
+async def run_closed(scenario: Scenario, stats: Stats, concurrency: int, duration: float):
+    stop_at = time.monotonic() + duration
+
+    async def client():
+        while time.monotonic() < stop_at:
+            await timed(scenario, stats, time.monotonic())
+
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+
+
+def make_client(url: str, api_key: str = None):
+    import httpx
+    timeout = httpx.Timeout(600.0)
+    headers = {"X-API-Key": api_key} if api_key else None
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=timeout, headers=headers)
+    # Import only now so the environment set in main() is what the app sees
+    from main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=timeout, headers=headers)
+
+
+async def run(args) -> dict:
+    stats = Stats()
+    async with make_client(args.url, args.api_key) as client:
+        scenario = Scenario(client, args.scenario, args.deadline_ms)
+        await scenario.setup()
+
+        stop = asyncio.Event()
+        lag = asyncio.create_task(monitor_loop_lag(stats, stop))
+        start = time.monotonic()
+        if args.mode == "open":
+            await run_open(scenario, stats, args.rate, args.duration)
+        else:
+            await run_closed(scenario, stats, args.concurrency, args.duration)
+        elapsed = time.monotonic() - start
+        stop.set()
+        await lag
+
+    result = stats.report(elapsed)
+    result["config"] = {
+        "target": args.url or "in-process",
+        "mode": args.mode,
+        "scenario": args.scenario,
+        "rate": args.rate if args.mode == "open" else None,
+        "concurrency": args.concurrency if args.mode == "closed" else None,
+        "fake_llm_latency_ms": args.llm_latency_ms,
+    }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the research API")
+    parser.add_argument("--url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--mode", choices=("open", "closed"), default="closed")
+    parser.add_argument("--scenario", choices=("start", "read", "mixed"), default="start")
+    parser.add_argument("--rate", type=float, default=5.0, help="Requests per second (open loop)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients (closed loop)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to generate load")
+    parser.add_argument("--deadline-ms", type=int, default=120000)
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0, help="Fake LLM latency (in-process only)")
+    parser.add_argument("--llm-jitter-ms", type=float, default=200.0)
+    parser.add_argument("--rpm", type=int, default=100000, help="LLM rate limit for the in-process app")
+    parser.add_argument("--api-key", help="Send requests as this API client (X-API-Key)")
+    args = parser.parse_args()
+
+    if not args.url:
+        os.environ["LLM_BACKEND"] = "fake"
+        os.environ["FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+        os.environ["FAKE_LLM_JITTER_MS"] = str(args.llm_jitter_ms)
+        os.environ["GEMINI_RPM"] = str(args.rpm)
+        os.environ.setdefault("CLIENT_RPM", "100000")
+        os.environ.setdefault("CLIENT_MAX_QUEUED", "100000")
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,30 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from models.schemas import ResearchRequest
+from models.schemas import ResearchRequest, BatchResearchRequest
 from agents.coordinator import CoordinatorAgent
+from agents.job_context import JobCancelled
+from storage.kv import get_store
+from storage.job_store import JobStore, full_report
+from projection import project_job, parse_fields
+from response_cache import CachedBody, ResponseCache, etag_matches
+from agents.tracing import configure_logging, exporter as trace_exporter
+from profiler import ProfilerBusy, begin_session, end_session
+from scheduler import Client, ClientRegistry, FairScheduler, QueueTimeout, QuotaExceeded, UnknownClient
+import asyncio
+import hmac
+import json
+import logging
+import math
 import uuid
+import os
 
 load_dotenv()
+# Log records go through a queue so request handlers never block on stdout
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="ResearchSwarm AI")
 
@@ -17,10 +36,171 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage (for demo)
-research_jobs = {}
+# Job records live in the shared state store (STATE_BACKEND) so any worker can serve them
+job_store = JobStore(get_store())
 coordinator = CoordinatorAgent()
 
+# End-to-end budget for a research job unless the client asks for another one
+DEFAULT_DEADLINE_MS = int(os.getenv("RESEARCH_DEADLINE_MS", "120000"))
+MIN_DEADLINE_MS = 1000
+MAX_DEADLINE_MS = 600000
+
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "50"))
+# Concurrent agent calls shared by all queries of one batch
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+# Page size for sources / agent_logs when only a cursor is given
+DEFAULT_PAGE_LIMIT = 20
+# Keep references to running batches so they are not garbage collected
+running_batches = set()
+# Research runs of this worker by job id, so DELETE / disconnects can cancel them
+running_jobs = {}
+# How often a running job checks for a disconnected client or a cancel from another worker
+CANCEL_POLL_SECONDS = 0.5
+# Open SSE streams per job; the job is cancelled when the last one goes away
+sse_followers = {}
+SSE_POLL_SECONDS = 0.25
+# Admin endpoints (/admin/*) are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+MAX_PROFILE_SECONDS = 300
+# Serialized + compressed bodies of completed jobs, per process
+response_cache = ResponseCache(int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+# API-key clients and the fair queue in front of the coordinator (see scheduler.py)
+clients = ClientRegistry.from_env()
+scheduler = FairScheduler(
+    int(os.getenv("PIPELINE_SLOTS", "8")),
+    reserved_interactive=int(os.getenv("INTERACTIVE_RESERVED_SLOTS", "2")),
+)
+
+
+def validate_query(query: str) -> str:
+    """Shared query validation; raises HTTPException(400) for unusable queries"""
+    query = query.strip()
+
+    # Check if query is too short
+    if len(query) < 5:
+        raise HTTPException(
+            status_code=400, 
+            detail="Query too short. Please provide a more detailed research question."
+        )
+
+    # Check if query is too long
+    if len(query) > 500:
+        raise HTTPException(
+            status_code=400,
+            detail="Query too long. Please keep your research question under 500 characters."
+        )
+    return query
+
+
+def validate_deadline(deadline_ms: Optional[int]) -> int:
+    deadline_ms = deadline_ms or DEFAULT_DEADLINE_MS
+    if not MIN_DEADLINE_MS <= deadline_ms <= MAX_DEADLINE_MS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"deadline_ms must be between {MIN_DEADLINE_MS} and {MAX_DEADLINE_MS}."
+        )
+    return deadline_ms
+
+def quota_error(e: QuotaExceeded) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+
+def identify_client(x_api_key: Optional[str] = Header(None)) -> Client:
+    """Caller of a job-starting endpoint; each call counts against the client's rate quota"""
+    try:
+        client = clients.identify(x_api_key)
+        client.check_rate()
+    except UnknownClient as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    except QuotaExceeded as e:
+        raise quota_error(e)
+    return client
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def cancel_job(job_id: str):
+    """Cancel a running job here, and on whichever other worker may be running it"""
+    job_store.request_cancel(job_id)
+    coordinator.cancel(job_id)
+    task = running_jobs.get(job_id)
+    if task is not None:
+        task.cancel()
+
+async def run_cancellable(job_id: str, coro, request: Request = None):
+    """Await `coro` as a task that DELETE, a cancel from another worker or (with `request`)
+    the client disconnecting can cancel; raises JobCancelled in that case"""
+    # A DELETE can land before the job has a task to cancel
+    if job_store.cancel_requested(job_id):
+        coro.close()
+        raise JobCancelled(f"Job {job_id} was cancelled")
+    task = asyncio.create_task(coro)
+    running_jobs[job_id] = task
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=CANCEL_POLL_SECONDS)
+            if task.done():
+                break
+            if request is not None and await request.is_disconnected():
+                logger.info(f"Client went away; cancelling job {job_id}")
+                coordinator.cancel(job_id)
+                task.cancel()
+            elif job_store.cancel_requested(job_id):
+                coordinator.cancel(job_id)
+                task.cancel()
+        if task.cancelled():
+            raise JobCancelled(f"Job {job_id} was cancelled")
+        return task.result()
+    finally:
+        running_jobs.pop(job_id, None)
+        if not task.done():
+            task.cancel()
+
+async def watch_cancels(job_ids: list):
+    """Cancel the jobs among `job_ids` that DELETE asked to stop on any worker (runs until cancelled)"""
+    pending = set(job_ids)
+    while pending:
+        await asyncio.sleep(CANCEL_POLL_SECONDS)
+        for job_id in [j for j in pending if job_store.cancel_requested(j)]:
+            if coordinator.cancel(job_id):
+                pending.discard(job_id)
+
+async def execute_job(job_id: str, query: str, coro, request: Request = None):
+    """Run a report-producing coroutine cancellably and store the outcome under `job_id`"""
+    try:
+        report = await run_cancellable(job_id, coro, request)
+        # Refused if a cancel arrived (possibly on another worker) after the last poll
+        if not job_store.save_report(job_id, report):
+            raise JobCancelled(f"Job {job_id} was cancelled")
+    except JobCancelled:
+        logger.info(f"Job {job_id} cancelled")
+        job_store.save_cancelled(job_id, query)
+        raise
+    except QueueTimeout:
+        job_store.save_failure(job_id, "No pipeline capacity became free before the deadline.")
+        raise
+    except Exception as e:
+        logger.exception(f"Research failed: {str(e)}")
+        job_store.save_failure(job_id, "Research failed due to an internal error.")
+        raise
+    return report
+
+async def research_in_slot(job_id: str, query: str, client: Client, deadline_ms: int):
+    # Run research once the fair queue hands this client a pipeline slot
+    async with scheduler.slot(client, timeout=deadline_ms / 1000) as waited:
+        logger.info(f"Starting research for: {query}...")
+        # Time spent queued counts against the end-to-end deadline
+        return await coordinator.research(query, deadline_ms=max(1, deadline_ms - waited * 1000), job_id=job_id)
+
+async def run_in_background(job_id: str, query: str, coro):
+    try:
+        await execute_job(job_id, query, coro)
+    except Exception:
+        # Outcome already stored on the job record
+        pass
+
 @app.get("/")
 def root():
     return {
@@ -30,43 +210,40 @@ def root():
     }
 
 @app.post("/research/start")
-async def start_research(request: ResearchRequest):
-    """Start a new research job"""
+async def start_research(
+    request: ResearchRequest,
+    http_request: Request,
+    deadline_ms: Optional[int] = None,
+    background: bool = False,
+    client: Client = Depends(identify_client),
+):
+    """Start a new research job.
+
+    Waits for the report unless `background=true`, which returns the job id at
+    once (follow it on /research/{job_id}/conversation). A waiting caller that
+    disconnects cancels the job.
+    """
     job_id = str(uuid.uuid4())
     
     try:
+        deadline_ms = validate_deadline(deadline_ms)
+
         # Validate query
-        query = request.query.strip()
-        
-        # Check if query is too short
-        if len(query) < 5:
-            raise HTTPException(
-                status_code=400, 
-                detail="Query too short. Please provide a more detailed research question."
-            )
-        
-        # Check if query is too long
-        if len(query) > 500:
-            raise HTTPException(
-                status_code=400,
-                detail="Query too long. Please keep your research question under 500 characters."
-            )
-        
-        # Minimal validation to allow any research topic
-        if len(query) < 2:
-            raise HTTPException(
-                status_code=400, 
-                detail="Query too short. Please provide at least a keyword to research."
-            )
-        
-        # Run research
-        print(f"[COORDINATOR] Starting research for: {query}...")
-        report = await coordinator.research(query)
-        
-        # Store result
-        research_jobs[job_id] = report
+        query = validate_query(request.query)
+        scheduler.admit(client)
+
+        # Visible (and cancellable) while it waits for a pipeline slot
+        job_store.save_running(job_id, query)
+        run = research_in_slot(job_id, query, client, deadline_ms)
+        if background:
+            task = asyncio.create_task(run_in_background(job_id, query, run))
+            running_batches.add(task)
+            task.add_done_callback(running_batches.discard)
+            return {"job_id": job_id, "status": "running", "message": "Research started"}
+
+        await execute_job(job_id, query, run, http_request)
         
-        print(f"[COORDINATOR] Research completed. Job ID: {job_id}")
+        logger.info(f"Research completed. Job ID: {job_id}")
         return {
             "job_id": job_id,
             "status": "completed",
@@ -76,44 +253,419 @@ async def start_research(request: ResearchRequest):
     except HTTPException:
         # Re-raise HTTP exceptions (validation errors)
         raise
+
+    except QuotaExceeded as e:
+        raise quota_error(e)
+
+    except QueueTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    except JobCancelled:
+        raise HTTPException(status_code=409, detail="Research job was cancelled.")
     
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"[ERROR] Research failed: {str(e)}")
-        print(error_trace)
-        
         # Return user-friendly error
         raise HTTPException(
             status_code=500, 
             detail=f"Research failed due to an internal error. Please try again or contact support if the issue persists."
         )
 
-@app.get("/research/{job_id}")
-def get_research(job_id: str):
-    """Get research results"""
-    if job_id not in research_jobs:
+def completed_record(job_id: str, action: str) -> dict:
+    """Stored record of a completed job that kept its evidence, else 404 / 409"""
+    record = job_store.get(job_id)
+    if record is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    
-    return research_jobs[job_id]
+    if record.get("status") != "completed" or not record.get("evidence"):
+        raise HTTPException(status_code=409, detail=f"Only completed research jobs can be {action}.")
+    return record
+
+@app.post("/research/{job_id}/refresh")
+async def refresh_research(
+    job_id: str,
+    request: Request,
+    deadline_ms: Optional[int] = None,
+    max_age_seconds: Optional[float] = Query(None, ge=0),
+    client: Client = Depends(identify_client),
+):
+    """Re-run a completed job as a new job, re-searching only stale or failed sub-tasks"""
+    record = completed_record(job_id, "refreshed")
+    deadline_ms = validate_deadline(deadline_ms)
+
+    new_job_id = str(uuid.uuid4())
+    previous = full_report(record)
+    outcome = {}
+
+    async def run():
+        async with scheduler.slot(client, timeout=deadline_ms / 1000) as waited:
+            report, outcome["diff"] = await coordinator.refresh(
+                previous, record["evidence"], deadline_ms=max(1, deadline_ms - waited * 1000),
+                job_id=new_job_id, max_age_seconds=max_age_seconds,
+            )
+        return report
+
+    try:
+        scheduler.admit(client)
+        job_store.save_running(new_job_id, previous["query"])
+        await execute_job(new_job_id, previous["query"], run(), request)
+    except QuotaExceeded as e:
+        raise quota_error(e)
+    except QueueTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except JobCancelled:
+        raise HTTPException(status_code=409, detail="Refresh was cancelled.")
+    except Exception as e:
+        logger.exception(f"Refresh of {job_id} failed: {e}")
+        raise HTTPException(status_code=500, detail="Refresh failed due to an internal error. Please try again.")
+    diff = outcome["diff"]
+
+    logger.info(f"Refreshed {job_id} as {new_job_id}")
+    return {
+        "job_id": new_job_id,
+        "status": "completed",
+        "refreshed_from": job_id,
+        "diff": diff,
+    }
+
+@app.post("/research/{job_id}/followup")
+async def followup_research(
+    job_id: str,
+    request: ResearchRequest,
+    http_request: Request,
+    deadline_ms: Optional[int] = None,
+    client: Client = Depends(identify_client),
+):
+    """Ask a follow-up question on a completed job.
+
+    Runs as a new job that reuses the earlier plan, sources and verification,
+    searches only for material the stored sources do not cover, and synthesizes
+    the answer in one LLM call.
+    """
+    record = completed_record(job_id, "followed up")
+    query = validate_query(request.query)
+    deadline_ms = validate_deadline(deadline_ms)
+
+    new_job_id = str(uuid.uuid4())
+    previous = full_report(record)
+    outcome = {}
+
+    async def run():
+        async with scheduler.slot(client, timeout=deadline_ms / 1000) as waited:
+            report, outcome["info"] = await coordinator.followup(
+                query, previous, record["evidence"], deadline_ms=max(1, deadline_ms - waited * 1000), job_id=new_job_id
+            )
+        return report
+
+    try:
+        scheduler.admit(client)
+        job_store.save_running(new_job_id, query)
+        await execute_job(new_job_id, query, run(), http_request)
+    except QuotaExceeded as e:
+        raise quota_error(e)
+    except QueueTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except JobCancelled:
+        raise HTTPException(status_code=409, detail="Follow-up was cancelled.")
+    except Exception as e:
+        logger.exception(f"Follow-up on {job_id} failed: {e}")
+        raise HTTPException(status_code=500, detail="Follow-up failed due to an internal error. Please try again.")
+
+    logger.info(f"Follow-up on {job_id} answered as {new_job_id}")
+    return {
+        "job_id": new_job_id,
+        "status": "completed",
+        "followup_of": job_id,
+        **outcome["info"],
+    }
+
+@app.post("/research/batch")
+async def start_batch_research(request: BatchResearchRequest, deadline_ms: Optional[int] = None, client: Client = Depends(identify_client)):
+    """Start a batch of related research queries; poll /research/batch/{batch_id} for progress"""
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one query.")
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Batch too large. Please submit at most {MAX_BATCH_QUERIES} queries.")
+    queries = [validate_query(q) for q in request.queries]
+    deadline_ms = validate_deadline(deadline_ms)
+    # The whole batch runs in one pipeline slot but is charged one unit per query
+    try:
+        ticket = scheduler.enqueue(client, cost=len(queries))
+    except QuotaExceeded as e:
+        raise quota_error(e)
+
+    batch_id = str(uuid.uuid4())
+    job_ids = [str(uuid.uuid4()) for _ in queries]
+    batch = {
+        "batch_id": batch_id,
+        "status": "running",
+        "total": len(queries),
+        "completed": 0,
+        "failed": 0,
+        "jobs": [{"job_id": job_id, "query": q, "status": "running"} for job_id, q in zip(job_ids, queries)],
+    }
+    job_store.save_batch(batch_id, batch)
+    for job_id, q in zip(job_ids, queries):
+        job_store.save_running(job_id, q)
+
+    def on_result(index: int, result):
+        entry = batch["jobs"][index]
+        if not isinstance(result, Exception) and not job_store.save_report(entry["job_id"], result):
+            result = JobCancelled(f"Job {entry['job_id']} was cancelled")
+        if isinstance(result, JobCancelled):
+            job_store.save_cancelled(entry["job_id"], entry["query"])
+            entry["status"] = "cancelled"
+            batch["failed"] += 1
+        elif isinstance(result, Exception):
+            logger.error(f"Batch {batch_id} query {index} failed: {result}")
+            job_store.save_failure(entry["job_id"], "Research failed due to an internal error.")
+            entry["status"] = "failed"
+            batch["failed"] += 1
+        else:
+            entry["status"] = "completed"
+            batch["completed"] += 1
+        job_store.save_batch(batch_id, batch)
+
+    async def run():
+        waited = await scheduler.wait(ticket)
+        # A DELETE for one of the queries may reach another worker
+        watcher = asyncio.create_task(watch_cancels(job_ids))
+        try:
+            # Time spent queued counts against the deadline, as for single jobs
+            await coordinator.research_batch(
+                queries, deadline_ms=max(1, deadline_ms - waited * 1000), max_concurrency=BATCH_CONCURRENCY,
+                on_result=on_result, job_ids=job_ids
+            )
+            batch["status"] = "completed"
+        except Exception as e:
+            logger.error(f"Batch {batch_id} failed: {e}")
+            batch["status"] = "failed"
+        finally:
+            watcher.cancel()
+            scheduler.release(client)
+        job_store.save_batch(batch_id, batch)
+
+    task = asyncio.create_task(run())
+    running_batches.add(task)
+    task.add_done_callback(running_batches.discard)
+
+    logger.info(f"Started batch {batch_id} with {len(queries)} queries")
+    return {"batch_id": batch_id, "status": "running", "job_ids": job_ids}
+
+@app.get("/research/batch/{batch_id}")
+def get_batch_research(batch_id: str):
+    """Batch-level progress; completed reports are at /research/{job_id}"""
+    batch = job_store.get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+def read_job(
+    request: Request,
+    job_id: str,
+    fields: Optional[str],
+    sources_cursor: Optional[str],
+    sources_limit: Optional[int],
+    logs_cursor: Optional[str],
+    logs_limit: Optional[int],
+):
+    """Shared body of the job read endpoints (projection + pagination)"""
+    pages = {}
+    if sources_cursor or sources_limit:
+        pages["sources"] = (sources_cursor, sources_limit or DEFAULT_PAGE_LIMIT)
+    if logs_cursor or logs_limit:
+        pages["agent_logs"] = (logs_cursor, logs_limit or DEFAULT_PAGE_LIMIT)
+
+    # Completed jobs never change, so each view is serialized and compressed only once
+    cache_key = (job_id, fields or "", tuple(sorted(pages.items())))
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        record = job_store.get(job_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+        # Plain read of a finished job: the full report, exactly as before
+        if not fields and not pages and record.get("report"):
+            doc = full_report(record)
+        else:
+            # A running job's log only exists in the worker running it
+            live = coordinator.active_jobs.get(job_id) if record.get("status") == "running" else None
+            try:
+                doc = project_job(record, parse_fields(fields), pages, live.agent_logs if live else None)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        if record.get("status") != "completed":
+            return doc
+        cached = CachedBody(doc)
+        response_cache.put(cache_key, cached)
+
+    return cached_response(request, cached)
+
+def cached_response(request: Request, cached: CachedBody) -> Response:
+    """Serve pre-built bytes in the best Content-Encoding with that coding's strong ETag, 304 on revalidation"""
+    encoding, body, etag = cached.body_for(request.headers.get("accept-encoding", ""))
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/research/{job_id}")
+def get_research(
+    request: Request,
+    job_id: str,
+    fields: Optional[str] = None,
+    sources_cursor: Optional[str] = None,
+    sources_limit: Optional[int] = Query(None, ge=1),
+    logs_cursor: Optional[str] = None,
+    logs_limit: Optional[int] = Query(None, ge=1),
+):
+    """Get research results (?fields=status,agent_logs to project, *_cursor/*_limit to page)"""
+    return read_job(request, job_id, fields, sources_cursor, sources_limit, logs_cursor, logs_limit)
 
 @app.get("/research/{job_id}/report")
-def get_research_report(job_id: str):
+def get_research_report(
+    request: Request,
+    job_id: str,
+    fields: Optional[str] = None,
+    sources_cursor: Optional[str] = None,
+    sources_limit: Optional[int] = Query(None, ge=1),
+    logs_cursor: Optional[str] = None,
+    logs_limit: Optional[int] = Query(None, ge=1),
+):
     """Get research report (alias for frontend compatibility)"""
-    if job_id not in research_jobs:
+    return read_job(request, job_id, fields, sources_cursor, sources_limit, logs_cursor, logs_limit)
+
+@app.get("/research/{job_id}/trace")
+def get_research_trace(job_id: str):
+    """Span timeline of a job in Chrome trace-event format (chrome://tracing, ui.perfetto.dev)"""
+    trace = trace_exporter.get(job_id)
+    if trace is None:
+        if job_store.get(job_id) is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        raise HTTPException(status_code=404, detail="No trace recorded for this job")
+    return trace
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_process(
+    seconds: float = Query(10, gt=0, le=MAX_PROFILE_SECONDS),
+    job_id: Optional[str] = None,
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$"),
+    interval_ms: float = Query(5, ge=1, le=100),
+):
+    """Sample this worker's CPU for `seconds`, or until `job_id` stops running (capped at `seconds`).
+
+    Profiles the whole process (every thread), not just the job's own work.
+    """
+    if job_id and job_store.get(job_id) is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    
-    return research_jobs[job_id]
+    try:
+        profiler = begin_session(interval_ms / 1000)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    try:
+        give_up_at = asyncio.get_running_loop().time() + seconds
+        if job_id:
+            while asyncio.get_running_loop().time() < give_up_at:
+                if (job_store.get(job_id) or {}).get("status") != "running":
+                    break
+                await asyncio.sleep(0.2)
+        else:
+            await asyncio.sleep(seconds)
+    finally:
+        await asyncio.to_thread(end_session, profiler)
+
+    name = f"job {job_id}" if job_id else f"{profiler.duration:.1f}s"
+    logger.info(f"Profiled {name}: {sum(profiler.samples.values())} samples")
+    if format == "speedscope":
+        return profiler.to_speedscope(name)
+    return Response(content=profiler.to_collapsed(), media_type="text/plain")
+
+@app.get("/admin/scheduler", dependencies=[Depends(require_admin)])
+def scheduler_status():
+    """Pipeline slots in use and queued per client on this worker"""
+    return scheduler.snapshot()
+
+@app.get("/admin/storage", dependencies=[Depends(require_admin)])
+def storage_status():
+    """At-rest compression of completed jobs written by this worker"""
+    return job_store.snapshot()
+
+@app.delete("/research/{job_id}")
+def cancel_research(job_id: str):
+    """Cancel a running job; its outstanding agent calls stop and free their rate-limit slots"""
+    record = job_store.get(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if record.get("status") != "running":
+        raise HTTPException(status_code=409, detail=f"Job is already {record.get('status')}.")
+    cancel_job(job_id)
+    job_store.save_cancelled(job_id, record.get("query"))
+    return {"job_id": job_id, "status": "cancelled"}
+
+def sse_event(data: dict) -> str:
+    return f"data: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
 
 @app.get("/research/{job_id}/conversation")
-async def get_conversation_sse(job_id: str):
-    """SSE endpoint stub - frontend expects this but we'll use polling instead"""
-    # For now, just return 404 gracefully - frontend will handle it
-    raise HTTPException(status_code=404, detail="SSE not implemented, use /report endpoint")
+async def get_conversation_sse(job_id: str, cancel_on_disconnect: bool = True):
+    """Server-sent events: the job's agent messages (and report sections) as they happen, then its final status.
+
+    When the last follower disconnects before the job finishes, the job is
+    cancelled (unless `cancel_on_disconnect=false`).
+    """
+    if job_store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        sent = sections_sent = 0
+        finished = False
+        job = None
+        sse_followers[job_id] = sse_followers.get(job_id, 0) + 1
+        try:
+            while True:
+                # Live messages when the job runs in this worker (kept after it ends, to flush the rest)
+                job = coordinator.active_jobs.get(job_id, job)
+                if job is not None:
+                    messages = job.agent_logs.to_json(sent)
+                    for message in messages:
+                        yield sse_event({"type": "log", **message})
+                    sent += len(messages)
+                    # Report sections as they finish (SYNTHESIS_MODE=sections)
+                    for name, content in job.sections[sections_sent:]:
+                        yield sse_event({"type": "section", "name": name, "content": content})
+                        sections_sent += 1
+
+                record = job_store.get(job_id)
+                status = record.get("status") if record else "expired"
+                if status != "running":
+                    logs = (full_report(record) or {}).get("agent_logs", []) if record else []
+                    for message in logs[sent:]:
+                        yield sse_event({"type": "log", **message})
+                    yield sse_event({"type": "status", "status": status})
+                    finished = True
+                    return
+                await asyncio.sleep(SSE_POLL_SECONDS)
+        finally:
+            sse_followers[job_id] -= 1
+            if not sse_followers[job_id]:
+                del sse_followers[job_id]
+                record = job_store.get(job_id) if not finished and cancel_on_disconnect else None
+                if record and record.get("status") == "running":
+                    logger.info(f"Last follower of job {job_id} disconnected; cancelling it")
+                    cancel_job(job_id)
+                    job_store.save_cancelled(job_id, record.get("query"))
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 if __name__ == "__main__":
     import uvicorn
     print("Starting ResearchSwarm Backend...")
     print("Server: http://localhost:8000")
     print("Gemini API Key configured")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if workers > 1 and get_store().name == "memory":
+        print("WARNING: STATE_BACKEND=memory with several workers; jobs will not be visible across workers. Use sqlite or redis.")
+    # Multiple workers need the app as an import string
+    uvicorn.run("main:app" if workers > 1 else app, host="0.0.0.0", port=8000, workers=workers)
@@ -0,0 +1,138 @@
+"""Compact, columnar store for agent activity logs.
+
+Log lines are (agent type, message template, template arguments, timestamp).
+Agent types and templates are interned process-wide, timestamps are integer
+milliseconds since the log was created (monotonic clock), and everything lives
+in parallel arrays. AgentMessage objects are only built when a log is read.
+"""
+from models.schemas import AgentMessage, AgentType
+from array import array
+from datetime import datetime
+import threading
+import time
+
+AGENT_TYPES = list(AgentType)
+_AGENT_CODES = {agent_type: code for code, agent_type in enumerate(AGENT_TYPES)}
+
+# Templates must be constant strings ("Found {} sources."), never pre-formatted messages
+_templates = []
+_template_ids = {}
+_template_lock = threading.Lock()
+
+
+def intern_template(template: str) -> int:
+    template_id = _template_ids.get(template)
+    if template_id is None:
+        with _template_lock:
+            template_id = _template_ids.get(template)
+            if template_id is None:
+                template_id = len(_templates)
+                _templates.append(template)
+                _template_ids[template] = template_id
+    return template_id
+
+
+def _slot(arg):
+    # Keep JSON-native scalars, stringify everything else
+    return arg if isinstance(arg, (str, int, float)) else str(arg)
+
+
+class AgentLog:
+    """Append-only agent log; behaves like a read-only list of message dicts.
+
+    Safe to append from worker threads while another thread reads it (the SSE
+    stream follows a running job's log).
+    """
+
+    def __init__(self, base_time: float = None):
+        # Wall-clock time of the first slot; later entries are monotonic offsets from it
+        self.base_time = base_time if base_time is not None else time.time()
+        self._base_mono = time.monotonic()
+        self._agents = array("B")
+        self._templates = array("H")
+        self._offsets_ms = array("I")
+        self._arg_counts = array("B")
+        self._arg_starts = array("I")
+        self._args = []
+        self._lock = threading.Lock()
+
+    def append(self, agent_type: AgentType, template: str, *args):
+        template_id = intern_template(template)
+        slots = [_slot(a) for a in args]
+        with self._lock:
+            self._templates.append(template_id)
+            self._offsets_ms.append(int((time.monotonic() - self._base_mono) * 1000))
+            self._arg_starts.append(len(self._args))
+            self._arg_counts.append(len(slots))
+            self._args.extend(slots)
+            # Written last: len() counts only complete entries even without the lock
+            self._agents.append(_AGENT_CODES[agent_type])
+
+    def __len__(self):
+        return len(self._agents)
+
+    def _entry(self, i: int):
+        start = self._arg_starts[i]
+        args = self._args[start:start + self._arg_counts[i]]
+        message = _templates[self._templates[i]].format(*args)
+        timestamp = datetime.fromtimestamp(self.base_time + self._offsets_ms[i] / 1000)
+        return AGENT_TYPES[self._agents[i]], message, timestamp
+
+    def message(self, i: int) -> str:
+        return self._entry(i)[1]
+
+    def to_messages(self, start: int = 0, stop: int = None) -> list:
+        """AgentMessage objects for entries [start, stop)"""
+        with self._lock:
+            entries = [self._entry(i) for i in range(*slice(start, stop).indices(len(self)))]
+        return [
+            AgentMessage(agent_type=agent_type, message=message, timestamp=timestamp)
+            for agent_type, message, timestamp in entries
+        ]
+
+    def to_json(self, start: int = 0, stop: int = None) -> list:
+        """Same as to_messages, already in the API's JSON shape"""
+        return [m.model_dump(mode="json") for m in self.to_messages(start, stop)]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.to_json(index.start or 0, index.stop)
+        return self.to_json(index, index + 1 or None)[0]
+
+    def __iter__(self):
+        return iter(self.to_json())
+
+    def to_compact(self) -> dict:
+        """JSON-friendly columnar form for the job store; template ids are local to the log"""
+        local_ids = {}
+        templates = []
+        with self._lock:
+            for template_id in self._templates:
+                if template_id not in local_ids:
+                    local_ids[template_id] = len(templates)
+                    templates.append(_templates[template_id])
+            return {
+                "base_time": self.base_time,
+                "templates": templates,
+                "agent": list(self._agents),
+                "template": [local_ids[t] for t in self._templates],
+                "offset_ms": list(self._offsets_ms),
+                "argc": list(self._arg_counts),
+                "args": list(self._args),
+            }
+
+    @classmethod
+    def from_compact(cls, data: dict) -> "AgentLog":
+        log = cls(base_time=data["base_time"])
+        global_ids = [intern_template(t) for t in data["templates"]]
+        log._agents = array("B", data["agent"])
+        log._templates = array("H", (global_ids[t] for t in data["template"]))
+        log._offsets_ms = array("I", data["offset_ms"])
+        log._arg_counts = array("B", data["argc"])
+        starts, position = array("I"), 0
+        for count in log._arg_counts:
+            starts.append(position)
+            position += count
+        log._arg_starts = starts
+        log._args = list(data["args"])
+        return log
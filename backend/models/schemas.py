@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, PrivateAttr
+from typing import Any, Dict, List
 from datetime import datetime
 from enum import Enum
 
@@ -30,6 +30,9 @@ class AgentMessage(BaseModel):
 class ResearchRequest(BaseModel):
     query: str
 
+class BatchResearchRequest(BaseModel):
+    queries: List[str]
+
 class ResearchReport(BaseModel):
     query: str
     executive_summary: str
@@ -37,3 +40,12 @@ class ResearchReport(BaseModel):
     sources: List[Source]
     confidence_score: float
     agent_logs: List[AgentMessage]
+    # Shortcuts taken to meet the job deadline (e.g. "skipped_verification")
+    degradations: List[str] = []
+    # LLM calls and prompt / cached prompt / output tokens spent on the job (JobContext.metrics)
+    metrics: Dict[str, Any] = {}
+    # Compact AgentLog (models/agent_log.py) while the report is inside the backend;
+    # agent_logs is only filled from it when the report is served
+    _agent_log: Any = PrivateAttr(default=None)
+    # Plan + per-sub-task sources behind the report, kept so the job can be refreshed
+    _evidence: Any = PrivateAttr(default=None)
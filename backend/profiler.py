@@ -0,0 +1,108 @@
+"""On-demand sampling CPU profiler for the API process.
+
+While running, a daemon thread snapshots every thread's stack with
+sys._current_frames() at a fixed interval and counts identical stacks. Nothing
+is hooked into the interpreter, so there is no cost at all while it is off.
+Results come out as collapsed stacks (flamegraph.pl / speedscope import) or as
+a speedscope JSON document.
+"""
+from collections import Counter
+import sys
+import threading
+import time
+
+DEFAULT_INTERVAL = 0.005
+
+
+class ProfilerBusy(Exception):
+    """Only one profiling session may run at a time"""
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="cpu-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.monotonic() - self.started_at
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                stack.append((names.get(ident, f"thread-{ident}"), "", 0))
+                self.samples[tuple(reversed(stack))] += 1
+
+    def to_collapsed(self) -> str:
+        """One "root;...;leaf count" line per distinct stack"""
+        lines = []
+        for stack, count in self.samples.most_common():
+            frames = [stack[0][0]] + [f"{name} ({filename}:{line})" for name, filename, line in stack[1:]]
+            lines.append(f"{';'.join(frames)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def to_speedscope(self, name: str) -> dict:
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in self.samples.items():
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1] or None, "line": frame[2] or None})
+                ids.append(index[frame])
+            samples.append(ids)
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": name,
+            "exporter": "researchswarm-profiler",
+        }
+
+
+_session_lock = threading.Lock()
+
+
+def begin_session(interval: float = DEFAULT_INTERVAL) -> SamplingProfiler:
+    """Start a profiler, raising ProfilerBusy if another session is running"""
+    if not _session_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profiling session is already running")
+    profiler = SamplingProfiler(interval)
+    profiler.start()
+    return profiler
+
+
+def end_session(profiler: SamplingProfiler):
+    try:
+        profiler.stop()
+    finally:
+        _session_lock.release()
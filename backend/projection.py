@@ -0,0 +1,75 @@
+"""Field projection and cursor pagination for job read endpoints."""
+from models.schemas import ResearchReport
+from models.agent_log import AgentLog
+import base64
+
+JOB_FIELDS = {"job_id", "status", "error"} | set(ResearchReport.model_fields)
+PAGINATED_FIELDS = ("sources", "agent_logs")
+MAX_PAGE_LIMIT = 200
+
+
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(f"o:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Cursor -> list offset; raises ValueError for anything we did not hand out"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, offset = base64.urlsafe_b64decode(padded.encode()).decode().split(":", 1)
+        value = int(offset)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if prefix != "o" or value < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return value
+
+
+def parse_fields(fields: str):
+    """"status,agent_logs" -> {"status", "agent_logs"}; None means every field"""
+    if not fields:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - JOB_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested
+
+
+def project_job(record: dict, fields: set = None, pages: dict = None, live_log: AgentLog = None) -> dict:
+    """Build the response for a job record.
+
+    `pages` maps a list field ("sources", "agent_logs") to (cursor, limit); those
+    lists are cut to one page and `next_cursors[field]` tells the client where to
+    continue (None once the list is exhausted). `live_log` is the log of a job
+    still running in this process, which has no stored log yet.
+    """
+    doc = {"job_id": record.get("job_id"), "status": record.get("status")}
+    if record.get("error"):
+        doc["error"] = record["error"]
+    doc.update(record.get("report") or {})
+    if fields is None or "agent_logs" in fields:
+        # Only the page that is actually returned gets expanded into messages
+        if live_log is not None:
+            doc["agent_logs"] = live_log
+        elif record.get("agent_log"):
+            doc["agent_logs"] = AgentLog.from_compact(record["agent_log"])
+
+    if fields is not None:
+        doc = {k: v for k, v in doc.items() if k in fields}
+
+    next_cursors = {}
+    for name, (cursor, limit) in (pages or {}).items():
+        if name not in doc:
+            continue
+        items = doc[name]
+        start = decode_cursor(cursor) if cursor else 0
+        end = start + min(limit, MAX_PAGE_LIMIT)
+        doc[name] = items[start:end]
+        doc[f"{name}_total"] = len(items)
+        next_cursors[name] = encode_cursor(end) if end < len(items) else None
+    if isinstance(doc.get("agent_logs"), AgentLog):
+        doc["agent_logs"] = doc["agent_logs"].to_json()
+    if next_cursors:
+        doc["next_cursors"] = next_cursors
+    return doc
@@ -0,0 +1,113 @@
+"""Pre-serialized, pre-compressed response bodies for completed jobs.
+
+A finished ResearchReport never changes, so it is serialized once per view
+(job + projection/pagination parameters) and kept as identity, gzip and,
+when the optional `brotli` package is installed, br bytes. Each coding has its
+own strong ETag (`"<hash>"`, `"<hash>-gzip"`, `"<hash>-br"`), since the bytes differ.
+"""
+from collections import OrderedDict
+import gzip
+import hashlib
+import json
+import threading
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+
+class CachedBody:
+    def __init__(self, doc):
+        self.identity = json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.variants = {"identity": self.identity}
+        if len(self.identity) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = gzip.compress(self.identity, compresslevel=6)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(self.identity, quality=5)
+        digest = hashlib.sha256(self.identity).hexdigest()[:32]
+        self.etags = {
+            encoding: f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+            for encoding in self.variants
+        }
+
+    @property
+    def size(self) -> int:
+        return sum(len(body) for body in self.variants.values())
+
+    def body_for(self, accept_encoding: str) -> tuple:
+        """(encoding, bytes, ETag) best matching the client's Accept-Encoding"""
+        encoding = negotiate_encoding(accept_encoding, list(self.variants))
+        return encoding, self.variants[encoding], self.etags[encoding]
+
+
+class ResponseCache:
+    """LRU of CachedBody objects bounded by total bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry: CachedBody):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+    def invalidate_job(self, job_id: str):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == job_id]:
+                self._bytes -= self._entries.pop(key).size
+
+
+def negotiate_encoding(accept_encoding: str, available: list) -> str:
+    """Pick br > gzip > identity among `available`, honouring q-values (q=0 means refused)"""
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        if not part.strip():
+            continue
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = "identity", 0.0
+    for encoding in ("br", "gzip"):
+        if encoding not in available:
+            continue
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return any(c[2:] == etag if c.startswith("W/") else c == etag for c in candidates)
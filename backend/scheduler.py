@@ -0,0 +1,228 @@
+"""Caller identification, per-client quotas and weighted fair scheduling of research jobs.
+
+Callers identify with an X-API-Key header; keys are configured in API_CLIENTS
+(a JSON list of {"key", "name", "tier", "weight", "max_concurrent",
+"max_queued", "rpm"}). Requests without a key share the "anonymous" client
+unless REQUIRE_API_KEY=true. With no keys configured every caller is anonymous,
+so that client has no per-client quotas and only the worker's slots bound it;
+once keys are configured it gets the CLIENT_* defaults like any other client.
+
+Every pipeline run holds one of PIPELINE_SLOTS slots of this worker. Waiting
+requests are served by start-time fair queuing: each gets the virtual finish
+tag start + cost / weight, where start is the later of the scheduler's virtual
+time and the client's previous tag, and a free slot goes to the smallest tag.
+A client that keeps the queue full only gets its weight's share while others
+wait, and an idle client does not bank credit. Batch-tier clients may not take
+the last INTERACTIVE_RESERVED_SLOTS slots, so interactive callers rarely queue
+behind them while batch work still soaks up spare capacity.
+"""
+from agents.llm import RateLimiter, SharedRateLimiter
+from storage.kv import get_store
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import math
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+TIER_WEIGHTS = {"interactive": 8.0, "batch": 1.0}
+
+
+class QuotaExceeded(Exception):
+    """The client is over its request rate or queue quota"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueTimeout(Exception):
+    """No pipeline slot freed up before the request's deadline"""
+
+
+class UnknownClient(Exception):
+    """Missing or unrecognised API key"""
+
+
+class Client:
+    def __init__(self, name: str, tier: str = "interactive", weight: float = None,
+                 max_concurrent: int = None, max_queued: int = None, rpm: int = None, unlimited: bool = False):
+        if tier not in TIER_WEIGHTS:
+            raise ValueError(f"Unknown client tier: {tier}")
+        self.name = name
+        self.tier = tier
+        self.weight = float(weight or TIER_WEIGHTS[tier])
+        if unlimited:
+            self.max_concurrent = self.max_queued = math.inf
+            self.rpm = self.limiter = None
+            return
+        self.max_concurrent = max_concurrent or int(os.getenv("CLIENT_MAX_CONCURRENT", "4"))
+        self.max_queued = max_queued or int(os.getenv("CLIENT_MAX_QUEUED", "16"))
+        self.rpm = rpm or int(os.getenv("CLIENT_RPM", "30"))
+        self.limiter = self._create_limiter()
+
+    def _create_limiter(self):
+        store = get_store()
+        if store.name == "memory":
+            return RateLimiter(self.rpm)
+        # Counted in the shared store so the quota holds across workers
+        return SharedRateLimiter(store, self.rpm, key_prefix=f"ratelimit:client:{self.name}")
+
+    def check_rate(self):
+        """Claim one request from the client's per-minute quota or raise QuotaExceeded"""
+        if self.limiter is None:
+            return
+        if not self.limiter.acquire(timeout=0):
+            raise QuotaExceeded(f"Rate limit of {self.rpm} requests per minute exceeded", retry_after=60 / self.rpm)
+
+
+def _key_digest(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class ClientRegistry:
+    def __init__(self, clients: list = None, require_key: bool = False):
+        # Keyed by digest so lookups do not compare raw secrets
+        self._by_digest = {}
+        for entry in clients or []:
+            entry = dict(entry)
+            key = entry.pop("key")
+            self._by_digest[_key_digest(key)] = Client(**entry)
+        self.require_key = require_key
+        # Without keys the anonymous client is every user, so quotas would throttle the whole deployment
+        self.anonymous = Client("anonymous", unlimited=not (self._by_digest or require_key))
+
+    @classmethod
+    def from_env(cls) -> "ClientRegistry":
+        return cls(
+            json.loads(os.getenv("API_CLIENTS", "[]")),
+            require_key=os.getenv("REQUIRE_API_KEY", "false").lower() == "true",
+        )
+
+    def identify(self, api_key: str = None) -> Client:
+        if not api_key:
+            if self.require_key:
+                raise UnknownClient("API key required")
+            return self.anonymous
+        client = self._by_digest.get(_key_digest(api_key))
+        if client is None:
+            raise UnknownClient("Unknown API key")
+        return client
+
+
+class Ticket:
+    def __init__(self, client: Client, start: float, finish: float, seq: int):
+        self.client = client
+        self.start = start
+        self.finish = finish
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class FairScheduler:
+    """Weighted fair queue of this worker's pipeline slots (event-loop only, not thread-safe)"""
+
+    def __init__(self, slots: int, reserved_interactive: int = 0):
+        self.slots = slots
+        self.reserved_interactive = max(0, min(reserved_interactive, slots - 1))
+        self.running = 0
+        self.virtual_time = 0.0
+        self._waiting = []
+        self._running_by_client = {}
+        self._queued_by_client = {}
+        self._finish_tags = {}
+        self._seq = itertools.count()
+
+    def _eligible(self, client: Client) -> bool:
+        free = self.slots - self.running
+        if self._running_by_client.get(client.name, 0) >= client.max_concurrent:
+            return False
+        if client.tier == "batch":
+            return free > self.reserved_interactive
+        return free > 0
+
+    def _dispatch(self):
+        while self.running < self.slots:
+            eligible = [t for t in self._waiting if self._eligible(t.client)]
+            if not eligible:
+                return
+            ticket = min(eligible, key=lambda t: (t.finish, t.seq))
+            self._waiting.remove(ticket)
+            self.virtual_time = max(self.virtual_time, ticket.start)
+            self.running += 1
+            name = ticket.client.name
+            self._running_by_client[name] = self._running_by_client.get(name, 0) + 1
+            ticket.future.set_result(None)
+
+    def admit(self, client: Client):
+        """Raise QuotaExceeded when the client's queue is full"""
+        if self._queued_by_client.get(client.name, 0) >= client.max_queued:
+            raise QuotaExceeded(f"Too many queued jobs for client '{client.name}'", retry_after=5.0)
+
+    def enqueue(self, client: Client, cost: float = 1.0) -> Ticket:
+        """Queue a request for a slot; raises QuotaExceeded when the client's queue is full"""
+        self.admit(client)
+        start = max(self.virtual_time, self._finish_tags.get(client.name, 0.0))
+        ticket = Ticket(client, start, start + cost / client.weight, next(self._seq))
+        self._finish_tags[client.name] = ticket.finish
+        self._queued_by_client[client.name] = self._queued_by_client.get(client.name, 0) + 1
+        self._waiting.append(ticket)
+        self._dispatch()
+        return ticket
+
+    async def wait(self, ticket: Ticket, timeout: float = None) -> float:
+        """Wait until the ticket holds a slot; returns the seconds spent queued"""
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if ticket.future.done():
+                # Granted just as we gave up: hand the slot straight back
+                self.release(ticket.client)
+            else:
+                self._waiting.remove(ticket)
+                ticket.future.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                raise QueueTimeout(f"No pipeline slot free within {timeout:.1f}s") from None
+            raise
+        finally:
+            self._queued_by_client[ticket.client.name] -= 1
+        return time.monotonic() - ticket.enqueued_at
+
+    def release(self, client: Client):
+        self.running -= 1
+        self._running_by_client[client.name] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, client: Client, cost: float = 1.0, timeout: float = None):
+        """Hold a pipeline slot for the body of the block; yields the seconds spent queued"""
+        ticket = self.enqueue(client, cost)
+        waited = await self.wait(ticket, timeout)
+        if waited > 0.1:
+            logger.info(f"Client '{client.name}' waited {waited:.2f}s for a pipeline slot")
+        try:
+            yield waited
+        finally:
+            self.release(client)
+
+    def snapshot(self) -> dict:
+        names = set(self._running_by_client) | set(self._queued_by_client)
+        return {
+            "slots": self.slots,
+            "running": self.running,
+            "queued": len(self._waiting),
+            "reserved_interactive": self.reserved_interactive,
+            "clients": {
+                name: {
+                    "running": self._running_by_client.get(name, 0),
+                    "queued": self._queued_by_client.get(name, 0),
+                }
+                for name in sorted(names)
+            },
+        }
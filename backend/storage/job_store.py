@@ -0,0 +1,134 @@
+from models.schemas import ResearchReport
+from models.agent_log import AgentLog
+from storage.kv import KeyValueStore
+from storage.report_codec import ReportCodec, create_report_codec
+from collections import OrderedDict
+import json
+import os
+import threading
+import time
+
+
+def full_report(record: dict):
+    """The stored report with agent_logs expanded back into AgentMessage dicts"""
+    report = record.get("report")
+    if not report or "agent_log" not in record:
+        return report
+    logs = AgentLog.from_compact(record["agent_log"]).to_json()
+    return {
+        name: logs if name == "agent_logs" else report[name]
+        for name in ResearchReport.model_fields
+        if name in report or name == "agent_logs"
+    }
+
+
+class JobStore:
+    """Research job records kept in the shared key/value store.
+
+    Completed records are stored compressed (storage/report_codec.py). The
+    latest HOT_REPORTS of them are kept decompressed in this process, since a
+    finished job is usually read several times shortly after it completes.
+    """
+
+    def __init__(self, store: KeyValueStore, ttl_seconds: float = None, codec="env", hot_reports: int = None):
+        self.store = store
+        self.ttl_seconds = ttl_seconds or float(os.getenv("JOB_TTL_SECONDS", str(7 * 24 * 3600)))
+        self.codec = create_report_codec(store) if codec == "env" else codec
+        # Records written compressed stay readable with compression turned off
+        self._decoder = self.codec or ReportCodec(store)
+        self.hot_reports = int(os.getenv("HOT_REPORTS", "256")) if hot_reports is None else hot_reports
+        # job_id -> (decompressed JSON, expires_at); completed records never change
+        self._hot = OrderedDict()
+        self._hot_lock = threading.Lock()
+
+    def _key(self, job_id: str) -> str:
+        return f"job:{job_id}"
+
+    def save(self, job_id: str, record: dict):
+        text = json.dumps(record)
+        with self._hot_lock:
+            self._hot.pop(job_id, None)
+        if record.get("status") == "completed" and self.codec is not None:
+            self.store.set_bytes(self._key(job_id), self.codec.encode(text), ttl=self.ttl_seconds)
+            self._remember(job_id, text)
+        else:
+            self.store.set(self._key(job_id), text, ttl=self.ttl_seconds)
+
+    def get(self, job_id: str):
+        with self._hot_lock:
+            entry = self._hot.get(job_id)
+            if entry is not None and entry[1] > time.time():
+                self._hot.move_to_end(job_id)
+                return json.loads(entry[0])
+        raw = self.store.get_bytes(self._key(job_id))
+        if not raw:
+            return None
+        if raw.startswith(b"{"):
+            return json.loads(raw)
+        text = self._decoder.decode(raw)
+        self._remember(job_id, text)
+        return json.loads(text)
+
+    def _remember(self, job_id: str, text: str):
+        if self.hot_reports <= 0:
+            return
+        with self._hot_lock:
+            self._hot[job_id] = (text, time.time() + self.ttl_seconds)
+            self._hot.move_to_end(job_id)
+            while len(self._hot) > self.hot_reports:
+                self._hot.popitem(last=False)
+
+    def snapshot(self) -> dict:
+        """Compression of the records this process wrote and the size of its hot cache"""
+        with self._hot_lock:
+            hot = len(self._hot)
+        return {
+            "compression": self.codec.snapshot() if self.codec is not None else None,
+            "hot_reports": hot,
+            "hot_reports_max": self.hot_reports,
+        }
+
+    def save_running(self, job_id: str, query: str):
+        self.save(job_id, {"job_id": job_id, "status": "running", "query": query})
+
+    def save_report(self, job_id: str, report: ResearchReport) -> bool:
+        """Store a completed report; False (nothing written) if the job was cancelled"""
+        if self.cancel_requested(job_id):
+            return False
+        record = {"job_id": job_id, "status": "completed"}
+        if report._agent_log is not None:
+            # Logs stay columnar at rest; they are expanded when the job is read
+            record["report"] = report.model_dump(mode="json", exclude={"agent_logs"})
+            record["agent_log"] = report._agent_log.to_compact()
+        else:
+            record["report"] = report.model_dump(mode="json")
+        if report._evidence is not None:
+            record["evidence"] = report._evidence
+        self.save(job_id, record)
+        return True
+
+    def get_report(self, job_id: str):
+        record = self.get(job_id)
+        if not record or not record.get("report"):
+            return None
+        return ResearchReport.model_validate(full_report(record))
+
+    def save_failure(self, job_id: str, error: str):
+        self.save(job_id, {"job_id": job_id, "status": "failed", "error": error})
+
+    def save_cancelled(self, job_id: str, query: str = None):
+        self.save(job_id, {"job_id": job_id, "status": "cancelled", "query": query})
+
+    def request_cancel(self, job_id: str, ttl: float = 3600):
+        """Ask whichever worker runs the job to cancel it"""
+        self.store.set(f"cancel:{job_id}", "1", ttl=ttl)
+
+    def cancel_requested(self, job_id: str) -> bool:
+        return self.store.get(f"cancel:{job_id}") is not None
+
+    def save_batch(self, batch_id: str, record: dict):
+        self.store.set(f"batch:{batch_id}", json.dumps(record), ttl=self.ttl_seconds)
+
+    def get_batch(self, batch_id: str):
+        raw = self.store.get(f"batch:{batch_id}")
+        return json.loads(raw) if raw else None
@@ -0,0 +1,219 @@
+from collections import OrderedDict
+import os
+import random
+import sqlite3
+import threading
+import time
+
+
+class KeyValueStore:
+    """Minimal key/value interface shared by every state backend.
+
+    Values are str (callers serialize to JSON); `ttl` is in seconds.
+    Binary values (compressed records) go through get_bytes / set_bytes;
+    get_bytes also returns a str value as its UTF-8 bytes.
+    """
+
+    name = "base"
+
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: float = None):
+        raise NotImplementedError
+
+    def get_bytes(self, key: str):
+        raise NotImplementedError
+
+    def set_bytes(self, key: str, value: bytes, ttl: float = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int = 1, ttl: float = None) -> int:
+        """Atomically add `amount` to an integer counter and return the new value"""
+        raise NotImplementedError
+
+
+class MemoryStore(KeyValueStore):
+    """Process-local stand-in; only correct with a single worker"""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live(self, key: str):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and time.time() >= expires_at:
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def set(self, key: str, value: str, ttl: float = None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_keys:
+                self._data.popitem(last=False)
+
+    def get_bytes(self, key: str):
+        value = self.get(key)
+        return value.encode("utf-8") if isinstance(value, str) else value
+
+    def set_bytes(self, key: str, value: bytes, ttl: float = None):
+        self.set(key, bytes(value), ttl=ttl)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str, amount: int = 1, ttl: float = None) -> int:
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                value, expires_at = amount, (time.time() + ttl if ttl else None)
+            else:
+                value, expires_at = int(entry[0]) + amount, entry[1]
+            self._data[key] = (str(value), expires_at)
+            return value
+
+
+class SQLiteStore(KeyValueStore):
+    """SQLite in WAL mode: safe to share between uvicorn workers on one box"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; autocommit so every statement is its own transaction
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float = None):
+        self._conn().execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, value, time.time() + ttl if ttl else None),
+        )
+        if random.random() < 0.01:
+            self._purge_expired()
+
+    def get_bytes(self, key: str):
+        value = self.get(key)
+        return value.encode("utf-8") if isinstance(value, str) else value
+
+    def set_bytes(self, key: str, value: bytes, ttl: float = None):
+        # Column affinity leaves bytes alone: they are stored as a BLOB
+        self.set(key, sqlite3.Binary(value), ttl=ttl)
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def incr(self, key: str, amount: int = 1, ttl: float = None) -> int:
+        now = time.time()
+        row = self._conn().execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            "  value = CASE WHEN kv.expires_at IS NOT NULL AND kv.expires_at <= ? "
+            "          THEN excluded.value ELSE CAST(kv.value AS INTEGER) + excluded.value END, "
+            "  expires_at = CASE WHEN kv.expires_at IS NOT NULL AND kv.expires_at <= ? "
+            "          THEN excluded.expires_at ELSE kv.expires_at END "
+            "RETURNING value",
+            (key, amount, now + ttl if ttl else None, now, now),
+        ).fetchone()
+        return int(row[0])
+
+    def _purge_expired(self):
+        self._conn().execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+
+class RedisStore(KeyValueStore):
+    """Any Redis-protocol server (Redis, Valkey, KeyDB, ...)"""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        import redis  # optional dependency, only needed for this backend
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        # Binary values are read back undecoded
+        self.raw_client = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        return self.client.get(key)
+
+    def set(self, key: str, value: str, ttl: float = None):
+        self.client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def get_bytes(self, key: str):
+        return self.raw_client.get(key)
+
+    def set_bytes(self, key: str, value: bytes, ttl: float = None):
+        self.raw_client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+    def incr(self, key: str, amount: int = 1, ttl: float = None) -> int:
+        pipe = self.client.pipeline()
+        pipe.incrby(key, amount)
+        if ttl:
+            # NX: only the first increment of a window sets its expiry
+            pipe.pexpire(key, int(ttl * 1000), nx=True)
+        return int(pipe.execute()[0])
+
+
+def create_store(backend: str = None) -> KeyValueStore:
+    """Build the store named by STATE_BACKEND (memory, sqlite, redis)"""
+    backend = (backend or os.getenv("STATE_BACKEND", "memory")).lower()
+    if backend == "memory":
+        return MemoryStore()
+    if backend == "sqlite":
+        return SQLiteStore(os.getenv("STATE_SQLITE_PATH", "research_state.db"))
+    if backend == "redis":
+        return RedisStore(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    raise ValueError(f"Unknown state backend: {backend}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> KeyValueStore:
+    """Process-wide store, created on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = create_store()
+        return _store
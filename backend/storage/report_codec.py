@@ -0,0 +1,147 @@
+"""Compression of completed job records at rest.
+
+A completed record (report markdown, references, columnar logs, evidence) is
+tens of KB of JSON, and most of it is boilerplate that every report shares:
+field names, URLs, agent log templates, section headings. Records are stored
+as zstd frames (`zstandard` is a required dependency), or as zlib streams with
+REPORT_COMPRESSION=zlib. Both are primed with a dictionary trained on earlier reports
+(train_report_dictionary.py, REPORT_DICT_PATH), which lets even a single
+record compress well.
+
+An encoded value is the bytes "<codec>:<dictionary id>:" followed by the
+compressed frame, written with the store's set_bytes (a SQLite BLOB, a raw
+Redis string), so nothing is spent on a text encoding. Plain JSON (it starts
+with "{") is still read as is. The dictionary in use is also written to the
+store as reportdict:{id}. Any worker can then decode records written by any
+other, including after the file has been retrained.
+"""
+from collections import Counter
+import hashlib
+import logging
+import os
+import re
+import threading
+import zlib
+import zstandard
+
+logger = logging.getLogger(__name__)
+
+# zlib only looks back this far, so only the tail of a dictionary is useful to it
+ZLIB_WINDOW = 32 * 1024
+# A raw-content dictionary is built from the text between numbers (ids, scores,
+# citation marks), which is where records repeat each other
+NUMBER_RE = re.compile(r"\d+")
+MAX_FRAGMENT_CHARS = 400
+
+
+def dictionary_id(dictionary: bytes) -> str:
+    return hashlib.sha256(dictionary).hexdigest()[:12] if dictionary else "-"
+
+
+def train_dictionary(samples: list, size: int = 64 * 1024) -> bytes:
+    """Dictionary for `samples` (encoded records): zstd's trainer, or when it cannot
+    train one, raw content made of the fragments shared by most samples"""
+    encoded = [s.encode("utf-8") if isinstance(s, str) else s for s in samples]
+    try:
+        return zstandard.train_dictionary(size, encoded).as_bytes()
+    except zstandard.ZstdError as e:
+        # Typically too few samples for the trainer
+        logger.warning(f"zstd dictionary training failed ({e}); building a raw-content dictionary")
+
+    counts = Counter()
+    for sample in encoded:
+        fragments = NUMBER_RE.split(sample.decode("utf-8", "replace"))
+        counts.update({f[:MAX_FRAGMENT_CHARS] for f in fragments})
+    common = [(fragment, n) for fragment, n in counts.items() if n > 1 and len(fragment) > 3]
+    # Both codecs favour recent history, so the most useful fragments go last
+    common.sort(key=lambda item: (item[1] * len(item[0]), item[0]))
+    chunks, total = [], 0
+    for fragment, _ in reversed(common):
+        data = fragment.encode("utf-8")
+        if total + len(data) > size:
+            continue
+        chunks.append(data)
+        total += len(data)
+    return b"".join(reversed(chunks))
+
+
+class ReportCodec:
+    """Encodes job records (JSON text) for storage; see the module docstring for the format"""
+
+    def __init__(self, store=None, dictionary: bytes = b"", method: str = None, level: int = None):
+        self.store = store
+        self.method = method or "zstd"
+        self.level = level if level is not None else (9 if self.method == "zstd" else 6)
+        self.dictionary = dictionary or b""
+        self.dict_id = dictionary_id(self.dictionary)
+        self._dicts = {"-": b"", self.dict_id: self.dictionary}
+        self._zstd = {}
+        self._lock = threading.Lock()
+        self.stats = {"encoded": 0, "raw_bytes": 0, "stored_bytes": 0}
+        if self.dictionary and store is not None:
+            store.set_bytes(f"reportdict:{self.dict_id}", self.dictionary)
+
+    def encode(self, text: str) -> bytes:
+        raw = text.encode("utf-8")
+        if self.method == "zstd":
+            payload = self._compressor().compress(raw)
+        else:
+            compressor = zlib.compressobj(self.level, zdict=self.dictionary[-ZLIB_WINDOW:]) if self.dictionary else zlib.compressobj(self.level)
+            payload = compressor.compress(raw) + compressor.flush()
+        value = f"{self.method}:{self.dict_id}:".encode("ascii") + payload
+        with self._lock:
+            self.stats["encoded"] += 1
+            self.stats["raw_bytes"] += len(raw)
+            self.stats["stored_bytes"] += len(value)
+        return value
+
+    def decode(self, value) -> str:
+        """JSON text of a stored value (bytes, or str as read with the store's get)"""
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        if value.startswith(b"{"):
+            return value.decode("utf-8")
+        method, dict_id, data = bytes(value).split(b":", 2)
+        method, dictionary = method.decode("ascii"), self._dictionary(dict_id.decode("ascii"))
+        if method == "zstd":
+            params = {"dict_data": zstandard.ZstdCompressionDict(dictionary)} if dictionary else {}
+            return zstandard.ZstdDecompressor(**params).decompress(data).decode("utf-8")
+        decompressor = zlib.decompressobj(zdict=dictionary[-ZLIB_WINDOW:]) if dictionary else zlib.decompressobj()
+        return (decompressor.decompress(data) + decompressor.flush()).decode("utf-8")
+
+    def _compressor(self):
+        # Compressors are not thread-safe; keep one per thread
+        thread = threading.get_ident()
+        compressor = self._zstd.get(thread)
+        if compressor is None:
+            params = {"dict_data": zstandard.ZstdCompressionDict(self.dictionary)} if self.dictionary else {}
+            compressor = self._zstd[thread] = zstandard.ZstdCompressor(level=self.level, **params)
+        return compressor
+
+    def _dictionary(self, dict_id: str) -> bytes:
+        dictionary = self._dicts.get(dict_id)
+        if dictionary is None:
+            raw = self.store.get_bytes(f"reportdict:{dict_id}") if self.store is not None else None
+            if raw is None:
+                raise KeyError(f"Unknown report dictionary {dict_id}")
+            dictionary = self._dicts[dict_id] = bytes(raw)
+        return dictionary
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["ratio"] = round(stats["raw_bytes"] / stats["stored_bytes"], 2) if stats["stored_bytes"] else None
+        return {"method": self.method, "dictionary": self.dict_id, **stats}
+
+
+def create_report_codec(store):
+    """Codec configured by REPORT_COMPRESSION (auto, zstd, zlib, off) / REPORT_DICT_PATH, or None when off"""
+    method = os.getenv("REPORT_COMPRESSION", "auto").lower()
+    if method == "off":
+        return None
+    dictionary = b""
+    path = os.getenv("REPORT_DICT_PATH", "report_dict.bin")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            dictionary = f.read()
+    return ReportCodec(store, dictionary, None if method == "auto" else method)
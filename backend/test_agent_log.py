@@ -0,0 +1,46 @@
+import sys
+sys.path.insert(0, '.')
+
+import json
+import threading
+from models.agent_log import AgentLog
+from models.schemas import AgentType
+
+print("Testing compact agent logs...")
+log = AgentLog()
+log.append(AgentType.COORDINATOR, "Coordinator received query: '{}'", "remote work")
+log.append(AgentType.SEARCH, "Search complete. Found {} relevant sources.", 25)
+log.append(AgentType.SYNTHESIS, "Final report generated.")
+assert len(log) == 3
+assert log.message(1) == "Search complete. Found 25 relevant sources."
+
+# to_json(start) is what SSE followers use to send only new lines
+tail = log.to_json(1)
+assert [m["agent_type"] for m in tail] == ["search", "synthesis"]
+assert log.to_json(3) == []
+assert log[0]["message"] == "Coordinator received query: 'remote work'"
+
+# The compact form survives a JSON round trip unchanged
+restored = AgentLog.from_compact(json.loads(json.dumps(log.to_compact())))
+assert restored.to_json() == log.to_json()
+print(f"Round trip OK: {len(json.dumps(log.to_compact()))} bytes compact vs {len(json.dumps(log.to_json()))} expanded")
+
+# Appends from a worker thread while another thread follows the log
+live = AgentLog()
+
+
+def writer():
+    for i in range(20000):
+        live.append(AgentType.SYNTHESIS, "Section ready: {} ({})", f"s{i}", i)
+
+
+thread = threading.Thread(target=writer)
+thread.start()
+sent = 0
+while thread.is_alive() or sent < len(live):
+    for m in live.to_json(sent):
+        assert m["message"] == f"Section ready: s{sent} ({sent})", m
+        sent += 1
+thread.join()
+assert sent == 20000
+print("All agent log tests passed!")
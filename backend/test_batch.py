@@ -0,0 +1,72 @@
+import sys
+sys.path.insert(0, '.')
+
+import os
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "5")
+os.environ.setdefault("FAKE_LLM_JITTER_MS", "0")
+os.environ.setdefault("GEMINI_RPM", "10000")
+
+import asyncio
+from agents.coordinator import CoordinatorAgent
+
+print("Testing batch research...")
+coordinator = CoordinatorAgent()
+queries = ["Impact of remote work on cities", "Impact of remote work on city centres", "EV battery supply chains"]
+
+settled = {}
+reports = asyncio.run(coordinator.research_batch(queries, on_result=settled.__setitem__, job_ids=["b1", "b2", "b3"]))
+assert sorted(settled) == [0, 1, 2]
+assert all(not isinstance(r, Exception) and r.key_findings for r in reports)
+assert not coordinator.active_jobs
+print(f"Batch of {len(queries)} finished: {[len(r.sources) for r in reports]} sources")
+
+
+# A failure before any query reaches verification must still settle (and unregister) every job
+async def broken_plan(job, limit):
+    raise RuntimeError("planner exploded")
+
+coordinator._plan_in_batch = broken_plan
+settled.clear()
+try:
+    asyncio.run(coordinator.research_batch(queries, on_result=settled.__setitem__, job_ids=["c1", "c2", "c3"]))
+    raise AssertionError("the batch should have failed")
+except RuntimeError:
+    pass
+assert sorted(settled) == [0, 1, 2] and all(isinstance(r, RuntimeError) for r in settled.values())
+assert not coordinator.active_jobs, coordinator.active_jobs
+
+# Through the API: a cancel recorded by another worker stops just that query,
+# and time spent queued comes off the batch deadline
+import main
+from models.schemas import BatchResearchRequest
+
+main.CANCEL_POLL_SECONDS = 0.005
+cancelled, deadlines = [], []
+cancel, research_batch, wait = main.coordinator.cancel, main.coordinator.research_batch, main.scheduler.wait
+main.coordinator.cancel = lambda job_id: cancelled.append(job_id) or cancel(job_id)
+main.coordinator.research_batch = lambda queries, deadline_ms, **kwargs: deadlines.append(deadline_ms) or research_batch(queries, deadline_ms=deadline_ms, **kwargs)
+
+
+async def queued_two_seconds(ticket, timeout=None):
+    await wait(ticket, timeout)
+    return 2.0
+
+main.scheduler.wait = queued_two_seconds
+
+
+async def cancel_from_another_worker():
+    started = await main.start_batch_research(BatchResearchRequest(queries=queries), client=main.clients.anonymous)
+    job_ids = started["job_ids"]
+    main.job_store.request_cancel(job_ids[1])
+    while main.job_store.get_batch(started["batch_id"])["status"] == "running":
+        await asyncio.sleep(0.01)
+    return job_ids, main.job_store.get_batch(started["batch_id"])
+
+job_ids, batch = asyncio.run(cancel_from_another_worker())
+assert cancelled == [job_ids[1]], cancelled
+assert [main.job_store.get(j)["status"] for j in job_ids] == ["completed", "cancelled", "completed"]
+assert batch["completed"] == 2 and batch["failed"] == 1
+assert deadlines == [main.DEFAULT_DEADLINE_MS - 2000]
+print("Batch query cancelled from another worker; queue wait charged to the deadline")
+print("All batch tests passed!")
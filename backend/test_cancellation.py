@@ -0,0 +1,107 @@
+import sys
+sys.path.insert(0, '.')
+
+import os
+os.environ.setdefault("LLM_BACKEND", "fake")
+# Slow enough that every job is still running when it gets cancelled
+os.environ["FAKE_LLM_LATENCY_MS"] = "400"
+os.environ.setdefault("FAKE_LLM_JITTER_MS", "0")
+os.environ.setdefault("GEMINI_RPM", "10000")
+
+import asyncio
+import time
+import uuid
+from agents.job_context import JobCancelled
+import main
+
+QUERY = "How does remote work change city centres and commuting patterns?"
+
+
+class DisconnectingRequest:
+    """Stand-in for a Starlette Request whose client goes away after `after` seconds"""
+
+    def __init__(self, after: float):
+        self.gone_at = time.monotonic() + after
+
+    async def is_disconnected(self) -> bool:
+        return time.monotonic() >= self.gone_at
+
+
+def start(job_id: str):
+    main.job_store.save_running(job_id, QUERY)
+    return main.research_in_slot(job_id, QUERY, main.clients.anonymous, main.validate_deadline(None))
+
+
+async def until_running(job_id: str):
+    while job_id not in main.coordinator.active_jobs:
+        await asyncio.sleep(0.01)
+    return main.coordinator.active_jobs[job_id]
+
+
+async def main_test():
+    print("Testing job cancellation...")
+
+    # DELETE stops a background job and records it as cancelled
+    job_id = str(uuid.uuid4())
+    task = asyncio.create_task(main.run_in_background(job_id, QUERY, start(job_id)))
+    job = await until_running(job_id)
+    started = time.monotonic()
+    assert main.cancel_research(job_id)["status"] == "cancelled"
+    await asyncio.wait_for(task, timeout=5)
+    print(f"DELETE: job stopped {time.monotonic() - started:.2f}s after the request")
+    assert job.cancelled() and job_id not in main.coordinator.active_jobs and job_id not in main.running_jobs
+    assert main.job_store.get(job_id)["status"] == "cancelled"
+    try:
+        main.cancel_research(job_id)
+        raise AssertionError("a finished job cannot be cancelled again")
+    except main.HTTPException as e:
+        assert e.status_code == 409
+
+    # A DELETE that arrives before the background task starts still stops it
+    job_id = str(uuid.uuid4())
+    main.job_store.save_running(job_id, QUERY)
+    assert main.cancel_research(job_id)["status"] == "cancelled"
+    await asyncio.wait_for(main.run_in_background(job_id, QUERY, start(job_id)), timeout=1)
+    assert main.job_store.get(job_id)["status"] == "cancelled" and job_id not in main.coordinator.active_jobs
+
+    # A cancel from another worker after the last poll: the report is not stored over it
+    async def cancelled_elsewhere_at_the_end(job_id):
+        report = await start(job_id)
+        main.job_store.request_cancel(job_id)
+        return report
+
+    job_id = str(uuid.uuid4())
+    try:
+        await main.execute_job(job_id, QUERY, cancelled_elsewhere_at_the_end(job_id))
+        raise AssertionError("the job should have been cancelled")
+    except JobCancelled:
+        pass
+    assert main.job_store.get(job_id)["status"] == "cancelled"
+    print("Cancels before the job starts and after it finishes win over the report")
+
+    # A blocking caller that disconnects cancels its job
+    job_id = str(uuid.uuid4())
+    started = time.monotonic()
+    try:
+        await main.execute_job(job_id, QUERY, start(job_id), DisconnectingRequest(after=0.3))
+        raise AssertionError("the job should have been cancelled")
+    except JobCancelled:
+        pass
+    print(f"Disconnect: job cancelled after {time.monotonic() - started:.2f}s")
+    assert main.job_store.get(job_id)["status"] == "cancelled" and job_id not in main.coordinator.active_jobs
+
+    # The last SSE follower going away cancels a background job
+    job_id = str(uuid.uuid4())
+    task = asyncio.create_task(main.run_in_background(job_id, QUERY, start(job_id)))
+    await until_running(job_id)
+    stream = (await main.get_conversation_sse(job_id)).body_iterator
+    first = await stream.__anext__()
+    assert '"type": "log"' in first
+    await stream.aclose()
+    await asyncio.wait_for(task, timeout=5)
+    assert main.job_store.get(job_id)["status"] == "cancelled" and not main.sse_followers
+    print("SSE: last follower leaving cancelled the job")
+    print("All cancellation tests passed!")
+
+
+asyncio.run(main_test())
@@ -0,0 +1,44 @@
+import sys
+sys.path.insert(0, '.')
+
+import time
+from google.api_core import exceptions
+from agents.context_cache import ContextCache
+
+print("Testing context cache creation failures...")
+corpus = "Source [1]: remote work keeps shifting footfall away from city centres. " * 40
+
+
+def failing_cache(error):
+    cache = ContextCache(backend="fake", min_tokens=10, retry_seconds=0.2)
+    real_create = cache._create
+    calls = []
+
+    def create(model_name, text):
+        calls.append(model_name)
+        if error is not None:
+            raise error
+        return real_create(model_name, text)
+
+    cache._create = create
+    return cache, calls
+
+
+# A transient failure sends corpora inline only for the retry window
+cache, calls = failing_cache(exceptions.ServiceUnavailable("backend overloaded"))
+assert not cache.register("gemini-flash-latest", corpus).cached
+assert not cache.register("gemini-flash-latest", corpus + " more").cached
+assert len(calls) == 1, "no retry inside the window"
+cache._create = ContextCache(backend="fake")._create
+time.sleep(0.25)
+assert cache.register("gemini-flash-latest", corpus).cached, "retried once the window passed"
+print("Transient failure: retried after the window")
+
+# The provider saying the model cannot cache content is final
+cache, calls = failing_cache(exceptions.InvalidArgument("Model gemini-x does not support cached content"))
+assert not cache.register("gemini-x", corpus).cached
+time.sleep(0.25)
+assert not cache.register("gemini-x", corpus).cached
+assert calls == ["gemini-x"] and "gemini-x" in cache._unsupported
+print("Unsupported model: not retried")
+print("All context cache tests passed!")
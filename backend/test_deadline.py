@@ -0,0 +1,59 @@
+import sys
+sys.path.insert(0, '.')
+
+import os
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ["FAKE_LLM_LATENCY_MS"] = "400"
+os.environ["FAKE_LLM_JITTER_MS"] = "0"
+os.environ.setdefault("GEMINI_RPM", "10000")
+
+import asyncio
+import time
+from agents.coordinator import CoordinatorAgent
+from agents.job_context import DeadlineExceeded, JobContext, current_job
+from agents.llm import LLMClient
+
+QUERY = "How does remote work change city centres and commuting patterns?"
+
+coordinator = CoordinatorAgent()
+# Same policy on a seconds scale instead of tens of seconds
+coordinator.FEWER_SUBTASKS_BELOW = 3.0
+coordinator.MIN_TIME_FOR_VERIFICATION = 1.5
+coordinator.MIN_TIME_FOR_SYNTHESIS = 0.8
+
+
+def research(deadline_ms: float = None) -> tuple:
+    start = time.perf_counter()
+    report = asyncio.run(coordinator.research(QUERY, deadline_ms=deadline_ms))
+    return report, time.perf_counter() - start
+
+
+print("Testing deadlines...")
+report, elapsed = research()
+print(f"No deadline: {elapsed:.2f}s, degradations {report.degradations}")
+assert report.degradations == []
+
+# A deadline shorter than the normal run: stages are shortened and the report still arrives in time
+report, elapsed = research(deadline_ms=2000)
+print(f"2 s deadline: {elapsed:.2f}s, degradations {report.degradations}")
+assert elapsed < 2.5 and report.degradations and report.executive_summary
+
+# Too little time for any LLM stage: no verification and the template report
+report, elapsed = research(deadline_ms=300)
+print(f"0.3 s deadline: {elapsed:.2f}s, degradations {report.degradations}")
+assert elapsed < 0.8
+assert "skipped_verification" in report.degradations and "demo_report" in report.degradations
+
+# LLM calls made for an expired job are refused
+job = JobContext(QUERY, deadline_ms=1)
+time.sleep(0.01)
+token = current_job.set(job)
+try:
+    LLMClient("gemini-flash-latest").generate_content("Too late")
+    raise AssertionError("the call should have been refused")
+except DeadlineExceeded:
+    pass
+finally:
+    current_job.reset(token)
+assert job.time_left(reserve=5) == 0.0 and JobContext(QUERY).time_left() is None
+print("All deadline tests passed!")
@@ -0,0 +1,47 @@
+import sys
+sys.path.insert(0, '.')
+
+import os
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "5")
+os.environ.setdefault("FAKE_LLM_JITTER_MS", "0")
+os.environ.setdefault("GEMINI_RPM", "10000")
+
+import asyncio
+from agents.coordinator import CoordinatorAgent
+
+QUERY = "Impact of remote work on city centres"
+
+coordinator = CoordinatorAgent()
+report = asyncio.run(coordinator.research(QUERY))
+previous, evidence = report.model_dump(mode="json"), report._evidence
+assert evidence["subtasks"] and all(entry["sources"] for entry in evidence["subtasks"])
+
+
+def must_not_run(*args, **kwargs):
+    raise AssertionError("follow-ups reuse the stored plan and verification")
+
+
+coordinator.planner.plan_research = must_not_run
+coordinator.verifier.verify_sources = must_not_run
+searches = []
+search_task = coordinator.searcher.search_task
+coordinator.searcher.search_task = lambda description, *args: searches.append(description) or search_task(description, *args)
+
+print("Testing follow-up questions...")
+# Everything the question asks about is already covered: no search at all
+answer, info = asyncio.run(coordinator.followup("Remote work impact on city centres specifically?", previous, evidence))
+print(f"Covered follow-up: {info}")
+assert not info["searched"] and searches == [] and answer.executive_summary
+assert info["reused_subtasks"] == len(evidence["subtasks"])
+assert answer._evidence["subtasks"][:len(evidence["subtasks"])] == evidence["subtasks"]
+covered_sources = info["sources"]
+
+# New ground: one search for the new terms, added to the stored plan
+answer, info = asyncio.run(coordinator.followup("How do property taxes and municipal budgets respond?", previous, evidence))
+print(f"New-terms follow-up: {info}")
+assert info["searched"] and len(searches) == 1 and QUERY in searches[0]
+assert {"property", "taxes", "municipal", "budgets"} <= set(info["new_terms"])
+assert len(answer._evidence["subtasks"]) == len(evidence["subtasks"]) + 1
+assert info["sources"] > covered_sources
+print("All follow-up tests passed!")
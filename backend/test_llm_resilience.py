@@ -0,0 +1,115 @@
+import sys
+sys.path.insert(0, '.')
+
+import os
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("GEMINI_RPM", "10000")
+
+import threading
+import time
+from agents import llm
+from agents.job_context import DeadlineExceeded, JobContext, current_job
+from agents.llm import CircuitBreaker, CircuitOpenError, LLMClient
+
+
+class Response:
+    def __init__(self, text: str):
+        self.text = text
+        self.usage_metadata = None
+
+
+class StubModel:
+    """Sleeps `delays[i]` on the i-th call (the last delay repeats); raises while `failing` is set"""
+
+    def __init__(self, delays: list = (0.0,), failing: bool = False):
+        self.delays = list(delays)
+        self.failing = failing
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None, request_options=None):
+        with self._lock:
+            delay = self.delays[min(self.calls, len(self.delays) - 1)]
+            self.calls += 1
+        time.sleep(delay)
+        if self.failing:
+            raise RuntimeError("upstream error")
+        return Response(f"answer after {delay}s")
+
+
+print("Testing circuit breaker...")
+breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=0.1)
+for _ in range(3):
+    assert breaker.allow()
+    breaker.record_failure()
+assert breaker.is_open() and not breaker.allow()
+time.sleep(0.12)
+assert breaker.allow(), "one trial call after the cooldown"
+assert not breaker.allow(), "only one trial at a time"
+breaker.record_failure()
+assert breaker.is_open() and not breaker.allow(), "a failed trial reopens the circuit"
+time.sleep(0.12)
+assert breaker.allow()
+breaker.record_success()
+assert not breaker.is_open() and breaker.allow()
+
+# Through LLMClient: failures open the model's circuit and later calls fail fast
+os.environ["LLM_BREAKER_FAILURES"] = "2"
+client = LLMClient("resilience-breaker-model")
+client.model = StubModel(failing=True)
+for _ in range(2):
+    try:
+        client.generate_content("hello")
+    except RuntimeError:
+        pass
+assert not client.available()
+try:
+    client.generate_content("hello")
+    raise AssertionError("the circuit should be open")
+except CircuitOpenError:
+    pass
+assert client.model.calls == 2, "an open circuit sends nothing upstream"
+print("Breaker opens, fails fast and recovers through one trial call")
+
+print("Testing hedged requests...")
+client = LLMClient("resilience-hedge-model")
+for _ in range(20):
+    client.latency.record(0.02)
+llm._hedge_stats.update(calls=1000, hedges=0)
+# The first request stalls; the hedge sent after the p95 delay answers
+client.model = StubModel(delays=[2.0, 0.01])
+start = time.perf_counter()
+response = client.generate_content("hello")
+elapsed = time.perf_counter() - start
+print(f"Stalled call answered by its hedge in {elapsed:.2f}s")
+assert elapsed < 0.5 and client.model.calls == 2 and llm._hedge_stats["hedges"] == 1
+assert response.text == "answer after 0.01s"
+
+# Hedges are capped at LLM_HEDGE_MAX_RATIO of all calls
+llm._hedge_stats.update(calls=10, hedges=0)
+client.model = StubModel(delays=[0.3, 0.01])
+client.generate_content("hello")
+assert client.model.calls == 1 and llm._hedge_stats["hedges"] == 0
+
+# Roles sharing a model keep separate latency windows, so short calls do not set long calls' hedge delay
+verification = LLMClient("resilience-shared-model", role="verification")
+synthesis = LLMClient("resilience-shared-model", role="synthesis")
+assert verification.latency is not synthesis.latency
+assert verification.latency is LLMClient("resilience-shared-model", role="verification").latency
+
+# A call that is not hedged still gives up at the job deadline
+client = LLMClient("resilience-deadline-model")
+client.model = StubModel(delays=[2.0])
+token = current_job.set(JobContext("deadline", deadline_ms=300))
+start = time.perf_counter()
+try:
+    client.generate_content("hello")
+    raise AssertionError("the job deadline should have passed")
+except DeadlineExceeded:
+    pass
+finally:
+    current_job.reset(token)
+elapsed = time.perf_counter() - start
+print(f"Unhedged call abandoned at the deadline after {elapsed:.2f}s")
+assert elapsed < 0.6 and client.available(), "our deadline is not an upstream failure"
+print("All LLM resilience tests passed!")
@@ -0,0 +1,78 @@
+import sys
+sys.path.insert(0, '.')
+
+import asyncio
+import json
+import os
+import time
+from agents.fake_llm import FakeGenerativeModel
+from loadtest import Stats, percentile, run_closed, run_open
+
+print("Testing the fake LLM...")
+os.environ["FAKE_LLM_LATENCY_MS"] = "20"
+os.environ["FAKE_LLM_JITTER_MS"] = "0"
+model = FakeGenerativeModel("fake")
+plan = model.generate_content("Break the query into a numbered list of tasks").text
+assert len(plan.splitlines()) == 4
+batch = json.loads(model.generate_content("You are a search engine simulator.\nq1: remote work\nq2: city centres").text)
+assert set(batch) == {"q1", "q2"} and len(batch["q1"]) == 5
+report = json.loads(model.generate_content('Return JSON with "executive_summary"').text)
+assert {"executive_summary", "key_findings", "detailed_analysis", "conclusion"} <= set(report)
+assert model.generate_content("prompt").usage_metadata.prompt_token_count == 1
+try:
+    model.generate_content("prompt", request_options={"timeout": 0.005})
+    raise AssertionError("a call slower than its timeout should fail")
+except TimeoutError:
+    pass
+os.environ["FAKE_LLM_ERROR_RATE"] = "1"
+try:
+    FakeGenerativeModel("fake").generate_content("prompt")
+    raise AssertionError("injected errors should raise")
+except RuntimeError:
+    pass
+os.environ.pop("FAKE_LLM_ERROR_RATE")
+
+print("Testing load generator bookkeeping...")
+assert percentile([], 50) is None
+assert percentile([0.3, 0.1, 0.2, 0.4], 50) == 0.3 and percentile([0.1, 0.2], 99) == 0.2
+stats = Stats()
+for seconds in (0.1, 0.2, 0.3):
+    stats.record(seconds, 200)
+stats.record(1.0, 503)
+stats.record(1.0, "ConnectError")
+summary = stats.report(elapsed=2.0)
+assert summary["requests"] == 5 and summary["ok"] == 3 and summary["rps"] == 1.5
+assert summary["errors"] == {"503": 1, "ConnectError": 1}
+assert summary["latency_ms"]["p50"] == 200.0 and summary["latency_ms"]["max"] == 300.0
+
+
+class SlowScenario:
+    """Answers every request after `delay` seconds"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.in_flight = self.peak = 0
+
+    async def request(self) -> int:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return 200
+
+
+async def main():
+    # Open loop keeps its schedule (and counts queueing) however slow responses are
+    scenario, stats = SlowScenario(0.2), Stats()
+    start = time.monotonic()
+    await run_open(scenario, stats, rate=50, duration=0.4)
+    assert len(stats.latencies) == 20 and scenario.peak >= 10
+    assert time.monotonic() - start < 0.8
+    # Closed loop never has more than `concurrency` requests out
+    scenario, stats = SlowScenario(0.05), Stats()
+    await run_closed(scenario, stats, concurrency=3, duration=0.3)
+    assert scenario.peak == 3 and 12 <= len(stats.latencies) <= 21
+
+
+asyncio.run(main())
+print("All load test harness tests passed!")
@@ -0,0 +1,89 @@
+import sys
+sys.path.insert(0, '.')
+
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from agents.search_backends import build_local_index, tokenize, LocalIndexSearchBackend
+
+print("Testing local inverted index...")
+
+docs = [
+    {"title": "Electric vehicle", "url": "https://en.wikipedia.org/wiki/Electric_vehicle",
+     "text": "An electric vehicle uses one or more electric motors for propulsion. Charging infrastructure and the power grid are key to EV adoption."},
+    {"title": "Artificial intelligence", "url": "https://en.wikipedia.org/wiki/Artificial_intelligence",
+     "text": "Artificial intelligence is the capability of computational systems to perform tasks associated with human intelligence, such as learning and reasoning."},
+    {"title": "Power grid", "url": "https://en.wikipedia.org/wiki/Electrical_grid",
+     "text": "An electrical grid is an interconnected network for electricity delivery from producers to consumers. Peak demand strains distribution networks."},
+]
+
+with tempfile.TemporaryDirectory() as tmp:
+    corpus_path = os.path.join(tmp, "corpus.jsonl")
+    with open(corpus_path, "w", encoding="utf-8") as f:
+        for d in docs:
+            f.write(json.dumps(d) + "\n")
+
+    meta = build_local_index(corpus_path, os.path.join(tmp, "index"))
+    print(f"Indexed {meta['num_docs']} passages")
+
+    backend = LocalIndexSearchBackend(os.path.join(tmp, "index"))
+    start = time.perf_counter()
+    results = backend.search("impact of electric vehicles on the power grid", max_results=3)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Found {len(results)} results in {elapsed_ms:.2f} ms")
+    for i, r in enumerate(results, 1):
+        print(f"{i}. {r.title} - {r.url}")
+
+    assert results and results[0].title in ("Electric vehicle", "Power grid")
+    assert backend.search("quantum chromodynamics") == []
+    backend.close()
+
+    # A corpus big enough that the common terms have long posting lists
+    rng = random.Random(0)
+    vocab = [f"term{i}" for i in range(2000)]
+    corpus = []
+    for i in range(20000):
+        words = rng.choices(vocab[:50], k=20) + rng.choices(vocab, k=40)
+        corpus.append({"title": f"Passage {i}", "url": f"https://example.org/{i}", "text": " ".join(words)})
+    corpus_path = os.path.join(tmp, "large.jsonl")
+    with open(corpus_path, "w", encoding="utf-8") as f:
+        for d in corpus:
+            f.write(json.dumps(d) + "\n")
+    build_local_index(corpus_path, os.path.join(tmp, "large"))
+    backend = LocalIndexSearchBackend(os.path.join(tmp, "large"))
+
+    # Vectorised scores match a straightforward per-posting BM25
+    query = "term1 term7 term1234"
+    tokens = [tokenize(d["title"] + " " + d["text"]) for d in corpus]
+    avgdl = sum(map(len, tokens)) / len(tokens)
+    expected = {}
+    for term in query.split():
+        df = sum(term in t for t in tokens)
+        idf = math.log(1 + (len(tokens) - df + 0.5) / (df + 0.5))
+        for doc_id, t in enumerate(tokens):
+            tf = t.count(term)
+            if tf:
+                norm = backend.k1 * (1 - backend.b + backend.b * len(t) / avgdl)
+                expected[doc_id] = expected.get(doc_id, 0.0) + idf * tf * (backend.k1 + 1) / (tf + norm)
+    best = sorted(expected.values(), reverse=True)[:5]
+    results = backend.search(query, max_results=5)
+    found = [expected[int(r.url.rsplit("/", 1)[1])] for r in results]
+    assert all(math.isclose(a, b) for a, b in zip(found, best)) and len(found) == 5
+
+    queries = ["term1 term2 term3", "term5 term40 term900", "term12 term1999", "term30 term31 term32 term33"]
+    backend.search(queries[0])
+    timings = []
+    for _ in range(5):
+        for q in queries:
+            start = time.perf_counter()
+            backend.search(q, max_results=5)
+            timings.append((time.perf_counter() - start) * 1000)
+    median_ms = sorted(timings)[len(timings) // 2]
+    print(f"20000 passages: median search {median_ms:.2f} ms")
+    assert median_ms < 10
+    backend.close()
+    print("✅ Local index working")
@@ -0,0 +1,53 @@
+import sys
+sys.path.insert(0, '.')
+
+import os
+os.environ.setdefault("LLM_BACKEND", "fake")
+for name in [n for n in os.environ if n.startswith("LLM_MODEL")]:
+    del os.environ[name]
+
+from models.schemas import Source
+from agents.llm import MODEL_MAP, model_for
+from agents.planner_agent import PlannerAgent
+from agents.synthesis_agent import SynthesisAgent
+
+print("Testing the per-agent model cascade...")
+assert model_for("planner") == MODEL_MAP["planner"] and model_for("unknown") == "gemini-flash-latest"
+os.environ["LLM_MODEL"] = "gemini-pinned"
+os.environ["LLM_MODEL_PLANNER"] = "gemini-planner-only"
+assert model_for("planner") == "gemini-planner-only" and model_for("synthesis") == "gemini-pinned"
+assert PlannerAgent().model.model_name == "gemini-planner-only"
+del os.environ["LLM_MODEL"], os.environ["LLM_MODEL_PLANNER"]
+print(f"Default tiers: {MODEL_MAP}")
+
+synthesizer = SynthesisAgent()
+synthesizer.demo_mode = False
+strong = [Source(title=f"Source {i}", url=f"https://example.org/{i}", snippet="Snippet.", credibility_score=0.9) for i in range(1, 9)]
+weak = strong[:1]
+agree = {"has_conflicts": False, "verification_text": "CONSISTENT: fine", "confidence_adjustment": 0.0}
+conflict = {"has_conflicts": True, "verification_text": "CONFLICTS: figures differ", "confidence_adjustment": -0.2}
+
+# Well-supported, consistent evidence stays on the default tier
+assert synthesizer.escalation_reason(strong, agree) is None
+assert synthesizer._model_for_report(strong, agree) is synthesizer.model
+# Contested or thin evidence escalates
+assert synthesizer.escalation_reason(strong, conflict) == "sources conflict"
+assert synthesizer.escalation_reason(weak, agree).startswith("confidence")
+assert synthesizer._model_for_report(strong, conflict) is synthesizer.escalation_model
+assert synthesizer.escalation_model.model_name == MODEL_MAP["synthesis_escalated"]
+print(f"Escalated reports go to {synthesizer.escalation_model.model_name}")
+
+# The larger model being unhealthy falls back to the default tier instead of failing
+breaker = synthesizer.escalation_model.breaker
+for _ in range(breaker.failure_threshold):
+    breaker.record_failure()
+assert synthesizer._model_for_report(strong, conflict) is synthesizer.model
+breaker.record_success()
+
+# With both roles on the same model there is nothing to escalate to
+os.environ["LLM_MODEL"] = "gemini-pinned"
+pinned = SynthesisAgent()
+pinned.demo_mode = False
+assert pinned.escalation_model is pinned.model and pinned.escalation_reason(weak, conflict) is None
+del os.environ["LLM_MODEL"]
+print("All model cascade tests passed!")
@@ -0,0 +1,41 @@
+import sys
+sys.path.insert(0, '.')
+
+from agents.planner_agent import PlannerAgent
+
+print("Testing planner tiers...")
+planner = PlannerAgent()
+
+queries = [
+    "Impact of EVs on Indian power grid",
+    "What is the impact of AI on jobs in India?",
+    "Compare costs and risks of nuclear vs solar energy",
+    "Latest trends in quantum computing",
+]
+
+print("\n--- Rule-based planner (no LLM call) ---")
+for query in queries:
+    tasks = planner.rule_based_plan(query)
+    print(f"\n{query}")
+    for task in tasks:
+        print(f"  {task.priority}. {task.description}")
+    assert 3 <= len(tasks) <= 5
+
+print("\n--- Plan cache ---")
+assert planner.normalize_query("  What IS AI?? ") == "what is ai"
+assert planner.cached_plan("What is AI?") is None
+planner.plan_cache.set(planner.normalize_query("What is AI?"), ["Task A", "Task B", "Task C"])
+cached = planner.cached_plan("what is ai")
+print(f"Cached plan: {[t.description for t in cached]}")
+assert [t.description for t in cached] == ["Task A", "Task B", "Task C"]
+
+print("\n--- LLM latency estimate ---")
+planner._record_latency(20000)
+assert planner.expected_llm_latency_ms() > 19000
+# A slow period must not disable the LLM tier for good: the estimate drifts back to the default
+planner._latency_measured_at -= 10 * planner.LATENCY_HALF_LIFE_SECONDS
+recovered = planner.expected_llm_latency_ms()
+print(f"Estimate after 10 half-lives without calls: {recovered:.0f} ms")
+assert abs(recovered - planner.DEFAULT_LLM_LATENCY_MS) < 50
+
+print("\n✅ Planner tiers working")
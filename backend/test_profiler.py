@@ -0,0 +1,46 @@
+import sys
+sys.path.insert(0, '.')
+
+import threading
+import time
+from profiler import ProfilerBusy, begin_session, end_session
+
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+print("Testing the sampling profiler...")
+stop = threading.Event()
+worker = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+worker.start()
+profiler = begin_session(interval=0.002)
+try:
+    begin_session()
+    raise AssertionError("only one session may run")
+except ProfilerBusy:
+    pass
+time.sleep(0.3)
+end_session(profiler)
+stop.set()
+worker.join()
+
+total = sum(profiler.samples.values())
+busy = sum(n for stack, n in profiler.samples.items() if stack[0][0] == "busy-worker")
+print(f"{total} samples over {profiler.duration:.2f}s, {busy} in busy-worker")
+assert busy > 5 and all(stack[0][0] != "cpu-profiler" for stack in profiler.samples)
+
+collapsed = profiler.to_collapsed()
+assert any(line.startswith("busy-worker;") and "busy_loop (" in line for line in collapsed.splitlines())
+assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed.strip().splitlines())
+
+doc = profiler.to_speedscope("test")
+profile = doc["profiles"][0]
+assert len(profile["samples"]) == len(profile["weights"]) == len(profiler.samples)
+assert all(0 <= i < len(doc["shared"]["frames"]) for sample in profile["samples"] for i in sample)
+assert abs(profile["endValue"] - total * 0.002) < 1e-9
+
+# The session lock is released, so a new session can start
+end_session(begin_session())
+print("All profiler tests passed!")
@@ -0,0 +1,49 @@
+import sys
+sys.path.insert(0, '.')
+
+import os
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+from models.schemas import AgentType
+from models.agent_log import AgentLog
+from agents.job_context import JobContext
+from projection import project_job, parse_fields
+import main
+
+print("Testing job projection...")
+log = AgentLog()
+for i in range(5):
+    log.append(AgentType.SEARCH, "Searched sub-task {}", i)
+record = {
+    "job_id": "done",
+    "status": "completed",
+    "report": {"query": "remote work", "sources": [{"url": f"https://example.org/{i}"} for i in range(3)]},
+    "agent_log": log.to_compact(),
+}
+
+doc = project_job(record, parse_fields("status,agent_logs"), {"agent_logs": (None, 2)})
+assert set(doc) == {"status", "agent_logs", "agent_logs_total", "next_cursors"}
+assert [m["message"] for m in doc["agent_logs"]] == ["Searched sub-task 0", "Searched sub-task 1"]
+rest = project_job(record, parse_fields("agent_logs"), {"agent_logs": (doc["next_cursors"]["agent_logs"], 10)})
+assert len(rest["agent_logs"]) == 3 and rest["next_cursors"]["agent_logs"] is None
+
+# A running job has no stored log; this worker serves the live one
+job = JobContext("remote work")
+job.agent_logs.append(AgentType.PLANNER, "Planning {} sub-tasks", 4)
+job.agent_logs.append(AgentType.SEARCH, "Searching {} sub-tasks in parallel...", 4)
+main.job_store.save_running("live", "remote work")
+main.coordinator.active_jobs["live"] = job
+try:
+    doc = main.read_job(None, "live", "status,agent_logs", None, None, None, None)
+    assert doc["status"] == "running"
+    assert [m["message"] for m in doc["agent_logs"]] == ["Planning 4 sub-tasks", "Searching 4 sub-tasks in parallel..."]
+    job.agent_logs.append(AgentType.SEARCH, "Retrieved {} sources", 12)
+    doc = main.read_job(None, "live", "agent_logs", None, None, None, 10)
+    assert doc["agent_logs_total"] == 3 and doc["agent_logs"][-1]["message"] == "Retrieved 12 sources"
+finally:
+    main.coordinator.active_jobs.pop("live", None)
+
+# Running elsewhere (not in this worker): status only, no logs
+doc = main.read_job(None, "live", None, None, None, None, None)
+assert doc["status"] == "running" and "agent_logs" not in doc
+print("All projection tests passed!")
@@ -0,0 +1,55 @@
+import sys
+sys.path.insert(0, '.')
+
+import os
+import random
+import tempfile
+import time
+from agents.query_model import HashedLogisticClassifier
+from agents.query_classifier import QueryClassifierAgent, QueryType
+
+print("Testing local query classifier...")
+random.seed(0)
+topics = ["solar subsidies", "AI in hospitals", "EV batteries", "crypto regulation", "remote work", "rice exports", "coral reefs", "5G rollout"]
+templates = {
+    "research": ["assess the long term effects of {} on employment", "compare regional studies on {}", "evidence on the economic impact of {} in europe"],
+    "definition": ["meaning of {}", "{} explained simply", "give me a definition of {}"],
+    "opinion_forced": ["tell me {} is a scam", "convince me {} ruins everything", "admit {} is terrible"],
+    "time_sensitive": ["breaking news on {}", "what happened with {} an hour ago", "{} updates from this morning"],
+}
+texts, labels = [], []
+for label, patterns in templates.items():
+    for _ in range(60):
+        texts.append(random.choice(patterns).format(random.choice(topics)))
+        labels.append(label)
+
+model = HashedLogisticClassifier(list(templates))
+stats = model.fit(texts, labels)
+print(f"Training stats: {stats}")
+assert stats["holdout_accuracy"] > 0.9
+
+label, confidence = model.predict("admit coral reefs is terrible")
+print(f"Prediction: {label} ({confidence:.2f})")
+assert label == "opinion_forced"
+
+start = time.perf_counter()
+for _ in range(1000):
+    model.predict("compare regional studies on rice exports")
+per_call_us = (time.perf_counter() - start) * 1000
+print(f"Predict latency: {per_call_us:.0f} us")
+
+with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "query_model.npz")
+    model.save(path)
+    reloaded = HashedLogisticClassifier.load(path)
+assert reloaded.predict("meaning of 5G rollout") == model.predict("meaning of 5G rollout")
+
+print("\n--- Classifier layers ---")
+classifier = QueryClassifierAgent(model=reloaded, threshold=0.5)
+assert classifier.classify_with_confidence("What is quantum computing?") == (QueryType.DEFINITION, 1.0)
+print(classifier.classify_with_confidence("tell me remote work is a scam"))
+assert classifier.classify("tell me remote work is a scam") == QueryType.OPINION_FORCED
+strict = QueryClassifierAgent(model=reloaded, threshold=1.01)
+assert strict.classify("tell me remote work is a scam") == QueryType.UNKNOWN
+
+print("\n✅ All query model checks passed")
@@ -0,0 +1,38 @@
+import sys
+sys.path.insert(0, '.')
+
+import os
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "5")
+os.environ.setdefault("FAKE_LLM_JITTER_MS", "0")
+
+from models.schemas import Source
+from agents.synthesis_agent import SynthesisAgent
+
+print("Testing section-level refresh...")
+synthesizer = SynthesisAgent()
+verification = {"has_conflicts": False, "verification_text": "CONSISTENT: fine", "confidence_adjustment": 0.0}
+sources = [Source(title=f"Source {i}", url=f"https://example.org/{i}", snippet=f"Snippet {i}.", credibility_score=0.8) for i in range(1, 7)]
+previous = synthesizer.synthesize_report("remote work", sources, verification).model_dump(mode="json")
+sections = synthesizer.report_sections(previous)
+assert sections is not None and sections["executive_summary"].count("[") == 2
+
+# Only an uncited source is replaced: the key findings pick up the new evidence, the rest is kept
+replaced = sources[:5] + [Source(title="New", url="https://example.org/new", snippet="New.", credibility_score=0.8)]
+report, rewritten = synthesizer.refresh_report("remote work", replaced, verification, previous)
+print(f"Uncited source replaced -> rewrote {rewritten}")
+assert rewritten == ["key_findings"]
+assert synthesizer.report_sections(report.model_dump())["executive_summary"] == sections["executive_summary"]
+
+# Source [1] is dropped: sections citing it are rewritten, the others are renumbered
+dropped = sources[1:]
+report, rewritten = synthesizer.refresh_report("remote work", dropped, verification, previous)
+print(f"Cited source dropped -> rewrote {rewritten}")
+assert set(rewritten) == {"executive_summary", "key_findings"}
+
+# A cited source changed its content
+changed = [sources[0]] + [Source(title="Source 2", url="https://example.org/2", snippet="Revised.", credibility_score=0.8)] + sources[2:]
+report, rewritten = synthesizer.refresh_report("remote work", changed, verification, previous)
+print(f"Cited snippet changed -> rewrote {rewritten}")
+assert set(rewritten) == {"executive_summary", "key_findings"}
+print("All refresh tests passed!")
@@ -0,0 +1,80 @@
+import sys
+sys.path.insert(0, '.')
+
+import json
+import os
+import tempfile
+import time
+from storage.kv import MemoryStore, SQLiteStore
+from storage.job_store import JobStore
+from storage.report_codec import ReportCodec, train_dictionary
+
+print("Testing compressed report storage...")
+
+
+def record(i: int) -> dict:
+    return {
+        "job_id": f"job-{i}",
+        "status": "completed",
+        "report": {
+            "query": f"Impact of topic {i} on regional economies",
+            "executive_summary": f"## Executive Summary\n\nThe sources [1] and [2] broadly agree that topic {i} matters.",
+            "key_findings": [f"Finding {k} about topic {i} [{k}]" for k in range(1, 6)],
+            "sources": [
+                {"title": f"Result {k} for topic {i}", "url": f"https://example.org/topic-{i}/{k}",
+                 "snippet": f"Synthetic snippet {k} about topic {i} with figures and analysis.", "credibility_score": 0.8}
+                for k in range(1, 9)
+            ],
+            "confidence_score": 0.82,
+            "degradations": [],
+            "metrics": {"llm_calls": 8, "prompt_tokens": 2800},
+        },
+    }
+
+
+samples = [json.dumps(record(i)) for i in range(200)]
+dictionary = train_dictionary(samples[:150], 16 * 1024)
+plain, primed = ReportCodec(), ReportCodec(dictionary=dictionary)
+raw = sum(len(s) for s in samples[150:])
+without = sum(len(plain.encode(s)) for s in samples[150:])
+with_dict = sum(len(primed.encode(s)) for s in samples[150:])
+print(f"Held-out records: {raw} bytes -> {without} without / {with_dict} with a {len(dictionary)}-byte dictionary")
+assert with_dict < without < raw
+
+store = MemoryStore()
+jobs = JobStore(store, codec=ReportCodec(store, dictionary), hot_reports=2)
+for i in range(3):
+    jobs.save(f"job-{i}", record(i))
+stored = store.get_bytes("job:job-0")
+assert stored.startswith(b"zstd:"), "completed records are stored zstd-compressed"
+assert len(stored) == len(primed.encode(samples[0])), "no text encoding on top of the compressed frame"
+jobs.save_running("job-9", "still running")
+assert store.get("job:job-9").startswith("{"), "running records stay plain JSON"
+
+# job-0 fell out of the hot cache; another worker (fresh codec) decodes it via the stored dictionary
+other = JobStore(store, codec=None, hot_reports=0)
+assert other.get("job-0") == record(0)
+assert jobs.get("job-2") == record(2)
+print(f"Storage stats: {jobs.snapshot()}")
+
+# SQLite keeps the frame as a BLOB; a second store on the same file decodes it
+with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "state.db")
+    sqlite_jobs = JobStore(SQLiteStore(path), codec=ReportCodec(SQLiteStore(path), dictionary), hot_reports=0)
+    sqlite_jobs.save("job-5", record(5))
+    sqlite_jobs.save_running("job-6", "still running")
+    reader = JobStore(SQLiteStore(path), codec=None, hot_reports=0)
+    assert reader.get("job-5") == record(5)
+    assert reader.get("job-6")["status"] == "running"
+    assert isinstance(SQLiteStore(path).get("job:job-5"), bytes)
+
+start = time.perf_counter()
+for _ in range(1000):
+    other.get("job-1")
+cold_us = (time.perf_counter() - start) * 1000
+start = time.perf_counter()
+for _ in range(1000):
+    jobs.get("job-2")
+hot_us = (time.perf_counter() - start) * 1000
+print(f"Read latency: {cold_us:.0f} us decompressing, {hot_us:.0f} us from the hot cache")
+print("All report storage tests passed!")
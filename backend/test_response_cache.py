@@ -0,0 +1,70 @@
+import sys
+sys.path.insert(0, '.')
+
+import os
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+import gzip
+import json
+from starlette.requests import Request
+from response_cache import CachedBody, ResponseCache, etag_matches, negotiate_encoding
+import main
+
+
+def request(**headers) -> Request:
+    scope = {"type": "http", "method": "GET", "path": "/", "query_string": b"",
+             "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]}
+    return Request(scope)
+
+
+print("Testing cached responses...")
+doc = {"job_id": "done", "status": "completed", "executive_summary": "Remote work reshapes city centres. " * 40}
+body = CachedBody(doc)
+assert json.loads(body.identity) == doc and json.loads(gzip.decompress(body.variants["gzip"])) == doc
+assert CachedBody(doc).etags == body.etags, "same document, same ETags"
+gzip_etag, identity_etag = body.etags["gzip"], body.etags["identity"]
+assert gzip_etag == identity_etag[:-1] + '-gzip"', "each content-coding has its own strong ETag"
+assert list(CachedBody({"status": "completed"}).variants) == ["identity"], "small bodies stay uncompressed"
+
+# Accept-Encoding negotiation
+available = ["identity", "gzip", "br"]
+assert negotiate_encoding("gzip, deflate, br", available) == "br"
+assert negotiate_encoding("br;q=0.5, gzip", available) == "gzip"
+assert negotiate_encoding("br;q=0, gzip;q=0", available) == "identity"
+assert negotiate_encoding("*", ["identity", "gzip"]) == "gzip"
+assert negotiate_encoding("", available) == "identity"
+
+# Revalidation
+assert etag_matches(gzip_etag, gzip_etag) and etag_matches(f'"x", W/{gzip_etag}', gzip_etag)
+assert etag_matches("*", gzip_etag) and not etag_matches('"other"', gzip_etag)
+
+response = main.cached_response(request(accept_encoding="gzip"), body)
+assert response.status_code == 200 and response.headers["content-encoding"] == "gzip"
+assert response.headers["etag"] == gzip_etag and response.headers["vary"] == "Accept-Encoding"
+assert json.loads(gzip.decompress(response.body)) == doc
+response = main.cached_response(request(), body)
+assert "content-encoding" not in response.headers and json.loads(response.body) == doc
+assert response.headers["etag"] == identity_etag
+response = main.cached_response(request(if_none_match=gzip_etag, accept_encoding="gzip"), body)
+assert response.status_code == 304 and not response.body and response.headers["etag"] == gzip_etag
+# A validator for the gzip bytes does not revalidate the identity bytes
+response = main.cached_response(request(if_none_match=gzip_etag), body)
+assert response.status_code == 200 and response.headers["etag"] == identity_etag
+print(f"ETag {gzip_etag}: 200 gzip, 200 identity, 304 on revalidation")
+
+# A completed job is serialized once, then served from the cache
+main.job_store.save("cached-job", {"job_id": "cached-job", "status": "completed", "report": doc})
+first = main.read_job(request(accept_encoding="gzip"), "cached-job", "status,executive_summary", None, None, None, None)
+key = ("cached-job", "status,executive_summary", ())
+assert main.response_cache.get(key) is not None and first.status_code == 200
+again = main.read_job(request(if_none_match=first.headers["etag"], accept_encoding="gzip"), "cached-job", "status,executive_summary", None, None, None, None)
+assert again.status_code == 304
+
+# The cache is bounded by bytes and drops every view of an invalidated job
+cache = ResponseCache(max_bytes=body.size * 2 + 10)
+for view in ("a", "b", "c"):
+    cache.put(("done", view, ()), CachedBody(doc))
+assert cache.get(("done", "a", ())) is None and cache.get(("done", "c", ())) is not None
+cache.invalidate_job("done")
+assert cache.get(("done", "b", ())) is None and cache.get(("done", "c", ())) is None
+print("All response cache tests passed!")
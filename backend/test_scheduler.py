@@ -0,0 +1,97 @@
+import sys
+sys.path.insert(0, '.')
+
+import asyncio
+from scheduler import Client, ClientRegistry, FairScheduler, QueueTimeout, QuotaExceeded
+
+
+async def grant_order(scheduler: FairScheduler, clients: list, per_client: int) -> list:
+    """Queue `per_client` jobs for every client behind a busy worker; names in the order they get a slot"""
+    holder = Client("holder", max_concurrent=100)
+    blocker = scheduler.enqueue(holder)
+    await scheduler.wait(blocker)
+    tickets = [scheduler.enqueue(client) for _ in range(per_client) for client in clients]
+    waits = [asyncio.create_task(scheduler.wait(t)) for t in tickets]
+    order = []
+    scheduler.release(holder)
+    while len(order) < len(tickets):
+        granted = [t for t in tickets if t.future.done() and t not in order]
+        for ticket in sorted(granted, key=lambda t: t.seq):
+            order.append(ticket)
+            scheduler.release(ticket.client)
+        await asyncio.sleep(0)
+    await asyncio.gather(*waits)
+    return [t.client.name for t in order]
+
+
+async def main():
+    print("Testing weighted fair scheduling...")
+    # Equal weights alternate, whoever queued first
+    a = Client("a", max_concurrent=100, max_queued=100)
+    b = Client("b", max_concurrent=100, max_queued=100)
+    order = await grant_order(FairScheduler(slots=1), [a, a, b], 4)
+    assert order[:6] == ["a", "b", "a", "b", "a", "b"], order
+    print(f"Equal weights: {''.join(order)}")
+
+    # Interactive (weight 8) against batch (weight 1): 8 to 1 while both keep the queue full
+    interactive = Client("ui", tier="interactive", max_concurrent=100, max_queued=100)
+    batch = Client("nightly", tier="batch", max_concurrent=100, max_queued=100)
+    order = await grant_order(FairScheduler(slots=1), [batch, interactive], 16)
+    assert order[:18].count("ui") == 16 and order[:18].count("nightly") == 2, order[:18]
+    print(f"Weights 8:1: {order[:18]}")
+
+    # Batch work never takes the reserved interactive slot
+    scheduler = FairScheduler(slots=2, reserved_interactive=1)
+    first = scheduler.enqueue(batch)
+    await scheduler.wait(first)
+    second = scheduler.enqueue(batch)
+    await asyncio.sleep(0)
+    assert not second.future.done(), "the last slot is kept for interactive callers"
+    urgent = scheduler.enqueue(interactive)
+    assert await scheduler.wait(urgent) < 0.05
+    scheduler.release(interactive)
+    await asyncio.sleep(0)
+    assert not second.future.done(), "still reserved once the interactive job is done"
+    scheduler.release(batch)
+    await scheduler.wait(second)
+    scheduler.release(batch)
+    print("Reserved interactive slot held")
+
+    # Per-client queue quota and queue timeouts
+    small = Client("small", max_concurrent=1, max_queued=1)
+    scheduler = FairScheduler(slots=1)
+    async with scheduler.slot(small):
+        try:
+            async with scheduler.slot(small, timeout=0.05):
+                raise AssertionError("no slot should be granted")
+        except QueueTimeout:
+            pass
+        waiting = scheduler.enqueue(small)
+        try:
+            scheduler.enqueue(small)
+            raise AssertionError("the queue quota should apply")
+        except QuotaExceeded:
+            pass
+        pending = asyncio.create_task(scheduler.wait(waiting))
+    await pending
+    scheduler.release(small)
+    assert scheduler.snapshot()["running"] == 0 and scheduler.snapshot()["queued"] == 0
+
+    # Without API keys every caller is anonymous, so that client is not throttled
+    anonymous = ClientRegistry().identify(None)
+    for _ in range(100):
+        anonymous.check_rate()
+    scheduler = FairScheduler(slots=8)
+    tickets = [scheduler.enqueue(anonymous) for _ in range(40)]
+    assert scheduler.snapshot()["running"] == 8
+    for ticket in tickets:
+        await scheduler.wait(ticket)
+        scheduler.release(anonymous)
+    # Once keys are configured, key-less callers get the default quotas
+    keyed = ClientRegistry([{"key": "secret", "name": "partner"}])
+    assert keyed.identify("secret").name == "partner" and keyed.identify(None).max_concurrent == 4
+    print("Anonymous callers unthrottled until API keys are configured")
+    print("All scheduler tests passed!")
+
+
+asyncio.run(main())
@@ -0,0 +1,65 @@
+import sys
+sys.path.insert(0, '.')
+
+import os
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+from models.schemas import ResearchTask, Source
+from agents.search_agent import SearchAgent
+from agents.search_backends import SearchBackend
+from agents.job_context import JobContext, current_job
+
+
+class FlakyBatchBackend(SearchBackend):
+    """Fails the first `failures` batches, then answers every query but `unanswered`"""
+
+    name = "flaky"
+    supports_batch = True
+
+    def __init__(self, failures: int, unanswered: set = frozenset()):
+        self.failures = failures
+        self.unanswered = unanswered
+        self.batches = []
+        self.single_searches = 0
+
+    def search(self, query: str, max_results: int = 5) -> list:
+        self.single_searches += 1
+        return []
+
+    def search_batch(self, queries: dict, max_results: int = 5) -> dict:
+        self.batches.append(sorted(queries))
+        if len(self.batches) <= self.failures:
+            raise RuntimeError("batch request failed")
+        return {
+            task_id: [Source(title=query, url=f"https://example.org/{task_id}", snippet=query, credibility_score=0.8)]
+            for task_id, query in queries.items() if task_id not in self.unanswered
+        }
+
+
+print("Testing batched search fallbacks...")
+tasks = [ResearchTask(id=str(i), description=f"Remote work angle {i}", priority=i) for i in range(1, 5)]
+
+# One failed batch is retried as a batch, never as one search per task
+backend = FlakyBatchBackend(failures=1)
+results = SearchAgent(backend=backend).search_batch(tasks)
+assert len(backend.batches) == 2 and backend.single_searches == 0
+assert all(results[t.id][0].url == f"https://example.org/{t.id}" for t in tasks)
+print(f"Failed batch retried once: {backend.batches}")
+
+# The retry only asks for what the first batch left unanswered
+backend = FlakyBatchBackend(failures=0, unanswered={"3"})
+SearchAgent(backend=backend).search_batch(tasks)
+assert backend.batches == [["1", "2", "3", "4"], ["3"]] and backend.single_searches == 0
+
+# Still failing after the retry: demo sources, recorded as failed searches
+backend = FlakyBatchBackend(failures=2)
+job = JobContext("remote work")
+token = current_job.set(job)
+try:
+    results = SearchAgent(backend=backend).search_batch(tasks)
+finally:
+    current_job.reset(token)
+assert len(backend.batches) == 2 and backend.single_searches == 0
+assert all(results[t.id] for t in tasks)
+assert job.failed_searches == {t.description for t in tasks}
+print("All search batch tests passed!")
@@ -0,0 +1,73 @@
+import sys
+sys.path.insert(0, '.')
+
+import os
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ["SYNTHESIS_MODE"] = "sections"
+
+import json
+import time
+from models.schemas import Source
+from agents.synthesis_agent import SECTIONS, SynthesisAgent
+
+
+class Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class SectionModel:
+    """Answers each section after its own delay; sections in `failing` raise instead"""
+
+    model_name = "stub"
+
+    def __init__(self, delays: dict, failing: set = frozenset()):
+        self.delays = delays
+        self.failing = failing
+
+    def generate_content(self, prompt, generation_config=None, context=None):
+        name = next(n for n, (task, _) in SECTIONS.items() if f"Write only {task}." in prompt)
+        time.sleep(self.delays[name])
+        if name in self.failing:
+            raise RuntimeError(f"{name} failed")
+        if name == "key_findings":
+            return Response(json.dumps([f"Finding about remote work [{i}]" for i in (1, 2)]))
+        return Response(f"The {name.replace('_', ' ')} of remote work [1].")
+
+
+def synthesize(model: SectionModel) -> tuple:
+    synthesizer = SynthesisAgent()
+    synthesizer.demo_mode = False
+    synthesizer._model_for_report = lambda sources, verification: model
+    heard = []
+    start = time.perf_counter()
+    report = synthesizer.synthesize_report("remote work", sources, verification, on_section=lambda name, md: heard.append((name, md)))
+    return report, heard, time.perf_counter() - start
+
+
+print("Testing sectioned synthesis...")
+sources = [Source(title=f"Source {i}", url=f"https://example.org/{i}", snippet=f"Snippet {i}.", credibility_score=0.8) for i in range(1, 5)]
+verification = {"has_conflicts": False, "verification_text": "CONSISTENT: fine", "confidence_adjustment": 0.0}
+delays = {"executive_summary": 0.3, "key_findings": 0.2, "detailed_analysis": 0.4, "conclusion": 0.1}
+
+# Sections are written concurrently and announced in the order they finish
+report, heard, elapsed = synthesize(SectionModel(delays))
+print(f"Sections heard: {[name for name, _ in heard]} in {elapsed:.2f}s")
+assert [name for name, _ in heard] == sorted(delays, key=delays.get)
+assert elapsed < sum(delays.values()) * 0.8, "sections should run concurrently"
+for name, markdown in heard:
+    assert markdown.splitlines()[0] in report.executive_summary, name
+assert report.key_findings == ["Finding about remote work [1]", "Finding about remote work [2]"]
+
+# A failed section is left out of the callbacks and gets its placeholder
+report, heard, _ = synthesize(SectionModel(delays, failing={"detailed_analysis"}))
+assert [name for name, _ in heard] == ["conclusion", "key_findings", "executive_summary"]
+assert "Analysis not available." in report.executive_summary
+assert "The executive summary of remote work [1]." in report.executive_summary
+print("One failed section: placeholder, the rest kept")
+
+# Every section failing falls back to the demo report
+report, heard, _ = synthesize(SectionModel(delays, failing=set(SECTIONS)))
+assert not heard and "demonstration report" in report.executive_summary
+print("All sections failed: demo report")
+print("All sectioned synthesis tests passed!")
@@ -0,0 +1,70 @@
+import sys
+sys.path.insert(0, '.')
+
+import multiprocessing
+import os
+import tempfile
+import time
+from storage.kv import MemoryStore, SQLiteStore
+from storage.job_store import JobStore
+from agents.cache import SharedCache
+from agents.llm import SharedRateLimiter
+
+
+def count_up(path: str, n: int):
+    # A separate process stands in for another uvicorn worker
+    store = SQLiteStore(path)
+    for _ in range(n):
+        store.incr("counter", 1, ttl=60)
+
+
+def acquire_all(path: str, results):
+    limiter = SharedRateLimiter(SQLiteStore(path), requests_per_minute=10)
+    results.put(sum(limiter.acquire(timeout=0) for _ in range(10)))
+
+
+if __name__ == "__main__":
+    print("Testing shared state across workers...")
+    memory = MemoryStore(max_keys=2)
+    memory.set("a", "1", ttl=0.05)
+    assert memory.incr("n", 2) == 2 and memory.incr("n", 3) == 5
+    time.sleep(0.06)
+    assert memory.get("a") is None, "expired"
+    memory.set("b", "2")
+    memory.set("c", "3")
+    assert memory.get("n") is None, "least recently used key evicted"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.db")
+        workers = [multiprocessing.Process(target=count_up, args=(path, 200)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert SQLiteStore(path).get("counter") == "800", "incr is atomic across processes"
+        print("4 processes x 200 increments -> 800")
+
+        # One per-minute quota, drawn from by every worker
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=acquire_all, args=(path, results)) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        granted = sum(results.get() for _ in workers)
+        print(f"3 workers asking for 10 slots each under a 10 rpm quota: {granted} granted")
+        assert granted == 10
+
+        # Caches and job records written by one worker are seen by another
+        first, second = SQLiteStore(path), SQLiteStore(path)
+        SharedCache(first, "plan").set("remote work", ["Task A", "Task B"])
+        assert SharedCache(second, "plan").get("remote work") == ["Task A", "Task B"]
+        jobs_a, jobs_b = JobStore(first, codec=None), JobStore(second, codec=None)
+        jobs_a.save_running("job-1", "remote work")
+        assert jobs_b.get("job-1")["status"] == "running"
+        jobs_b.request_cancel("job-1")
+        assert jobs_a.cancel_requested("job-1")
+        first.set("short", "x", ttl=0.05)
+        time.sleep(0.06)
+        assert second.get("short") is None
+    print("All shared state tests passed!")
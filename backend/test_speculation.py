@@ -0,0 +1,83 @@
+import sys
+sys.path.insert(0, '.')
+
+import os
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("GEMINI_RPM", "10000")
+os.environ["SEARCH_BATCH_MODE"] = "parallel"
+
+import asyncio
+import time
+from models.schemas import ResearchTask, Source
+from agents.coordinator import CoordinatorAgent
+from agents.job_context import JobContext
+
+QUERY = "remote work impact on city centres"
+
+
+def source(title: str, snippet: str) -> Source:
+    return Source(title=title, url=f"https://example.org/{abs(hash(title))}", snippet=snippet, credibility_score=0.8)
+
+
+coordinator = CoordinatorAgent()
+searched = []
+
+
+def search_task(description: str, max_results: int = 5) -> list:
+    searched.append(description)
+    time.sleep(0.05)
+    return [source(f"About {description}", description)]
+
+
+coordinator.searcher.search_task = search_task
+
+
+async def speculate(results: list, delay: float):
+    await asyncio.sleep(delay)
+    return results
+
+
+async def run(tasks: list, speculative_results: list, delay: float = 0.0) -> tuple:
+    searched.clear()
+    speculative = asyncio.create_task(speculate(speculative_results, delay))
+    await asyncio.sleep(0)
+    results, extra = await coordinator._search_with_speculation(QUERY, tasks, speculative, JobContext(QUERY))
+    return results, extra, speculative
+
+
+async def main():
+    print("Testing speculative search...")
+    raw = [source("Remote work and city centres", "Remote work has emptied city centre offices.")]
+
+    # A sub-task that restates the raw query takes the speculative results instead of a search
+    tasks = [ResearchTask(id="1", description="Remote work impact on city centres", priority=1),
+             ResearchTask(id="2", description="Commuter rail ridership trends", priority=2)]
+    results, extra, _ = await run(tasks, raw)
+    assert results["1"] == raw and searched == ["Commuter rail ridership trends"] and extra == []
+    print("Near-duplicate sub-task reused the speculative results")
+
+    # Otherwise relevant speculative sources are kept as extra evidence, irrelevant ones dropped
+    tasks = [ResearchTask(id="3", description="Office vacancy rates in city centres", priority=1),
+             ResearchTask(id="4", description="Retail footfall after remote work", priority=2)]
+    noise = [source("Cooking pasta", "Boil the water first.")]
+    results, extra, _ = await run(tasks, raw + noise)
+    assert sorted(searched) == sorted(t.description for t in tasks)
+    assert extra == raw
+    print(f"Kept {len(extra)} of {len(raw + noise)} speculative sources")
+
+    # A speculative search still running once the planned searches are done is discarded
+    results, extra, speculative = await run(tasks, raw, delay=1.0)
+    await asyncio.sleep(0)
+    assert extra == [] and speculative.cancelled()
+    print("Slow speculative search cancelled")
+
+    # Only an LLM plan is slow enough to be worth a guess, and it can be switched off
+    assert coordinator._should_speculate("llm")
+    assert not coordinator._should_speculate("rules") and not coordinator._should_speculate("cache")
+    os.environ["SPECULATIVE_SEARCH"] = "false"
+    assert not coordinator._should_speculate("llm")
+    os.environ.pop("SPECULATIVE_SEARCH")
+    print("All speculative search tests passed!")
+
+
+asyncio.run(main())
@@ -0,0 +1,39 @@
+import sys
+sys.path.insert(0, '.')
+
+import time
+from storage.kv import MemoryStore
+from agents.tracing import TraceExporter
+
+print("Testing trace export...")
+
+
+def event(name: str) -> dict:
+    return {"name": name, "cat": "agent", "ph": "X", "pid": 1, "tid": 1, "ts": 0, "dur": 1, "args": {}}
+
+
+def wait_for(condition, timeout: float = 2.0):
+    give_up = time.monotonic() + timeout
+    while not condition() and time.monotonic() < give_up:
+        time.sleep(0.01)
+
+
+store = MemoryStore()
+exporter = TraceExporter(store, interval=0.05)
+for i in range(5):
+    exporter.submit("job-1", event(f"span-{i}"))
+
+# Running jobs are flushed periodically
+wait_for(lambda: exporter.get("job-1") is not None)
+assert len(exporter.get("job-1")["traceEvents"]) == 5
+
+exporter.close("job-1")
+# A span that finished after the job was closed (e.g. the losing hedged request)
+exporter.submit("job-1", event("late"))
+wait_for(lambda: exporter.late_events == 1)
+time.sleep(0.2)
+names = [e["name"] for e in exporter.get("job-1")["traceEvents"]]
+print(f"Stored trace after a late span: {names}")
+assert names == [f"span-{i}" for i in range(5)], "a late span must not replace the closed trace"
+assert exporter.late_events == 1
+print("All tracing tests passed!")
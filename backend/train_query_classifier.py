@@ -0,0 +1,50 @@
+"""Train the local query-type model used as layer 3 of QueryClassifierAgent.
+
+Usage:
+    python train_query_classifier.py queries.jsonl [query_model.npz]
+
+The input is JSONL with one {"query", "label"} record per line, label being a
+QueryType value (research, definition, ...). Records without a label are
+labelled by the classifier's own rule layers when those are conclusive, so raw
+logged queries can be mixed in. Point QUERY_MODEL_PATH at the output file.
+"""
+import json
+import sys
+import time
+from agents.query_classifier import QueryClassifierAgent, QueryType
+from agents.query_model import HashedLogisticClassifier
+
+LABELS = [t.value for t in QueryType if t is not QueryType.UNKNOWN]
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    data_path = sys.argv[1]
+    model_path = sys.argv[2] if len(sys.argv) > 2 else "query_model.npz"
+
+    rules = QueryClassifierAgent(model=False)
+    texts, labels, skipped = [], [], 0
+    with open(data_path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            label = record.get("label")
+            if not label:
+                rule_type = rules._rule_classify(record["query"].lower().strip())
+                label = rule_type.value if rule_type is not None else None
+            if label not in LABELS:
+                skipped += 1
+                continue
+            texts.append(record["query"])
+            labels.append(label)
+
+    print(f"Training on {len(texts)} queries ({skipped} skipped) from {data_path}...")
+    start = time.perf_counter()
+    model = HashedLogisticClassifier(LABELS)
+    stats = model.fit(texts, labels)
+    model.save(model_path)
+    elapsed = time.perf_counter() - start
+    print(f"Saved {model_path} in {elapsed:.1f}s: {json.dumps(stats)}")
@@ -0,0 +1,54 @@
+"""Train the dictionary completed job records are compressed with (storage/report_codec.py).
+
+Usage:
+    python train_report_dictionary.py records.jsonl|research_state.db [report_dict.bin]
+
+The input is either JSONL with one job record (or bare report) per line, or a
+SQLite state store (STATE_BACKEND=sqlite), whose completed job:* records are
+read directly. Point REPORT_DICT_PATH at the output file. Records written with
+an earlier dictionary stay readable: each dictionary is kept in the store.
+"""
+import json
+import sqlite3
+import sys
+import time
+from storage.kv import SQLiteStore
+from storage.report_codec import ReportCodec, train_dictionary
+
+DICT_SIZE = 64 * 1024
+
+
+def load_samples(path: str) -> list:
+    if path.endswith(".db"):
+        codec = ReportCodec(SQLiteStore(path))
+        rows = sqlite3.connect(path).execute("SELECT value FROM kv WHERE key LIKE 'job:%'").fetchall()
+        records = [json.loads(codec.decode(value)) for (value,) in rows]
+        records = [r for r in records if r.get("status") == "completed"]
+    else:
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    # Same serialization as JobStore.save
+    return [json.dumps(r) for r in records]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    data_path = sys.argv[1]
+    dict_path = sys.argv[2] if len(sys.argv) > 2 else "report_dict.bin"
+
+    samples = load_samples(data_path)
+    print(f"Training a {DICT_SIZE // 1024} KB dictionary on {len(samples)} records from {data_path}...")
+    start = time.perf_counter()
+    dictionary = train_dictionary(samples, DICT_SIZE)
+    with open(dict_path, "wb") as f:
+        f.write(dictionary)
+
+    plain, primed = ReportCodec(), ReportCodec(dictionary=dictionary)
+    raw = sum(len(s.encode("utf-8")) for s in samples)
+    without = sum(len(plain.encode(s)) for s in samples)
+    with_dict = sum(len(primed.encode(s)) for s in samples)
+    print(f"Saved {dict_path} ({len(dictionary)} bytes) in {time.perf_counter() - start:.1f}s; "
+          f"{raw} bytes -> {without} without / {with_dict} with the dictionary")